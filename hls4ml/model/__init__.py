@@ -1,6 +1,8 @@
 from __future__ import absolute_import
 
 from hls4ml.model.hls_model import HLSModel, HLSConfig
+from hls4ml.model.predictor import Predictor, BatchingWorker
+from hls4ml.model.emulator import Emulator
 
 try:
     from hls4ml.model import profiling
@@ -0,0 +1,833 @@
+from __future__ import print_function, division
+import re
+import numpy as np
+from collections import OrderedDict
+
+from hls4ml.model.hls_layers import IntegerPrecisionType, FixedPrecisionType, CompressedWeightVariable
+
+_rounding_modes = ['AP_TRN', 'AP_TRN_ZERO', 'AP_RND', 'AP_RND_ZERO', 'AP_RND_MIN_INF', 'AP_RND_INF', 'AP_RND_CONV']
+_saturation_modes = ['AP_WRAP', 'AP_SAT', 'AP_SAT_ZERO', 'AP_SAT_SYM']
+
+def parse_precision(precision):
+    """
+    Converts a precision string, e.g., 'ap_fixed<16,6,AP_RND,AP_SAT>' or 'ap_uint<8>', to a
+    FixedPrecisionType or IntegerPrecisionType. Precision objects are returned unchanged.
+    """
+    if isinstance(precision, (IntegerPrecisionType, FixedPrecisionType)):
+        return precision
+
+    match = re.match(r'^\s*ap_(u?)(int|fixed)\s*<(.+)>\s*$', str(precision))
+    if match is None:
+        raise Exception('Unsupported precision: {}'.format(precision))
+    signed = match.group(1) != 'u'
+    args = [arg.strip() for arg in match.group(3).split(',')]
+    if match.group(2) == 'int':
+        return IntegerPrecisionType(width=int(args[0]), signed=signed)
+
+    return FixedPrecisionType(width=int(args[0]), integer=int(args[1]), signed=signed,
+        rounding_mode=args[2] if len(args) > 2 else None,
+        saturation_mode=args[3] if len(args) > 3 else None,
+        saturation_bits=int(args[4]) if len(args) > 4 else None)
+
+def _fractional_bits(precision):
+    if isinstance(precision, IntegerPrecisionType):
+        return 0
+    return precision.width - precision.integer
+
+def _is_wrapping(precision):
+    if isinstance(precision, IntegerPrecisionType):
+        return True
+    return precision.saturation_mode in [None, 'AP_WRAP'] and not precision.saturation_bits
+
+def _is_unsigned_bit(precision):
+    return isinstance(precision, IntegerPrecisionType) and precision.width == 1 and not precision.signed
+
+def _ceillog2(x):
+    return 1 if x <= 2 else 1 + _ceillog2((x + 1) // 2)
+
+def _f32(x):
+    # Rounds to single precision, like the float computations of the lookup tables
+    with np.errstate(over='ignore'):
+        return np.asarray(x, dtype=np.float64).astype(np.float32).astype(np.float64)
+
+def quantize(x, precision, from_float=False):
+    """
+    Emulates the assignment of values to an ap_fixed/ap_int type
+
+    Parameters
+    ----------
+    x : array-like
+        Values to convert. They must be exactly representable as float64, which holds for
+        the results of operations on fixed-point types up to ~50 bits.
+    precision : str, FixedPrecisionType or IntegerPrecisionType
+        The target type. The rounding and saturation modes of ap_fixed are applied.
+    from_float : bool, optional
+        Whether the values are converted from float/double, as opposed to other ap types. This
+        only matters for ap_int targets, whose conversion from floating point differs for small
+        negative values. Default is False.
+
+    Returns
+    -------
+    numpy.ndarray
+        The converted values, as float64.
+    """
+    precision = parse_precision(precision)
+    x = np.asarray(x, dtype=np.float64)
+
+    width = precision.width
+    signed = precision.signed
+    if isinstance(precision, IntegerPrecisionType):
+        frac = 0
+        rounding = 'AP_TRN_ZERO' # C-style conversion to integer
+        saturation = 'AP_WRAP'
+    else:
+        frac = _fractional_bits(precision)
+        rounding = precision.rounding_mode if precision.rounding_mode is not None else 'AP_TRN'
+        saturation = precision.saturation_mode if precision.saturation_mode is not None else 'AP_WRAP'
+        if precision.saturation_bits:
+            raise Exception('Saturation bits are not supported by the emulator ({})'.format(precision))
+    if rounding not in _rounding_modes:
+        raise Exception('Unsupported rounding mode: {}'.format(rounding))
+    if saturation not in _saturation_modes:
+        raise Exception('Unsupported saturation mode: {}'.format(saturation))
+
+    # Scaling by powers of two is exact, the operations are done in place on the scaled copy
+    k = np.empty(x.shape)
+    np.multiply(x, 2.**frac, out=k)
+    if rounding == 'AP_TRN':
+        np.floor(k, out=k)
+    elif rounding == 'AP_TRN_ZERO':
+        np.trunc(k, out=k)
+    elif rounding == 'AP_RND':
+        k += 0.5
+        np.floor(k, out=k)
+    elif rounding == 'AP_RND_ZERO':
+        np.copysign(np.ceil(np.abs(k) - 0.5), k, out=k)
+    elif rounding == 'AP_RND_MIN_INF':
+        k -= 0.5
+        np.ceil(k, out=k)
+    elif rounding == 'AP_RND_INF':
+        np.copysign(np.floor(np.abs(k) + 0.5), k, out=k)
+    elif rounding == 'AP_RND_CONV':
+        np.rint(k, out=k)
+
+    if from_float and isinstance(precision, IntegerPrecisionType):
+        # ap_int_base(double) maps negative values in (-0.5, 0) to 1
+        k[(x < 0) & (x > -0.5)] = 1.
+
+    if signed:
+        low, high = -2.**(width - 1), 2.**(width - 1) - 1
+    else:
+        low, high = 0., 2.**width - 1
+
+    # Overflow handling is skipped when all the values are in range, which is the common case
+    if k.size > 0 and not (k.min() >= low and k.max() <= high):
+        if saturation == 'AP_WRAP':
+            # Infinite values behave like very large powers of two, i.e., wrap to zero
+            k[np.isinf(k)] = 0.
+            np.mod(k, 2.**width, out=k)
+            k[k > high] -= 2.**width
+        elif saturation == 'AP_SAT':
+            np.clip(k, low, high, out=k)
+        elif saturation == 'AP_SAT_ZERO':
+            k[(k < low) | (k > high)] = 0.
+        elif saturation == 'AP_SAT_SYM':
+            np.clip(k, -high if signed else 0., high, out=k)
+
+    k *= 2.**-frac
+    k += 0. # No negative zeros
+
+    return k
+
+def can_quantize(precision):
+    """
+    Returns whether `quantize` reproduces the conversion of values to `precision` exactly, i.e.,
+    the type is supported and its values are exactly representable as float64
+    """
+    try:
+        precision = parse_precision(precision)
+    except Exception:
+        return False
+    if precision.width > 53:
+        return False
+    if isinstance(precision, FixedPrecisionType):
+        if precision.saturation_bits:
+            return False
+        if precision.rounding_mode is not None and precision.rounding_mode not in _rounding_modes:
+            return False
+        if precision.saturation_mode is not None and precision.saturation_mode not in _saturation_modes:
+            return False
+    return True
+
+def _raw_bits(x, precision):
+    # Two's complement bit pattern of the values, as unsigned integers
+    k = np.ldexp(x, _fractional_bits(precision))
+    return np.mod(k, 2.**precision.width).astype(np.uint64)
+
+def _from_raw_bits(bits, precision):
+    k = np.asarray(bits, dtype=np.float64)
+    if precision.signed:
+        k = np.where(k >= 2.**(precision.width - 1), k - 2.**precision.width, k)
+    return np.ldexp(k, -_fractional_bits(precision))
+
+class Emulator(object):
+    """
+    Bit-accurate NumPy emulation of the C simulation of an HLSModel.
+
+    The layers of `model.graph` are evaluated on whole batches at once, applying the
+    rounding and saturation of the fixed-point types of each layer, without writing or
+    compiling the project. Supported layers are Dense, Conv1D/2D, Pooling1D/2D,
+    Activation (including Softmax, PReLU and parametrized activations), BatchNormalization,
+    Merge, Concatenate, Reshape and Transpose.
+    """
+
+    _max_block_size = 2**22
+
+    def __init__(self, model):
+        self.model = model
+        self._layer_functions = {
+            'Input' : self._input,
+            'Reshape' : self._reshape,
+            'Dense' : self._dense,
+            'Conv1D' : self._conv1d,
+            'Conv2D' : self._conv2d,
+            'Pooling1D' : self._pooling1d,
+            'Pooling2D' : self._pooling2d,
+            'Activation' : self._activation,
+            'ParametrizedActivation' : self._parametrized_activation,
+            'PReLU' : self._prelu,
+            'BatchNormalization' : self._batchnorm,
+            'BatchNormalizationQuantizedTanh' : self._batchnorm_quantized_tanh,
+            'Concatenate' : self._concatenate,
+            'Merge' : self._merge,
+            'Transpose' : self._transpose,
+        }
+        self._weights = {}
+        self._tables = {}
+
+    def _get_layer_function(self, layer):
+        for cls in type(layer).__mro__:
+            if cls.__name__ in self._layer_functions:
+                return self._layer_functions[cls.__name__]
+        raise Exception('Layer {} ({}) is not supported by the emulator'.format(layer.name, layer.__class__.__name__))
+
+    def _get_weights(self, layer, name):
+        key = (layer.name, name)
+        if key not in self._weights:
+            var = layer.get_weights(name)
+            # Use the values as they are written to the project, which are then converted by the C++ compiler
+            if isinstance(var, CompressedWeightVariable):
+                values = np.zeros((layer.get_attr('n_in'), layer.get_attr('n_out')))
+                for col, row, value in var.data:
+                    values[row, col] = float(var.precision_fmt % value)
+            else:
+                values = var.formatted_values().reshape(var.data.shape)
+            self._weights[key] = quantize(values, var.type.precision, from_float=True)
+
+        return self._weights[key]
+
+    def _get_inputs(self, x):
+        if isinstance(x, dict):
+            missing = [name for name in self.model.inputs if name not in x]
+            if len(missing) > 0:
+                raise Exception('Missing data for input(s): {}'.format(', '.join(missing)))
+            x = [x[name] for name in self.model.inputs]
+        elif not isinstance(x, (list, tuple)):
+            x = [x]
+        if len(x) != len(self.model.inputs):
+            raise Exception('Expected {} input array(s), but got {}'.format(len(self.model.inputs), len(x)))
+
+        inputs = {}
+        n_samples = None
+        for name, var, xi in zip(self.model.inputs, self.model.get_input_variables(), x):
+            xi = np.asarray(xi, dtype=np.float64)
+            n, rem = divmod(xi.size, int(np.prod(var.shape)))
+            if rem != 0:
+                raise Exception('Input size mismatch for "{}", got {}, expected {}'.format(name, xi.shape, tuple(var.shape)))
+            if n_samples is not None and n != n_samples:
+                raise Exception('All inputs must have the same number of samples, got {} and {}'.format(n_samples, n))
+            n_samples = n
+            inputs[name] = xi.reshape([n] + list(var.shape))
+
+        return inputs, n_samples
+
+    def trace(self, x):
+        """
+        Emulate the model on the input `x`, keeping the output of every layer
+
+        Parameters
+        ----------
+        x : numpy.ndarray, list or dict
+            Input data, see `predict`.
+
+        Returns
+        -------
+        tuple
+            The predictions of the model, as returned by `predict`, and a dictionary mapping
+            the layer names to their outputs, of shape (n_samples, *layer_shape).
+        """
+        inputs, n_samples = self._get_inputs(x)
+
+        results = {}
+        trace_output = OrderedDict()
+        for layer in self.model.graph.values():
+            function = self._get_layer_function(layer)
+            if layer.__class__.__name__ == 'Input':
+                args = [inputs[layer.name]]
+            else:
+                args = [results[name] for name in layer.inputs]
+            shape = [n_samples] + list(layer.get_output_variable().shape)
+            results[layer.outputs[0]] = function(layer, *args).reshape(shape)
+            trace_output[layer.name] = results[layer.outputs[0]]
+
+        output = [results[name].reshape(n_samples, -1) for name in self.model.outputs]
+        if n_samples == 1:
+            output = [o[0] for o in output]
+        if len(output) == 1:
+            output = output[0]
+
+        return output, trace_output
+
+    def predict(self, x):
+        """
+        Emulate the model on the input `x`
+
+        Parameters
+        ----------
+        x : numpy.ndarray, list or dict
+            Input data, either a single sample or a batch of samples. Models with multiple
+            inputs expect a list of arrays or a dictionary mapping the names of the input
+            layers to arrays.
+
+        Returns
+        -------
+        numpy.ndarray or list
+            The predictions of the model as float64, with the same values and shapes as
+            returned by `HLSModel.predict`.
+        """
+        return self.trace(x)[0]
+
+    def _input(self, layer, x):
+        return quantize(x, layer.get_output_variable().type.precision, from_float=True)
+
+    def _reshape(self, layer, x):
+        return x
+
+    def _accumulation_schedule(self, layer, n_in, n_out):
+        # Order in which the products are added to the accumulators, as an array of shape (n_out, n_steps,
+        # group_size) of input indices. The products of each group are summed before being added to the
+        # accumulator, the index n_in stands for a zero product. Returns None for sequential accumulation.
+        strategy = layer.get_attr('strategy')
+        if strategy not in ['large', 'compressed']:
+            return None
+
+        rf = layer.reuse_factor
+        groups = [[] for _ in range(n_out)]
+        if strategy == 'compressed':
+            # Follows nnet::dense_compressed
+            weights = layer.get_weights('weight').data
+            multiplier_limit = -(-len(weights) // rf)
+            for ir in range(rf):
+                mult = [[] for _ in range(n_out)]
+                for im in range(multiplier_limit):
+                    col, row, _ = weights[im * rf + ir]
+                    mult[col].append(row)
+                for i in range(n_out):
+                    groups[i].append(mult[i])
+        elif rf <= n_in:
+            # Follows nnet::dense_large_rf_leq_nin
+            block_factor = -(-(n_in * n_out) // rf)
+            multscale = block_factor // n_out
+            for ir in range(rf):
+                in_index, out_index, acc_step = ir, 0, 0
+                for im in range(block_factor):
+                    groups[out_index].append([in_index])
+                    in_index += rf
+                    if in_index >= n_in:
+                        in_index = ir
+                    if acc_step + 1 >= multscale:
+                        acc_step = 0
+                        out_index += 1
+                    else:
+                        acc_step += 1
+        elif rf % n_in == 0:
+            # Follows nnet::dense_large_rf_gt_nin_rem0
+            rf = min(rf, n_in * n_out)
+            block_factor = -(-(n_in * n_out) // layer.reuse_factor)
+            outscale = rf // n_in
+            for ir in range(rf):
+                w_index, out_index = ir, ir // n_in
+                for im in range(block_factor):
+                    groups[out_index].append([ir % n_in])
+                    w_index += rf
+                    if w_index >= n_in * n_out:
+                        break
+                    out_index += outscale
+        else:
+            # Follows nnet::dense_large_rf_gt_nin
+            block_factor = -(-(n_in * n_out) // rf)
+            for ir in range(rf):
+                mult = [[] for _ in range(n_out)]
+                for im in range(block_factor):
+                    w_index = ir + rf * im
+                    if w_index < n_in * n_out:
+                        mult[w_index // n_in].append(w_index % n_in)
+                for i in range(n_out):
+                    groups[i].append(mult[i])
+
+        n_steps = max(len(g) for g in groups)
+        group_size = max(1, max(len(s) for g in groups for s in g))
+        schedule = np.full((n_out, n_steps, group_size), n_in, dtype=int)
+        for i, g in enumerate(groups):
+            for j, s in enumerate(g):
+                schedule[i, j, :len(s)] = s
+
+        return schedule
+
+    def _multiply_accumulate(self, layer, x, w, b, use_product=True):
+        # x is of shape (n, n_in) and w of shape (n_in, n_out). With use_product, the products and the final
+        # cast follow nnet::product and nnet::cast, which specialize binary and ternary weights
+        data_p = parse_precision(layer.get_input_variable().type.precision)
+        weight_p = parse_precision(layer.get_weights('weight').type.precision)
+        accum_p = parse_precision(layer.get_attr('accum_t'))
+        res_p = parse_precision(layer.get_output_variable().type.precision)
+        n_in, n_out = w.shape
+
+        xnor = use_product and _is_unsigned_bit(data_p) and _is_unsigned_bit(weight_p)
+        if xnor:
+            # The product is 1 if the input and weight match
+            terms = [(x, w), (1 - x, 1 - w)]
+            product_frac = 0
+        elif use_product and _is_unsigned_bit(weight_p):
+            # A weight of 0 stands for -1
+            terms = [(x, w == 1), (quantize(-x, data_p), w == 0)]
+            product_frac = _fractional_bits(data_p)
+        elif use_product and isinstance(weight_p, IntegerPrecisionType) and weight_p.width == 2 and weight_p.signed:
+            terms = [(x, w == 1), (quantize(-x, data_p), w == -1)]
+            product_frac = _fractional_bits(data_p)
+        else:
+            terms = [(x, w)]
+            product_frac = _fractional_bits(data_p) + _fractional_bits(weight_p)
+
+        acc = quantize(b, accum_p)
+        if _is_wrapping(accum_p) and product_frac <= _fractional_bits(accum_p):
+            # The products fit in the accumulator, up to the overflow which wraps around in the sum as well
+            acc = quantize(acc + sum(np.dot(xt, wt.astype(np.float64)) for xt, wt in terms), accum_p)
+        else:
+            schedule = None
+            if not _is_wrapping(accum_p):
+                key = (layer.name, 'schedule')
+                if key not in self._tables:
+                    self._tables[key] = self._accumulation_schedule(layer, n_in, n_out)
+                schedule = self._tables[key]
+
+            # Quantize every product, then accumulate in order
+            outputs = np.arange(n_out)
+            acc_all = np.empty((x.shape[0], n_out))
+            block = max(1, self._max_block_size // w.size)
+            for start in range(0, x.shape[0], block):
+                end = min(start + block, x.shape[0])
+                mult = sum(xt[start:end, :, np.newaxis] * wt[np.newaxis] for xt, wt in terms)
+                mult = quantize(mult, accum_p)
+                acc_block = np.repeat(acc[np.newaxis], end - start, axis=0)
+                if _is_wrapping(accum_p):
+                    acc_block = quantize(acc_block + mult.sum(axis=1), accum_p)
+                elif schedule is None:
+                    for i in range(n_in):
+                        acc_block = quantize(acc_block + mult[:, i], accum_p)
+                else:
+                    mult = np.concatenate([mult, np.zeros((end - start, 1, n_out))], axis=1)
+                    for step in range(schedule.shape[1]):
+                        group = mult[:, schedule[:, step, 0], outputs]
+                        for k in range(1, schedule.shape[2]):
+                            group = quantize(group + mult[:, schedule[:, step, k], outputs], accum_p)
+                        acc_block = quantize(acc_block + group, accum_p)
+                acc_all[start:end] = acc_block
+            acc = acc_all
+
+        if xnor:
+            # Rescaled to the number of matches minus mismatches
+            cast_p = IntegerPrecisionType(width=_ceillog2(n_in) + 2)
+            acc = quantize(quantize(acc - n_in // 2, cast_p) * 2, cast_p)
+
+        return quantize(acc, res_p)
+
+    def _is_transposed(self, layer):
+        # Layers using the resource strategy transpose their weights for the Vivado backend
+        return layer.get_attr('strategy') == 'large' and self.model.config.backend.name == 'Vivado'
+
+    def _dense(self, layer, x):
+        w = self._get_weights(layer, 'weight')
+        if self._is_transposed(layer):
+            w = w.T
+        b = self._get_weights(layer, 'bias')
+
+        # Only the first n_in elements of the input are read
+        return self._multiply_accumulate(layer, x.reshape(x.shape[0], -1)[:, :w.shape[0]], w, b)
+
+    def _conv1d(self, layer, x):
+        n = x.shape[0]
+        n_in, n_chan, n_out = layer.get_attr('n_in'), layer.get_attr('n_chan'), layer.get_attr('n_out')
+        filt_width, n_filt, stride = layer.get_attr('filt_width'), layer.get_attr('n_filt'), layer.get_attr('stride')
+        channels_first = layer.get_attr('data_format') == 'channels_first'
+
+        if channels_first:
+            x = x.reshape(n, n_chan, n_in).transpose(0, 2, 1)
+        else:
+            x = x.reshape(n, n_in, n_chan)
+        x = np.pad(x, ((0, 0), (layer.get_attr('pad_left'), layer.get_attr('pad_right')), (0, 0)), mode='constant')
+        cols = np.arange(n_out)[:, np.newaxis] * stride + np.arange(filt_width)[np.newaxis]
+        # Patches are ordered by channel, then position in the filter, in the order of accumulation of nnet::conv_1d
+        patches = x[:, cols, :].transpose(0, 1, 3, 2).reshape(n * n_out, n_chan * filt_width)
+
+        w = self._get_weights(layer, 'weight')
+        if self._is_transposed(layer):
+            w = np.transpose(w, axes=[2, 1, 0])
+        w = np.transpose(w, axes=[1, 0, 2]).reshape(n_chan * filt_width, n_filt)
+        b = self._get_weights(layer, 'bias')
+
+        res = self._multiply_accumulate(layer, patches, w, b, use_product=self._is_transposed(layer))
+        res = res.reshape(n, n_out, n_filt)
+        if channels_first:
+            res = res.transpose(0, 2, 1)
+
+        return res
+
+    def _conv2d(self, layer, x):
+        n = x.shape[0]
+        in_height, in_width, n_chan = layer.get_attr('in_height'), layer.get_attr('in_width'), layer.get_attr('n_chan')
+        out_height, out_width = layer.get_attr('out_height'), layer.get_attr('out_width')
+        filt_height, filt_width, n_filt = layer.get_attr('filt_height'), layer.get_attr('filt_width'), layer.get_attr('n_filt')
+        channels_first = layer.get_attr('data_format') == 'channels_first'
+
+        if channels_first:
+            x = x.reshape(n, n_chan, in_height, in_width).transpose(0, 2, 3, 1)
+        else:
+            x = x.reshape(n, in_height, in_width, n_chan)
+        pad = ((0, 0), (layer.get_attr('pad_top'), layer.get_attr('pad_bottom')), (layer.get_attr('pad_left'), layer.get_attr('pad_right')), (0, 0))
+        x = np.pad(x, pad, mode='constant')
+        rows = np.arange(out_height)[:, np.newaxis] * layer.get_attr('stride_height') + np.arange(filt_height)[np.newaxis]
+        cols = np.arange(out_width)[:, np.newaxis] * layer.get_attr('stride_width') + np.arange(filt_width)[np.newaxis]
+        patches = x[:, rows[:, np.newaxis, :, np.newaxis], cols[np.newaxis, :, np.newaxis, :], :]
+        patches = patches.transpose(0, 1, 2, 5, 3, 4).reshape(n * out_height * out_width, n_chan * filt_height * filt_width)
+
+        w = self._get_weights(layer, 'weight')
+        if self._is_transposed(layer):
+            w = np.transpose(w, axes=[2, 3, 1, 0])
+        w = np.transpose(w, axes=[2, 0, 1, 3]).reshape(n_chan * filt_height * filt_width, n_filt)
+        b = self._get_weights(layer, 'bias')
+
+        res = self._multiply_accumulate(layer, patches, w, b, use_product=self._is_transposed(layer))
+        res = res.reshape(n, out_height, out_width, n_filt)
+        if channels_first:
+            res = res.transpose(0, 3, 1, 2)
+
+        return res
+
+    def _average(self, pool, precision):
+        # Follows nnet::avg, the pooled values are along the last axis
+        n = pool.shape[-1]
+        default_fixed = (isinstance(precision, FixedPrecisionType) and precision.signed
+            and precision.rounding_mode in [None, 'AP_TRN'] and _is_wrapping(precision))
+        default_int = isinstance(precision, IntegerPrecisionType) and precision.signed
+        if default_fixed or default_int:
+            # Summed in a wider type that doesn't overflow
+            total = pool.sum(axis=-1)
+        else:
+            total = np.zeros(pool.shape[:-1])
+            for i in range(n):
+                total = quantize(total + pool[..., i], precision)
+        frac = _fractional_bits(precision)
+        total = np.ldexp(np.trunc(np.ldexp(total, frac) / n), -frac)
+
+        return quantize(total, precision)
+
+    def _pooling1d(self, layer, x):
+        # nnet::pooling1d reduces consecutive elements of the flattened input
+        precision = parse_precision(layer.get_input_variable().type.precision)
+        pool_size = layer.get_attr('pool_size')
+        n_out = int(np.prod(layer.get_output_variable().shape))
+        pool = x.reshape(x.shape[0], -1)[:, :n_out * pool_size].reshape(x.shape[0], n_out, pool_size)
+        if layer.get_attr('pool_op') == 'Max':
+            return pool.max(axis=-1)
+        else:
+            return self._average(pool, precision)
+
+    def _pooling2d(self, layer, x):
+        precision = parse_precision(layer.get_input_variable().type.precision)
+        n = x.shape[0]
+        in_height, in_width, n_filt = layer.get_attr('in_height'), layer.get_attr('in_width'), layer.get_attr('n_filt')
+        pool_height, pool_width = layer.get_attr('pool_height'), layer.get_attr('pool_width')
+        stride_height, stride_width = layer.get_attr('stride_height'), layer.get_attr('stride_width')
+        pad_top, pad_bottom = layer.get_attr('pad_top'), layer.get_attr('pad_bottom')
+        pad_left, pad_right = layer.get_attr('pad_left'), layer.get_attr('pad_right')
+        if pool_height != stride_height or pool_width != stride_width or pad_top != 0 or pad_left != 0:
+            raise Exception('Layer {}: only non-overlapping pooling without top/left padding is supported by the emulator'.format(layer.name))
+        channels_first = layer.get_attr('data_format') == 'channels_first'
+
+        if channels_first:
+            x = x.reshape(n, n_filt, in_height, in_width).transpose(0, 2, 3, 1)
+        else:
+            x = x.reshape(n, in_height, in_width, n_filt)
+
+        padded_height = in_height + pad_top + pad_bottom
+        padded_width = in_width + pad_left + pad_right
+        if pad_top == 0 and pad_bottom == 0 and pad_left == 0 and pad_right == 0:
+            padded_height = padded_height // stride_height * stride_height
+            padded_width = padded_width // stride_width * stride_width
+        out_height = -(-padded_height // stride_height)
+        out_width = -(-padded_width // stride_width)
+        valid_height = min(in_height, padded_height - pad_bottom)
+        valid_width = min(in_width, padded_width - pad_right)
+
+        if layer.get_attr('pool_op') == 'Max':
+            # The padding is the most negative value of the type
+            pad_value = _from_raw_bits(2**(precision.width - 1), precision)
+        else:
+            pad_value = 0.
+        padded = np.full((n, out_height * stride_height, out_width * stride_width, n_filt), pad_value)
+        padded[:, :valid_height, :valid_width, :] = x[:, :valid_height, :valid_width, :]
+        pool = padded.reshape(n, out_height, stride_height, out_width, stride_width, n_filt)
+        pool = pool.transpose(0, 1, 3, 5, 2, 4).reshape(n, out_height, out_width, n_filt, stride_height * stride_width)
+
+        if layer.get_attr('pool_op') == 'Max':
+            res = pool.max(axis=-1)
+        else:
+            res = self._average(pool, precision)
+            # Rescale the windows overlapping with the padding
+            row_overlap = np.clip(valid_height - np.arange(out_height) * stride_height, 0, stride_height)
+            col_overlap = np.clip(valid_width - np.arange(out_width) * stride_width, 0, stride_width)
+            overlap = row_overlap[:, np.newaxis] * col_overlap[np.newaxis]
+            with np.errstate(divide='ignore'):
+                rescale = quantize((pool_height * pool_width) // np.maximum(overlap, 1), precision)
+            res = quantize(res * rescale[np.newaxis, :, :, np.newaxis], precision)
+
+        if channels_first:
+            res = res.transpose(0, 3, 1, 2)
+
+        return res
+
+    def _get_table(self, layer, name, function):
+        key = (layer.name, name)
+        if key not in self._tables:
+            self._tables[key] = function()
+        return self._tables[key]
+
+    def _index_table(self, layer, x, name, function, in_range, offset):
+        # Follows nnet::sigmoid, nnet::tanh, ... which truncate the input to an index into a table
+        table_size = layer.get_attr('table_size')
+        table_p = layer.get_attr('table_t')
+
+        def init_table():
+            in_val = _f32(2 * in_range * (np.arange(table_size) - table_size / 2.) / table_size)
+            return quantize(function(in_val), table_p, from_float=True)
+
+        table = self._get_table(layer, name, init_table)
+        index = np.trunc(x * table_size / (2. * in_range)) + (offset * table_size) // (2 * in_range)
+        index = np.clip(index, 0, table_size - 1).astype(int)
+
+        return table[index]
+
+    def _elu_table(self, layer, x, name, function):
+        table_size = layer.get_attr('table_size')
+        table_p = layer.get_attr('table_t')
+
+        def init_table():
+            in_val = _f32(-8. * np.arange(table_size) / table_size)
+            return quantize(function(in_val), table_p, from_float=True)
+
+        table = self._get_table(layer, name, init_table)
+        index = np.minimum(np.trunc(np.where(x < 0, x, 0.) * table_size / -8.), table_size - 1).astype(int)
+
+        return table[index]
+
+    def _softmax(self, layer, x):
+        data_p = parse_precision(layer.get_input_variable().type.precision)
+        exp_p = parse_precision(layer.get_attr('exp_table_t'))
+        inv_p = parse_precision(layer.get_attr('inv_table_t'))
+        res_p = parse_precision(layer.get_output_variable().type.precision)
+        table_size = layer.get_attr('table_size')
+        n_bits = _ceillog2(table_size)
+        if data_p.width < n_bits or exp_p.width < n_bits:
+            raise Exception('Layer {}: the table size requires at least {} bits in the softmax types'.format(layer.name, n_bits))
+
+        def real_val_from_idx(precision):
+            # The index is used as the top bits of the value
+            return _f32(_from_raw_bits(np.arange(table_size) << (precision.width - n_bits), precision))
+
+        def idx_from_real_val(values, precision):
+            return (_raw_bits(values, precision) >> np.uint64(precision.width - n_bits)).astype(int)
+
+        def init_exp_table():
+            return quantize(_f32(np.exp(real_val_from_idx(data_p))), exp_p, from_float=True)
+
+        def init_invert_table():
+            with np.errstate(divide='ignore'):
+                return quantize(_f32(1. / real_val_from_idx(exp_p)), inv_p, from_float=True)
+
+        exp_table = self._get_table(layer, 'exp', init_exp_table)
+        invert_table = self._get_table(layer, 'invert', init_invert_table)
+
+        exp_res = exp_table[idx_from_real_val(x, data_p)]
+
+        # Same adder tree as nnet::reduce
+        def reduce(values):
+            n = values.shape[-1]
+            if n == 1:
+                return values[..., 0]
+            elif n == 2:
+                return quantize(values[..., 0] + values[..., 1], exp_p)
+            left = 2**(int(np.floor(np.log2(n - 1))))
+            return quantize(reduce(values[..., :left]) + reduce(values[..., left:]), exp_p)
+
+        exp_sum = reduce(exp_res)
+        inv_exp_sum = invert_table[idx_from_real_val(exp_sum, exp_p)]
+
+        return quantize(exp_res * inv_exp_sum[:, np.newaxis], res_p)
+
+    def _activation(self, layer, x):
+        activation = layer.get_attr('activation').lower()
+        data_p = parse_precision(layer.get_input_variable().type.precision)
+        res_p = parse_precision(layer.get_output_variable().type.precision)
+        x = x.reshape(x.shape[0], -1)
+
+        if activation == 'linear':
+            res = x
+        elif activation == 'relu':
+            res = np.where(x > 0, x, 0.)
+        elif activation in ['relu6', 'relu1']:
+            max_int = 6. if activation == 'relu6' else 1.
+            res = np.where(x < 0, 0., np.where(x > max_int, max_int, x))
+        elif activation == 'softmax':
+            return self._softmax(layer, x)
+        elif activation == 'sigmoid':
+            sigmoid = lambda v: _f32(1. / _f32(1. + _f32(np.exp(-v))))
+            res = self._index_table(layer, x, 'sigmoid', sigmoid, 8., 8.)
+        elif activation == 'tanh':
+            res = self._index_table(layer, x, 'tanh', np.tanh, 4., 4.)
+        elif activation == 'softplus':
+            softplus = lambda v: _f32(np.log(_f32(np.exp(v)) + 1.))
+            res = self._index_table(layer, x, 'softplus', softplus, 8., 8.)
+        elif activation == 'softsign':
+            softsign = lambda v: _f32(v / (np.abs(v) + 1.))
+            res = self._index_table(layer, x, 'softsign', softsign, 8., 8.)
+        elif activation == 'elu':
+            return self._elu(layer, x, 1.)
+        elif activation == 'selu':
+            selu = lambda v: _f32(1.0507009873554804934193349852946 * (1.6732632423543772848170429916717 * (_f32(np.exp(v)) - 1.)))
+            scale = quantize(1.0507009873554804934193349852946, res_p, from_float=True)
+            res = np.where(x >= 0, quantize(scale * x, res_p), self._elu_table(layer, x, 'selu', selu))
+        elif activation == 'hard_sigmoid':
+            slope = quantize(0.2, data_p, from_float=True)
+            shift = quantize(0.5, data_p, from_float=True)
+            res = quantize(slope * x + shift, data_p)
+            res = np.where(res > 1, quantize(1., data_p), np.where(res < 0, 0., res))
+        elif activation == 'binary_tanh':
+            res = np.where(x > 0, 1., -1.)
+        elif activation == 'ternary_tanh':
+            res = quantize(2 * x, data_p)
+            res = np.where(res > 1, 1., np.where(res > -1, 0., -1.))
+        else:
+            raise Exception('Activation {} of layer {} is not supported by the emulator'.format(activation, layer.name))
+
+        return quantize(res, res_p)
+
+    def _elu(self, layer, x, alpha):
+        res_p = parse_precision(layer.get_output_variable().type.precision)
+        alpha = quantize(alpha, res_p, from_float=True)
+        elu = lambda v: _f32(_f32(np.exp(v)) - 1.)
+        return np.where(x >= 0, quantize(x, res_p), quantize(alpha * self._elu_table(layer, x, 'elu', elu), res_p))
+
+    def _parametrized_activation(self, layer, x):
+        activation = layer.get_attr('activation').lower()
+        param = layer.get_attr('activ_param', 1.0)
+        data_p = parse_precision(layer.get_input_variable().type.precision)
+        res_p = parse_precision(layer.get_output_variable().type.precision)
+        x = x.reshape(x.shape[0], -1)
+
+        if activation == 'leakyrelu':
+            alpha = quantize(param, data_p, from_float=True)
+            return quantize(np.where(x > 0, x, alpha * x), res_p)
+        elif activation == 'thresholdedrelu':
+            theta = quantize(param, data_p, from_float=True)
+            return quantize(np.where(x > theta, x, 0.), res_p)
+        elif activation == 'elu':
+            return self._elu(layer, x, param)
+        else:
+            raise Exception('Activation {} of layer {} is not supported by the emulator'.format(activation, layer.name))
+
+    def _prelu(self, layer, x):
+        res_p = parse_precision(layer.get_output_variable().type.precision)
+        x = x.reshape(x.shape[0], -1)
+        alpha = self._get_weights(layer, 'alpha').reshape(1, -1)
+
+        return quantize(np.where(x > 0, x, alpha * x), res_p)
+
+    def _batchnorm(self, layer, x):
+        res_p = parse_precision(layer.get_output_variable().type.precision)
+        scale = self._get_weights(layer, 'scale').ravel()
+        bias = self._get_weights(layer, 'bias').ravel()
+        # The scale and bias are indexed modulo their size
+        x = x.reshape(x.shape[0], -1, scale.size)
+
+        return quantize(x * scale + bias, res_p)
+
+    def _batchnorm_quantized_tanh(self, layer, x):
+        x = x.reshape(x.shape[0], -1)
+        if layer.get_attr('quantize') == 2:
+            threshold = self._get_weights(layer, 'threshold').reshape(1, -1)
+            return np.where(x > threshold, 1., 0.)
+        else:
+            threshold_hi = self._get_weights(layer, 'threshold_hi').reshape(1, -1)
+            threshold_lo = self._get_weights(layer, 'threshold_lo').reshape(1, -1)
+            return np.where(x > threshold_hi, 1., np.where(x <= threshold_lo, -1., 0.))
+
+    def _merge(self, layer, x1, x2):
+        op = layer.get_attr('op').lower()
+        p1 = parse_precision(layer.get_input_variable(layer.inputs[0]).type.precision)
+        p2 = parse_precision(layer.get_input_variable(layer.inputs[1]).type.precision)
+        res_p = parse_precision(layer.get_output_variable().type.precision)
+
+        if op == 'add':
+            res = x1 + x2
+        elif op == 'subtract':
+            res = x1 - x2
+        elif op == 'multiply':
+            res = x1 * x2
+        elif op == 'average':
+            # Follows nnet::average, i.e., data1 * data2 / (res_T) 2
+            two = quantize(2., res_p)
+            if two == 0:
+                raise Exception('Layer {}: division by zero, 2 is not representable by the output type'.format(layer.name))
+            frac = _fractional_bits(p1) + _fractional_bits(p2)
+            res = np.ldexp(np.trunc(np.ldexp(x1 * x2, frac) / two), -frac)
+        elif op == 'maximum':
+            res = np.where(x1 > x2, x1, x2)
+        elif op == 'minimum':
+            res = np.where(x1 < x2, x1, x2)
+        else:
+            raise Exception('Merge operation {} of layer {} is not supported by the emulator'.format(op, layer.name))
+
+        return quantize(res, res_p)
+
+    def _concatenate(self, layer, x1, x2):
+        res_p = parse_precision(layer.get_output_variable().type.precision)
+        rank = x1.ndim - 1
+        axis = layer.get_attr('axis', -1)
+        if rank == 1 or axis == -1 or axis >= rank - 1:
+            axis = rank - 1
+        elif axis < 0:
+            axis = 0
+
+        res = quantize(np.concatenate([x1, x2], axis=axis + 1), res_p).reshape(x1.shape[0], -1)
+        # The output variable may be larger than the concatenated tensor, the remaining elements are not written
+        n_pad = int(np.prod(layer.get_output_variable().shape)) - res.shape[1]
+
+        return np.pad(res, ((0, 0), (0, n_pad)), mode='constant')
+
+    def _transpose(self, layer, x):
+        perm = [int(i) for i in layer.get_attr('perm_str').split(',')]
+        shape = layer.get_input_variable().shape
+        x = x.reshape([x.shape[0]] + list(shape))
+
+        return np.transpose(x, [0] + [i + 1 for i in perm])
@@ -46,6 +46,27 @@ class HLSType(object):
     def definition_cpp(self):
         return 'typedef {precision} {name};\n'.format(name=self.name, precision=self.precision)
 
+    def raw_dtype(self):
+        """
+        Returns the numpy integer type holding the raw bit pattern of this type, e.g., int16 for
+        ap_fixed<16,6> or uint8 for ap_ufixed<8,0>, or None if there is no such type.
+        """
+        if isinstance(self.precision, (IntegerPrecisionType, FixedPrecisionType)):
+            width = self.precision.width
+            signed = self.precision.signed
+        else:
+            match = re.match(r'^\s*ap_(u?)(?:int|fixed)\s*<\s*(\d+)', str(self.precision))
+            if match is None:
+                return None
+            width = int(match.group(2))
+            signed = match.group(1) != 'u'
+
+        for container_width in [8, 16, 32, 64]:
+            if width <= container_width:
+                return np.dtype('{}int{}'.format('' if signed else 'u', container_width))
+
+        return None
+
 class CompressedType(HLSType):
     def __init__(self, name, precision, index_precision, **kwargs):
         super(CompressedType, self).__init__('compressed_type{index}', precision, **kwargs)
@@ -94,6 +115,7 @@ class InplaceVariable():
         self.type = proxy.type
         self.name = proxy.name
         self.size = proxy.size
+        self.proxy = proxy
 
     def get_shape(self):
         return zip(self.dim_names, self.shape)
@@ -107,14 +129,9 @@ class InplaceVariable():
 class WeightVariable(Variable):
     def __init__(self, var_name, type_name, precision, data, quantizer=None, **kwargs):
         super(WeightVariable, self).__init__(var_name, type_name, precision, **kwargs)
-        self.data = data
-        self.nzeros = -1
-        self.shape = list(self.data.shape)
-        self.data_length = np.prod(self.data.shape)
-        self.nonzeros = np.count_nonzero(self.data)
-        self.nzeros = self.data_length - self.nonzeros
-        self.min = np.min(self.data)
-        self.max = np.max(self.data)
+        self.shape = list(data.shape)
+        self.data_length = np.prod(data.shape)
+        self.update_data(data)
         self._iterator = None
         self.update_precision(precision)
         self.quantizer = quantizer
@@ -133,6 +150,29 @@ class WeightVariable(Variable):
 
     next = __next__
 
+    def format_chunks(self, chunk_size=4096):
+        """
+        Yields the formatted values in C order, the same strings as iterating over the variable,
+        joined by ', ' in chunks of up to `chunk_size` values. Each chunk is formatted at once.
+        """
+        values = np.ravel(self.data, order='C').tolist()
+        for i in range(0, len(values), chunk_size):
+            chunk = values[i:i + chunk_size]
+            # One % on the whole chunk, np.char.mod formats the values one by one and is ~4x slower
+            yield ', '.join([self.precision_fmt] * len(chunk)) % tuple(chunk)
+
+    def formatted_values(self):
+        """Returns the values as written to the project, parsed back to a flat float array"""
+        return np.array(', '.join(self.format_chunks()).split(', ')).astype(np.float64)
+
+    def update_data(self, data):
+        """Replace the values of the weights, `data` must have the same number of elements"""
+        self.data = data
+        self.nonzeros = np.count_nonzero(self.data)
+        self.nzeros = self.data_length - self.nonzeros
+        self.min = np.min(self.data)
+        self.max = np.max(self.data)
+
     def update_precision(self, new_precision):
         self.type.precision = new_precision
         precision_str = str(self.type.precision)
@@ -205,6 +245,15 @@ class CompressedWeightVariable(WeightVariable):
 
     next = __next__
 
+    def format_chunks(self, chunk_size=4096):
+        fmt = '{ %u, %u, ' + self.precision_fmt + ' }'
+        for i in range(0, len(self.data), chunk_size):
+            chunk = self.data[i:i + chunk_size]
+            yield ', '.join([fmt] * len(chunk)) % tuple(x for value in chunk for x in (value[1], value[0], value[2]))
+
+    def formatted_values(self):
+        raise Exception('Compressed weights are formatted as structures, not as values')
+
 class Layer(object):
     def __init__(self, model, name, attributes, inputs, outputs=None):
         self.model = model
@@ -223,6 +272,7 @@ class Layer(object):
         self.weights = OrderedDict()
         self.variables = OrderedDict()
         self.precision = OrderedDict()
+        self.weights_folds = OrderedDict()
         accum_t = HLSType(*reversed(self.model.config.get_precision(self, 'accum')))
         self.precision[accum_t.name] = accum_t
         self.set_attr('accum_t', accum_t.precision)
@@ -347,6 +397,58 @@ class Layer(object):
         self.weights[name] = var
         self.precision[var.type.name] = var.type
 
+    def _convert_weights_data(self, name, data):
+        # Conversion of the weights from the layout of the original model to the one of the backend
+        return data
+
+    def check_weights_data(self, name, data):
+        """
+        Raises an exception if `data` can't replace the values of the weights `name`, see
+        `update_weights_data`, otherwise returns them as an array
+        """
+        if name not in self.weights:
+            raise Exception('Layer "{}" has no weights "{}"'.format(self.name, name))
+        var = self.weights[name]
+        if isinstance(var, CompressedWeightVariable):
+            raise Exception('Compressed weights "{}" of layer "{}" can\'t be updated'.format(name, self.name))
+
+        data = np.asarray(data)
+        if data.shape != var.data_unquantized.shape:
+            raise Exception('Expected weights "{}" of layer "{}" of shape {}, got {}'.format(name, self.name, var.data_unquantized.shape, data.shape))
+        for pass_name, fold in self.weights_folds.get(name, []):
+            if fold is None:
+                raise Exception('Weights "{}" of layer "{}" were changed by the optimizer pass {} and can\'t be updated'.format(name, self.name, pass_name))
+        self._fold_weights_data(name, data)
+        return data
+
+    def add_weights_fold(self, name, pass_name, fold):
+        """
+        Record that the optimizer pass `pass_name` changed the values of the weights `name`.
+        `fold` is a function redoing the change on new values given to `update_weights_data`,
+        in the layout of the original model, or None if the weights can't be updated anymore.
+        """
+        self.weights_folds.setdefault(name, []).append((pass_name, fold))
+
+    def _fold_weights_data(self, name, data):
+        for _, fold in self.weights_folds.get(name, []):
+            data = fold(data)
+        return data
+
+    def update_weights_data(self, name, data):
+        """
+        Replace the values of the weights `name` (e.g., 'weight' or 'bias'), given in the layout of
+        the original model, e.g., the kernel of a Keras layer. The changes of the optimizer passes
+        (see `add_weights_fold`) and the quantizer of the weights, if any, are applied to the new
+        values. Compressed weights can't be updated.
+        """
+        data = self.check_weights_data(name, data)
+        var = self.weights[name]
+        var.data_unquantized = data
+        data = self._fold_weights_data(name, data)
+        if var.quantizer is not None:
+            data = var.quantizer(data)
+        var.update_data(self._convert_weights_data(name, data))
+
     def _default_function_params(self):
         params = {}
         params['config'] = 'config{}'.format(self.index)
@@ -452,11 +554,15 @@ class Dense(Layer):
             if self.model.config.get_compression(self):
                 index_t = self.get_weights('weight').type.index_precision
             else:
-                if self.model.config.backend.name == 'Vivado':
-                    self.weights['weight'].data = np.transpose(self.weights['weight'].data)
+                self.weights['weight'].data = self._convert_weights_data('weight', self.weights['weight'].data)
         self.set_attr('index_t', index_t)
         self.add_bias(quantizer=self.get_attr('bias_quantizer'))
 
+    def _convert_weights_data(self, name, data):
+        if name == 'weight' and self.get_attr('strategy') == 'large' and self.model.config.backend.name == 'Vivado':
+            return np.transpose(data)
+        return data
+
     def function_cpp(self):
         params = self._default_function_params()
         params['strategy'] = self.get_attr('strategy')
@@ -490,10 +596,15 @@ class Conv1D(Layer):
             self.set_attr('strategy', 'large')
             if self.model.config.backend.name == 'Vivado':
                 self.model.config.backend.set_closest_reuse_factor(self)
-                self.weights['weight'].data = np.transpose(self.weights['weight'].data, axes=[2, 1, 0]) #(W,C,F) => (F,C,W)
+                self.weights['weight'].data = self._convert_weights_data('weight', self.weights['weight'].data)
         else:
             self.set_attr('strategy', 'latency')
 
+    def _convert_weights_data(self, name, data):
+        if name == 'weight' and self.get_attr('strategy') == 'large' and self.model.config.backend.name == 'Vivado':
+            return np.transpose(data, axes=[2, 1, 0]) #(W,C,F) => (F,C,W)
+        return data
+
     def function_cpp(self):
         params = self._default_function_params()
         params['strategy'] = self.get_attr('strategy')
@@ -546,10 +657,15 @@ class Conv2D(Layer):
             self.set_attr('strategy', 'large')
             if self.model.config.backend.name == 'Vivado':
                 self.model.config.backend.set_closest_reuse_factor(self)
-                self.weights['weight'].data = np.transpose(self.weights['weight'].data, axes=[3, 2, 0, 1]) #(H,W,C,F) => (F,C,H,W)
+                self.weights['weight'].data = self._convert_weights_data('weight', self.weights['weight'].data)
         else:
             self.set_attr('strategy', 'latency')
 
+    def _convert_weights_data(self, name, data):
+        if name == 'weight' and self.get_attr('strategy') == 'large' and self.model.config.backend.name == 'Vivado':
+            return np.transpose(data, axes=[3, 2, 0, 1]) #(H,W,C,F) => (F,C,H,W)
+        return data
+
     def function_cpp(self):
         params = self._default_function_params()
         params['strategy'] = self.get_attr('strategy')
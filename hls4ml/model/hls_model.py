@@ -2,19 +2,35 @@ from __future__ import print_function
 import six
 import os
 import sys
-import platform
-import ctypes
+import subprocess
+import hashlib
+import shutil
+import tempfile
 import re
 import numpy as np
-import numpy.ctypeslib as npc
 from collections import OrderedDict
 
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
 from hls4ml.model.hls_layers import *
+from hls4ml.model.predictor import Predictor, BatchingWorker
+from hls4ml.model.emulator import Emulator, can_quantize
 from hls4ml.templates import get_backend
 from hls4ml.writer import get_writer
 from hls4ml.model.optimizer import optimize_model
 
 class HLSConfig(object):
+    # Presets of the "BuildProfile" options of the C simulation library
+    _build_profiles = {
+        'Release' : {},
+        'Fast' : {'Native' : True, 'LTO' : True, 'OpenMP' : True},
+        'Debug' : {'Debug' : True, 'Sanitizer' : 'undefined'},
+    }
+    _build_profile_options = ['Native', 'LTO', 'OpenMP', 'PGO', 'Debug', 'Sanitizer']
+
     def __init__(self, config):
         self.config = config
 
@@ -39,12 +55,39 @@ class HLSConfig(object):
 
         self.trace_output = self.get_config_value('TraceOutput', False)
 
+        # Reuse the compiled library if the sources haven't changed, optionally shared across projects
+        self.compile_cache = self.get_config_value('CompileCache', True)
+        self.compile_cache_dir = self.get_config_value('CompileCacheDir', os.environ.get('HLS4ML_CACHE_DIR'))
+
         self._parse_hls_config()
         self._validate_hls_config()
 
     def get_config_value(self, key, default=None):
         return self.config.get(key, default)
 
+    def get_build_profile(self):
+        """
+        Returns the options of the build of the C simulation library, from "BuildProfile" in the
+        configuration. It is either the name of a preset ('Release', the default, 'Fast' or 'Debug')
+        or a dictionary of options:
+
+        - Native: optimize for the host CPU (-march=native)
+        - LTO: link-time optimization (-flto)
+        - OpenMP: evaluate the samples of a batch in parallel threads (-fopenmp)
+        - PGO: profile-guided optimization, trained on the data passed to `HLSModel.compile`
+        - Debug: build without optimizations and with debug information (-O0 -g)
+        - Sanitizer: enabled sanitizers, e.g., 'undefined' or 'address' (-fsanitize=...)
+        """
+        profile = self.get_config_value('BuildProfile', 'Release')
+        if isinstance(profile, six.string_types):
+            if profile not in self._build_profiles:
+                raise Exception('Unknown build profile "{}", valid profiles are: {}'.format(profile, ', '.join(sorted(self._build_profiles))))
+            profile = self._build_profiles[profile]
+        unknown = [option for option in profile if option not in self._build_profile_options]
+        if len(unknown) > 0:
+            raise Exception('Unknown build profile option(s): {}'.format(', '.join(unknown)))
+        return dict(profile)
+
     def get_project_name(self):
         return self.get_config_value('ProjectName')
 
@@ -244,7 +287,10 @@ class HLSModel(object):
         self.graph = OrderedDict()
         self.output_vars = {}
 
-        self._top_function_lib = None
+        self._predictor = None
+        self._emulator = None
+        self._worker = None
+        self._worker_settings = {}
 
         self._make_graph(layer_list)
 
@@ -271,7 +317,7 @@ class HLSModel(object):
         for o in node.outputs:
             out_var = node.get_output_variable(output_name=o)
             if o in self.outputs:
-                out_var.type.name = 'result_t'
+                out_var.type.name = self._get_result_type_name(o)
             self.output_vars[o] = out_var
 
         return node
@@ -340,9 +386,17 @@ class HLSModel(object):
             variables.append(self.graph[inp].get_output_variable())
         return variables
 
+    def _get_result_type_name(self, out_name):
+        # As for the inputs, each output has its own type, which may have another precision
+        index = self.outputs.index(out_name) + 1
+        if index == 1:
+            return 'result_t'
+        else:
+            return 'result{}_t'.format(index)
+
     def register_output_variable(self, out_name, variable):
         if out_name in self.outputs:
-            variable.type.name = 'result_t'
+            variable.type.name = self._get_result_type_name(out_name)
         self.output_vars[out_name] = variable
 
     def get_output_variables(self):
@@ -357,162 +411,479 @@ class HLSModel(object):
     def write(self):
         self.config.writer.write_hls(self)
 
-    def compile(self):
-        self.write()
-
-        curr_dir = os.getcwd()
-        os.chdir(self.config.get_output_dir())
-
+    def compile(self, profile=None, pgo_data=None):
+        """
+        Write the project and build the C simulation library
+
+        The build is skipped if the library was already built from identical sources, weights and
+        compiler flags ("CompileCache" in the configuration, enabled by default). If "CompileCacheDir"
+        (or the environment variable HLS4ML_CACHE_DIR) is set, libraries are also shared through
+        that directory across projects.
+
+        Parameters
+        ----------
+        profile : str or dict, optional
+            Build profile of this build of the library, used instead of "BuildProfile" in the
+            configuration, which is left unchanged. See `HLSConfig.get_build_profile` for the options.
+        pgo_data : numpy.ndarray, list or dict, optional
+            Inputs evaluated by the instrumented library to train the profile-guided optimization,
+            required if the build profile enables PGO.
+
+        Returns
+        -------
+        Predictor
+            Handle to the loaded library, also used by `predict` and `trace`
+        """
+        if profile is None:
+            return self._compile(pgo_data)
+
+        # The writer reads the profile from the configuration, it is only replaced during this build
+        config = self.config.config
+        has_profile, saved_profile = 'BuildProfile' in config, config.get('BuildProfile')
+        config['BuildProfile'] = profile
         try:
-            ret_val = os.system('bash build_lib.sh')
-            if ret_val != 0:
-                raise Exception('Failed to compile project "{}"'.format(self.config.get_project_name()))
-            lib_name = 'firmware/{}.so'.format(self.config.get_project_name())
-            if self._top_function_lib is not None:
-
-                if platform.system() == "Linux":
-                    dlclose_func = ctypes.CDLL('libdl.so').dlclose
-                elif platform.system() == "Darwin":
-                    dlclose_func = ctypes.CDLL('libc.dylib').dlclose
-
-                dlclose_func.argtypes = [ctypes.c_void_p]
-                dlclose_func.restype = ctypes.c_int
-                dlclose_func(self._top_function_lib._handle)
-            self._top_function_lib = ctypes.cdll.LoadLibrary(lib_name)
+            return self._compile(pgo_data)
         finally:
-            os.chdir(curr_dir)
+            if has_profile:
+                config['BuildProfile'] = saved_profile
+            else:
+                del config['BuildProfile']
 
-    def _get_top_function(self, x):
-        if self._top_function_lib is None:
-            raise Exception('Model not compiled')
-        if len(self.get_input_variables()) > 1 or len(self.get_input_variables()) > 1:
-            raise Exception('Calling "predict" on models with multiple inputs or outputs is not supported (yet)')
-
-        if not isinstance(x, np.ndarray):
-            raise Exception('Expected numpy.ndarray, but got {}'.format(type(x)))
-        if not x.flags['C_CONTIGUOUS']:
-            raise Exception('Array must be c_contiguous, try using numpy.ascontiguousarray(x)')
-
-        if x.dtype in [np.single, np.float32]:
-            top_function = getattr(self._top_function_lib, self.config.get_project_name() + '_float')
-            ctype = ctypes.c_float
-        elif x.dtype in [np.double, np.float64, np.float_]:
-            top_function = getattr(self._top_function_lib, self.config.get_project_name() + '_double')
-            ctype = ctypes.c_double
+    def _compile(self, pgo_data):
+        if self.config.get_build_profile().get('PGO', False):
+            if pgo_data is None:
+                raise Exception('Profile-guided optimization requires training data, see pgo_data')
         else:
-            raise Exception('Invalid type ({}) of numpy array. Supported types are: single, float32, double, float64, float_.'.format(x.dtype))
-
-        top_function.restype = None
-        top_function.argtypes = [npc.ndpointer(ctype, flags="C_CONTIGUOUS"), npc.ndpointer(ctype, flags="C_CONTIGUOUS"),
-            ctypes.POINTER(ctypes.c_ushort), ctypes.POINTER(ctypes.c_ushort)]
-
-        return top_function, ctype
-
-    def _compute_n_samples(self, x):
-        expected_size = self.get_input_variables()[0].size()
-        x_size = np.prod(x.shape)
-        n_samples, rem = divmod(x_size, expected_size)
-        if rem != 0:
-            raise Exception('Input size mismatch, got {}, expected {}'.format(x_size.shape, self.get_input_variables()[0].shape))
-
-        return n_samples
-
-    def predict(self, x):
-        top_function, ctype = self._get_top_function(x)
-        n_samples = self._compute_n_samples(x)
+            pgo_data = None
 
-        curr_dir = os.getcwd()
-        os.chdir(self.config.get_output_dir() + '/firmware')
-
-        output = []
-        if n_samples == 1:
-            x = [x]
+        self.write()
 
+        output_dir = os.path.abspath(self.config.get_output_dir())
+        lib_name = '{}/firmware/{}.so'.format(output_dir, self.config.get_project_name())
+        self._build_lib(output_dir, lib_name, pgo_data=pgo_data)
+        restart_worker = self._worker is not None
+        if restart_worker:
+            self._worker.close()
+            self._worker = None
+        if self._predictor is not None:
+            self._predictor.close()
+        # dlclose doesn't always unload the library, and loading the same path again would then return the
+        # previous library with its weights already loaded, so each compile loads a copy under a new name
+        unique_lib = self._copy_unique_lib(output_dir, lib_name)
         try:
-            for i in range(n_samples):
-                predictions = np.zeros(self.get_output_variables()[0].size(), dtype=ctype)
-                top_function(x[i], predictions, ctypes.byref(ctypes.c_ushort()), ctypes.byref(ctypes.c_ushort()))
-                output.append(predictions)
-
-            #Convert to numpy array
-            output = np.asarray(output)
+            self._predictor = self._load_predictor(output_dir, unique_lib)
         finally:
-            os.chdir(curr_dir)
-
-        if n_samples == 1:
-            return output[0]
+            os.remove(unique_lib)
+        if restart_worker:
+            # Same settings as the previous worker, now calling the new library
+            self.start_worker(**self._worker_settings)
+
+        return self._predictor
+
+    def _load_predictor(self, output_dir, lib_name):
+        return Predictor(lib_name, self.config.get_project_name(),
+            input_names=self.inputs, input_shapes=[i.shape for i in self.get_input_variables()],
+            output_names=self.outputs, output_shapes=[o.shape for o in self.get_output_variables()],
+            weights_dir='{}/firmware/weights'.format(output_dir),
+            input_raw_dtypes=[i.type.raw_dtype() for i in self.get_input_variables()],
+            output_raw_dtypes=[o.type.raw_dtype() for o in self.get_output_variables()])
+
+    @staticmethod
+    def _copy_unique_lib(output_dir, lib_name):
+        build_dir = os.path.join(output_dir, 'build')
+        if not os.path.isdir(build_dir):
+            os.makedirs(build_dir)
+        fd, unique_lib = tempfile.mkstemp(prefix=os.path.splitext(os.path.basename(lib_name))[0] + '_', suffix='.so', dir=build_dir)
+        os.close(fd)
+        shutil.copyfile(lib_name, unique_lib)
+        return unique_lib
+
+    def _run_build_script(self, output_dir, pgo_stage=None):
+        env = dict(os.environ)
+        if pgo_stage is not None:
+            env['HLS4ML_PGO'] = pgo_stage
+        ret_val = subprocess.call(['bash', 'build_lib.sh'], cwd=output_dir, env=env)
+        if ret_val != 0:
+            raise Exception('Failed to compile project "{}"'.format(self.config.get_project_name()))
+
+    def _train_pgo(self, output_dir, lib_name, pgo_data):
+        # Build the instrumented library and run it on the training data, the profiles are written next to the objects
+        for root, _, filenames in os.walk(os.path.join(output_dir, 'build')):
+            for filename in filenames:
+                if filename.endswith('.gcda'):
+                    os.remove(os.path.join(root, filename))
+        self._run_build_script(output_dir, pgo_stage='generate')
+
+        # Load a copy, the current predictor may still hold the library at lib_name
+        train_lib = self._copy_unique_lib(output_dir, lib_name)
+        predictor = self._load_predictor(output_dir, train_lib)
+        try:
+            predictor.predict(pgo_data)
+        finally:
+            # Unloading the library writes the profiles
+            predictor.close()
+            os.remove(train_lib)
+
+    @staticmethod
+    def _get_compiler_version(output_dir):
+        # Identity of the compiler set in the build script, so that libraries built by another compiler aren't reused
+        compiler = 'g++'
+        with open(os.path.join(output_dir, 'build_lib.sh'), 'r') as f:
+            match = re.search(r'^CC=(\S+)', f.read(), re.MULTILINE)
+            if match is not None:
+                compiler = match.group(1)
+        try:
+            version = subprocess.check_output([compiler, '--version'], stderr=subprocess.STDOUT)
+        except (OSError, subprocess.CalledProcessError):
+            version = b''
+        return compiler.encode('utf-8') + b'\n' + version
+
+    @staticmethod
+    def _get_pgo_data_hash(pgo_data):
+        # The profiles, and so the optimized library, depend on the training data of the profile-guided optimization
+        if isinstance(pgo_data, dict):
+            arrays = [pgo_data[name] for name in sorted(pgo_data)]
+        elif isinstance(pgo_data, (list, tuple)):
+            arrays = list(pgo_data)
         else:
-            return output
-
-    def trace(self, x):
-        print('Recompiling {} with tracing'.format(self.config.get_project_name()))
-        self.config.trace_output = True
-        self.compile()
-
-        top_function, ctype = self._get_top_function(x)
-        n_samples = self._compute_n_samples(x)
-
-        class TraceData(ctypes.Structure):
-            _fields_ = [('name', ctypes.c_char_p),
-                        ('data', ctypes.c_void_p)]
-
-        trace_output = {}
-        layer_sizes = {}
-        n_traced = 0
-        for layer in self.get_layers():
-            if layer.function_cpp() and self.config.get_layer_config_value(layer, 'Trace', False):
-                n_traced += len(layer.get_variables())
-                trace_output[layer.name] = []
-                layer_sizes[layer.name] = layer.get_output_variable().shape
-
-        collect_func = self._top_function_lib.collect_trace_output
-        collect_func.argtypes = [ctypes.POINTER(TraceData)]
-        collect_func.restype = None
-        trace_data = (TraceData * n_traced)()
-
-        alloc_func = self._top_function_lib.allocate_trace_storage
-        alloc_func.argtypes = [ctypes.c_size_t]
-        alloc_func.restype = None
-
-        free_func = self._top_function_lib.free_trace_storage
-        free_func.argtypes = None
-        free_func.restype = None
-
-        curr_dir = os.getcwd()
-        os.chdir(self.config.get_output_dir() + '/firmware')
+            arrays = [pgo_data]
+
+        sha = hashlib.sha256()
+        for a in arrays:
+            a = np.ascontiguousarray(a)
+            sha.update('{} {}'.format(a.dtype.str, a.shape).encode('utf-8'))
+            sha.update(hashlib.sha256(a.view(np.uint8)).digest())
+        return sha.digest()
+
+    def _get_build_hash(self, output_dir, pgo_data=None):
+        # Hash of everything the library is built from: the sources, weights, the build scripts with the compiler flags,
+        # the compiler and the training data of the profile-guided optimization
+        project_name = self.config.get_project_name()
+        files = [os.path.join(output_dir, 'build_lib.sh'), os.path.join(output_dir, 'build_lib.mk'), os.path.join(output_dir, '{}_bridge.cpp'.format(project_name))]
+        for root, dirs, filenames in os.walk(os.path.join(output_dir, 'firmware'), followlinks=True):
+            dirs.sort()
+            for filename in sorted(filenames):
+                if not filename.startswith(project_name + '.so'):
+                    files.append(os.path.join(root, filename))
+
+        sha = hashlib.sha256()
+        sha.update(hashlib.sha256(self._get_compiler_version(output_dir)).digest())
+        if pgo_data is not None:
+            sha.update(self._get_pgo_data_hash(pgo_data))
+        for path in files:
+            sha.update(os.path.relpath(path, output_dir).encode('utf-8'))
+            with open(path, 'rb') as f:
+                sha.update(hashlib.sha256(f.read()).digest())
+        return sha.hexdigest()
+
+    @staticmethod
+    def _copy_lib(src, dst):
+        # Copy under a temporary name first and replace dst at once, so that neither this nor other
+        # processes ever load a partially written library, and a loaded one is never overwritten in place
+        tmp = '{}.{}.tmp'.format(dst, os.getpid())
+        shutil.copyfile(src, tmp)
+        os.rename(tmp, dst)
+
+    def _build_lib(self, output_dir, lib_name, pgo_data=None):
+        build_hash = None
+        hash_file = lib_name + '.hash'
+        if self.config.compile_cache:
+            build_hash = self._get_build_hash(output_dir, pgo_data=pgo_data)
+            if os.path.isfile(lib_name) and os.path.isfile(hash_file):
+                with open(hash_file, 'r') as f:
+                    if f.read().strip() == build_hash:
+                        print('Sources unchanged, using the existing library')
+                        return
+
+        cached_lib = None
+        if build_hash is not None and self.config.compile_cache_dir:
+            cache_dir = os.path.expanduser(self.config.compile_cache_dir)
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            cached_lib = os.path.join(cache_dir, build_hash + '.so')
+
+        if cached_lib is not None and os.path.isfile(cached_lib):
+            print('Using the cached library {}'.format(cached_lib))
+            self._copy_lib(cached_lib, lib_name)
+        else:
+            if os.path.isfile(hash_file):
+                os.remove(hash_file)
+            if pgo_data is not None:
+                self._train_pgo(output_dir, lib_name, pgo_data)
+                self._run_build_script(output_dir, pgo_stage='use')
+            else:
+                self._run_build_script(output_dir)
+            if cached_lib is not None:
+                self._copy_lib(lib_name, cached_lib)
 
-        output = []
-        if n_samples == 1:
-            x = [x]
+        if build_hash is not None:
+            with open(hash_file, 'w') as f:
+                f.write(build_hash)
 
-        try:
-            alloc_func(ctypes.sizeof(ctype))
-
-            for i in range(n_samples):
-                predictions = np.zeros(self.get_output_variables()[0].size(), dtype=ctype)
-                top_function(x[i], predictions, ctypes.byref(ctypes.c_ushort()), ctypes.byref(ctypes.c_ushort()))
-                output.append(predictions)
-                collect_func(trace_data)
-                for trace in trace_data:
-                    layer_name = str(trace.name, 'utf-8')
-                    layer_data = ctypes.cast(trace.data, ctypes.POINTER(ctype))
-                    np_array = np.ctypeslib.as_array(layer_data, shape=layer_sizes[layer_name])
-                    trace_output[layer_name].append(np.copy(np_array))
-
-            for key in trace_output.keys():
-                trace_output[key] = np.asarray(trace_output[key])
-
-            #Convert to numpy array
-            output = np.asarray(output)
-
-            free_func()
-        finally:
-            os.chdir(curr_dir)
+    def _get_predictor(self):
+        if self._predictor is None:
+            raise Exception('Model not compiled')
 
-        if n_samples == 1:
-            return output[0], trace_output
+        return self._predictor
+
+    def update_weights(self, layer_name, weights):
+        """
+        Replace the weights of a layer, also in the compiled library, without recompiling it
+
+        The new values are quantized to the types of the weights and written to the project. If
+        the model is compiled, they are also set in the loaded library, e.g., to validate the
+        bit-accurate model after each step of a quantization-aware training.
+
+        Parameters
+        ----------
+        layer_name : str
+            Name of the layer
+        weights : numpy.ndarray or dict
+            New kernel of the layer, in the layout of the original model (e.g., the Keras kernel),
+            or a dictionary mapping the names of the weights of the layer (e.g., 'weight', 'bias'
+            or 'scale') to their new values.
+        """
+        self.update_all_weights({layer_name: weights})
+
+    def update_all_weights(self, weights):
+        """
+        Replace the weights of several layers, see `update_weights`
+
+        Parameters
+        ----------
+        weights : dict
+            Dictionary mapping the names of the layers to their new weights
+        """
+        updates = []
+        for layer_name, layer_weights in weights.items():
+            layer = self.graph.get(layer_name)
+            if layer is None:
+                raise Exception('Unknown layer "{}"'.format(layer_name))
+            if not isinstance(layer_weights, dict):
+                layer_weights = {'weight': layer_weights}
+            for name, data in layer_weights.items():
+                updates.append((layer, name, data))
+
+        # Check all the new values (and that the library can receive them) before changing anything
+        for layer, name, data in updates:
+            layer.check_weights_data(name, data)
+            var = layer.weights[name]
+            if self._predictor is not None and (var.type.raw_dtype() is None or not can_quantize(var.type.precision)):
+                raise Exception('Weights "{}" of layer "{}" of type {} can\'t be updated in the compiled library'.format(name, layer.name, var.type.precision))
+
+        for layer, name, data in updates:
+            layer.update_weights_data(name, data)
+        self._emulator = None
+
+        writer = self.config.writer
+        write_files = os.path.isdir('{}/firmware/weights'.format(self.config.get_output_dir()))
+        restart_worker = self._predictor is not None and self._worker is not None
+        if restart_worker:
+            # Let the queued predictions finish with the previous weights
+            self._worker.close()
+            self._worker = None
+        for layer, name, _ in updates:
+            var = layer.get_weights(name)
+            if write_files:
+                writer.write_weights_variable(self, var)
+            if self._predictor is not None:
+                self._predictor.set_weights(var.name, writer.get_raw_weights(var, var.type.raw_dtype()))
+        if restart_worker:
+            self.start_worker(**self._worker_settings)
+
+    def predict(self, x, n_jobs=1, out=None, raw=False):
+        """
+        Run the C simulation of the compiled model
+
+        Parameters
+        ----------
+        x : numpy.ndarray, list or dict
+            Input data, either a single sample or a batch of samples. Must be C-contiguous.
+            Models with multiple inputs expect a list of arrays or a dictionary mapping the
+            names of the input layers to arrays.
+        n_jobs : int, optional
+            Number of threads to use. The batch is split into `n_jobs` contiguous chunks
+            that are evaluated concurrently. -1 uses all available cores. Default is 1.
+        out : numpy.ndarray, optional
+            Preallocated C-contiguous buffer with the same dtype as `x` and room for all
+            predictions (a list of buffers for models with multiple outputs). The results are
+            written directly into it and `out` is returned.
+        raw : bool, optional
+            If True, `x` and the predictions are the raw bit patterns of the input and result
+            types in the smallest integer type that fits them, e.g., numpy.int16 for ap_fixed<16,6>.
+            Default is False.
+
+        Returns
+        -------
+        numpy.ndarray or list
+            The predictions of the model, a list of arrays for models with multiple outputs
+        """
+        return self._get_predictor().predict(x, n_jobs=n_jobs, out=out, raw=raw)
+
+    def predict_iter(self, source, chunk_size=1024, n_jobs=1, raw=False):
+        """
+        Run the C simulation of the compiled model chunk by chunk, see `Predictor.predict_iter`
+
+        Parameters
+        ----------
+        source : array-like, str or iterable
+            Input data, e.g., an h5py dataset, a numpy.memmap, the path to a .npy file (which is
+            memory-mapped) or an iterable yielding batches of inputs.
+        chunk_size : int, optional
+            Number of samples per chunk for sliceable sources. Default is 1024.
+        n_jobs : int, optional
+            Number of threads used for each chunk. Default is 1.
+        raw : bool, optional
+            Whether the inputs and outputs are raw bit patterns. Default is False.
+
+        Yields
+        ------
+        numpy.ndarray or list
+            The predictions for each chunk
+        """
+        return self._get_predictor().predict_iter(source, chunk_size=chunk_size, n_jobs=n_jobs, raw=raw)
+
+    def start_worker(self, max_batch_size=4096, max_delay=0., n_jobs=1):
+        """
+        Start the worker thread used by `predict_async`, replacing the running one
+
+        The settings are kept when the worker is restarted by `compile` or `update_all_weights`,
+        and by `predict_async` if it starts the worker again.
+
+        Parameters
+        ----------
+        max_batch_size : int, optional
+            Maximum number of samples of the concurrent requests merged into one call. Default is 4096.
+        max_delay : float, optional
+            Time in seconds to wait for more requests before each call. Default is 0.
+        n_jobs : int, optional
+            Number of threads used for each call. Default is 1.
+
+        Returns
+        -------
+        BatchingWorker
+            The worker, whose `submit` method can also be used from other threads
+        """
+        predictor = self._get_predictor()
+        if self._worker is not None:
+            self._worker.close()
+        self._worker_settings = {'max_batch_size': max_batch_size, 'max_delay': max_delay, 'n_jobs': n_jobs}
+        self._worker = BatchingWorker(predictor, **self._worker_settings)
+
+        return self._worker
+
+    def predict_async(self, x, loop=None):
+        """
+        Run the C simulation of the compiled model from an asyncio event loop
+
+        The prediction runs on a worker thread, see `start_worker`, which is started on the first
+        call with the settings of the last `start_worker`, or the default ones. Concurrent requests are merged into batched calls
+        and the results are split back per request, e.g., `y = await model.predict_async(x)`.
+
+        Parameters
+        ----------
+        x : numpy.ndarray, list or dict
+            Input data, see `predict`.
+        loop : asyncio.AbstractEventLoop, optional
+            The event loop of the returned future. Defaults to the current event loop.
+
+        Returns
+        -------
+        asyncio.Future
+            Future holding the predictions of the model, as returned by `predict`
+        """
+        if asyncio is None:
+            raise Exception('predict_async requires asyncio')
+        if self._worker is None:
+            self.start_worker(**self._worker_settings)
+
+        future = self._worker.submit(x)
+        if loop is None:
+            return asyncio.wrap_future(future)
+        else:
+            return asyncio.wrap_future(future, loop=loop)
+
+    def trace(self, x, layers=None, stats=False, output_file=None, chunk_size=1024):
+        """
+        Run the C simulation of the compiled model and collect the outputs of the traced layers
+
+        The library built by `compile` has trace hooks for all layers, which are only enabled for
+        the duration of this call, so `predict` and `trace` share the same library and the traced
+        layers can be changed without recompiling. The model is only compiled if it wasn't before.
+
+        Parameters
+        ----------
+        x : numpy.ndarray, list or dict
+            Input data, see `predict`.
+        layers : list, optional
+            Names of the layers to trace. By default, the layers with "Trace: True" in the
+            configuration are traced.
+        stats : bool, optional
+            If True, only summaries of the outputs of each layer (minimum, maximum, number of zeros
+            and histogram of log2 of the magnitudes) are accumulated in the library instead of the
+            outputs themselves, see `Predictor.trace`. Default is False.
+        output_file : str, optional
+            If given, `x` is traced chunk by chunk and the outputs of the traced layers and the
+            predictions are written to this HDF5 file instead of being returned, see
+            `Predictor.trace_to_hdf5`. `x` can then also be any source accepted by `predict_iter`.
+        chunk_size : int, optional
+            Number of samples per chunk when writing to `output_file`. Default is 1024.
+
+        Returns
+        -------
+        tuple or str
+            Predictions, as returned by `predict`, and a dictionary mapping the names of the traced
+            layers to their outputs (or summaries, if `stats` is True). If `output_file` is given,
+            only its path is returned.
+        """
+        if self._predictor is None:
+            self.compile()
+
+        if layers is None:
+            layers = [layer.name for layer in self.get_layers() if layer.function_cpp() and self.config.get_layer_config_value(layer, 'Trace', False)]
+
+        layer_shapes = {}
+        for layer_name in layers:
+            layer = self.graph.get(layer_name)
+            if layer is None:
+                raise Exception('Layer "{}" not found in the model'.format(layer_name))
+            if not layer.function_cpp():
+                # Only layers with a function call in the generated code have a trace hook
+                raise Exception('Layer "{}" can\'t be traced'.format(layer_name))
+            layer_shapes[layer_name] = layer.get_output_variable().shape
+
+        if output_file is not None:
+            if stats:
+                raise Exception('The trace statistics can\'t be written to a file')
+            self._get_predictor().trace_to_hdf5(x, layer_shapes, output_file, chunk_size=chunk_size)
+            return output_file
+
+        return self._get_predictor().trace(x, layer_shapes, stats=stats)
+
+    def emulate(self, x, trace=False):
+        """
+        Evaluate the model with the bit-accurate NumPy emulator, without writing or compiling the project
+
+        Parameters
+        ----------
+        x : numpy.ndarray, list or dict
+            Input data, see `predict`.
+        trace : bool, optional
+            If True, the outputs of all layers are returned as well, see `Emulator.trace`.
+            Default is False.
+
+        Returns
+        -------
+        numpy.ndarray or list
+            The predictions of the model, matching those of `predict`
+        """
+        if self._emulator is None:
+            self._emulator = Emulator(self)
+
+        if trace:
+            return self._emulator.trace(x)
         else:
-            return output, trace_output
+            return self._emulator.predict(x)
 
     def build(self, reset=False, csim=True, synth=True, cosim=False, validation=False, export=False, vsynth=False):
         if 'linux' in sys.platform:
@@ -529,6 +900,11 @@ class HLSModel(object):
             else:
                 raise Exception('Backend values can be [Vivado, Intel, Mentor]')
 
+        if self.config.writer.get_tar_mode(self) == 'deferred':
+            self.config.writer.write_tar(self)
+        else:
+            self.config.writer.wait_for_tar()
+
         curr_dir = os.getcwd()
         os.chdir(self.config.get_output_dir())
         os.system('vivado_hls -f build_prj.tcl "reset={reset} csim={csim} synth={synth} cosim={cosim} validation={validation} export={export} vsynth={vsynth}"'
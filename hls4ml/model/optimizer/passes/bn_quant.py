@@ -149,6 +149,7 @@ class QuantizeDenseOutput(OptimizerPass):
         bias.type.name = 'bias{index}_t'.format(index=node.index)
         bias.nzeros = 0
         bias.update_precision(quantized_precision)
+        node.add_weights_fold('bias', self.__class__.__name__, None)
 
         # If followed by the BatchNormalizationBinaryTanh, update its input
         # Also requantise the weights
@@ -165,5 +166,6 @@ class QuantizeDenseOutput(OptimizerPass):
                     threshold_var = out_node.weights[var_name]
                     threshold_var.update_precision(out_type)
                     threshold_var.data = np.floor(threshold_var.data)
+                    out_node.add_weights_fold(var_name, self.__class__.__name__, np.floor)
 
         return False
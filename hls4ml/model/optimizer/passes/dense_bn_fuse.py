@@ -28,4 +28,10 @@ class FuseDenseAndBatchNormalization(OptimizerPass):
         dense_node.weights['weight'].data = fused_weight
         dense_node.weights['bias'].data = fused_bias
 
+        # Fuse the new values of the weights updated after the optimization in the same way
+        scale = bn_scale.data
+        bias = bn_bias.data
+        dense_node.add_weights_fold('weight', self.__class__.__name__, lambda data: scale * data)
+        dense_node.add_weights_fold('bias', self.__class__.__name__, lambda data: scale * data + bias)
+
         return True
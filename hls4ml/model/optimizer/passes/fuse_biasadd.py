@@ -14,6 +14,8 @@ class FuseBiasAdd(OptimizerPass):
         # Fuse BiasAdd into Dense layer
         dense_layer = node.get_input_node()
         dense_layer.get_weights('bias').data = node.get_weights('bias').data
+        # The bias now comes from the removed BiasAdd, new values of the original one can't be applied
+        dense_layer.add_weights_fold('bias', self.__class__.__name__, None)
 
         model.remove_node(node, rewire=True)
 
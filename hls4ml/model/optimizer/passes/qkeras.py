@@ -121,6 +121,15 @@ class QKerasFactorizeAlpha(OptimizerPass):
         qcfg['alpha'] = 1
         node.weights['weight'].quantizer.quantizer_fn = quantizer.from_config(qcfg)
 
+        # New values of the weights are factorized in the same way, with the scale of this ApplyAlpha layer
+        def factorize_alpha(data):
+            qdata = quantizer(tf.convert_to_tensor(data))
+            new_scale = quantizer.scale.numpy()
+            if new_scale.shape != scale.shape or not np.all(new_scale == scale):
+                raise Exception('The scale (alpha) of the quantizer of layer "{}" changed, the model must be converted again'.format(node.name))
+            return (unscale * qdata).numpy()
+        node.add_weights_fold('weight', self.__class__.__name__, factorize_alpha)
+
         # update the weights also applying the hls4ml quantizer
         # this is only needed for the binary layers which encode -1 as 0
         node.weights['weight'].data = node.weights['weight'].quantizer(new_weights.numpy())
@@ -172,6 +181,8 @@ class FuseConsecutiveBatchNormalization(OptimizerPass):
 
         bn0.weights['scale'].data = s2
         bn0.weights['bias'].data = b2
+        bn0.add_weights_fold('scale', self.__class__.__name__, lambda data: data * s1)
+        bn0.add_weights_fold('bias', self.__class__.__name__, lambda data: s1 * data + b1)
 
         model.remove_node(node, rewire=True)
         return True
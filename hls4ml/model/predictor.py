@@ -0,0 +1,629 @@
+from __future__ import print_function
+import platform
+import ctypes
+import ctypes.util
+import threading
+import time
+import six
+from six.moves import queue
+import numpy as np
+import h5py
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+try:
+    from concurrent.futures import Future
+except ImportError:
+    Future = None
+
+# Must match TRACE_HIST_LOW/TRACE_HIST_BINS and struct trace_stats in nnet_helpers.h
+TRACE_HIST_LOW = -64
+TRACE_HIST_BINS = 128
+
+class TraceStats(ctypes.Structure):
+    _fields_ = [('min', ctypes.c_double),
+                ('max', ctypes.c_double),
+                ('n_values', ctypes.c_ulonglong),
+                ('n_zeros', ctypes.c_ulonglong),
+                ('hist', ctypes.c_ulonglong * TRACE_HIST_BINS)]
+
+    def to_dict(self):
+        """
+        Returns the summary as a dictionary with the keys 'min', 'max', 'n_values', 'n_zeros',
+        'hist' (counts of the non-zero values per power of two of their magnitude) and 'log2'
+        (the exponent of the lower edge of each bin of 'hist').
+        """
+        return {'min' : self.min,
+                'max' : self.max,
+                'n_values' : self.n_values,
+                'n_zeros' : self.n_zeros,
+                'hist' : np.array(self.hist, dtype=np.int64),
+                'log2' : np.arange(TRACE_HIST_LOW, TRACE_HIST_LOW + TRACE_HIST_BINS)}
+
+class Predictor(object):
+    """
+    Handle to the compiled C simulation library of an HLSModel.
+
+    The function pointers, their prototypes and the input/output sizes are resolved once
+    when the library is loaded, so each prediction only pays for the input validation and
+    the foreign call itself.
+    """
+
+    _type_names = {
+        np.dtype(np.float32) : ('float', ctypes.c_float),
+        np.dtype(np.float64) : ('double', ctypes.c_double),
+    }
+
+    def __init__(self, lib_path, project_name, input_names, input_shapes, output_names, output_shapes, weights_dir,
+                 input_raw_dtypes=None, output_raw_dtypes=None):
+        self.project_name = project_name
+        self.input_names = list(input_names)
+        self.output_names = list(output_names)
+        self.input_shapes = [tuple(shape) for shape in input_shapes]
+        self.output_shapes = [tuple(shape) for shape in output_shapes]
+        self.input_sizes = [int(np.prod(shape)) for shape in self.input_shapes]
+        self.output_sizes = [int(np.prod(shape)) for shape in self.output_shapes]
+        self.input_raw_dtypes = list(input_raw_dtypes) if input_raw_dtypes is not None else [None] * len(self.input_names)
+        self.output_raw_dtypes = list(output_raw_dtypes) if output_raw_dtypes is not None else [None] * len(self.output_names)
+
+        self._lib = ctypes.cdll.LoadLibrary(lib_path)
+
+        # Weights are loaded on the first call, resolve their location once so that predict doesn't depend on the cwd
+        set_weights_dir = self._lib.set_weights_dir
+        set_weights_dir.argtypes = [ctypes.c_char_p]
+        set_weights_dir.restype = None
+        set_weights_dir(weights_dir.encode('utf-8'))
+
+        n_buffers = len(self.input_sizes) + len(self.output_sizes)
+        self._batch_functions = {}
+        self._top_functions = {}
+        for dtype, (type_name, ctype) in self._type_names.items():
+            batch_function = getattr(self._lib, '{}_batch_{}'.format(project_name, type_name))
+            batch_function.argtypes = [ctypes.c_void_p] * n_buffers + [ctypes.c_size_t]
+            batch_function.restype = None
+            self._batch_functions[dtype] = batch_function
+
+            top_function = getattr(self._lib, '{}_{}'.format(project_name, type_name))
+            top_function.argtypes = [ctypes.c_void_p] * n_buffers + [ctypes.POINTER(ctypes.c_ushort)] * n_buffers
+            top_function.restype = None
+            self._top_functions[dtype] = top_function
+
+        self._raw_function = self._lib['{}_batch_raw'.format(project_name)]
+        self._raw_function.argtypes = [ctypes.c_void_p] * n_buffers + [ctypes.c_size_t]
+        self._raw_function.restype = None
+
+        self._set_weights = self._lib.set_weights
+        self._set_weights.argtypes = [ctypes.c_char_p, ctypes.c_void_p, ctypes.c_size_t]
+        self._set_weights.restype = ctypes.c_bool
+
+        self._start_trace = self._lib.start_trace
+        self._start_trace.argtypes = [ctypes.c_size_t]
+        self._start_trace.restype = None
+        self._start_trace_statistics = self._lib.start_trace_statistics
+        self._start_trace_statistics.argtypes = []
+        self._start_trace_statistics.restype = None
+        self._set_trace_output = self._lib.set_trace_output
+        self._set_trace_output.argtypes = [ctypes.c_char_p, ctypes.c_void_p]
+        self._set_trace_output.restype = None
+        self._stop_trace = self._lib.stop_trace
+        self._stop_trace.argtypes = []
+        self._stop_trace.restype = None
+
+    @property
+    def lib(self):
+        return self._lib
+
+    def close(self):
+        """Unload the library. The predictor can't be used afterwards."""
+        if self._lib is None:
+            return
+
+        if platform.system() == "Linux":
+            dlclose_func = ctypes.CDLL(ctypes.util.find_library('dl')).dlclose
+        elif platform.system() == "Darwin":
+            dlclose_func = ctypes.CDLL('libc.dylib').dlclose
+
+        dlclose_func.argtypes = [ctypes.c_void_p]
+        dlclose_func.restype = ctypes.c_int
+        dlclose_func(self._lib._handle)
+        self._lib = None
+        self._batch_functions = {}
+        self._top_functions = {}
+        self._raw_function = None
+        self._set_weights = None
+        self._start_trace = None
+        self._start_trace_statistics = None
+        self._set_trace_output = None
+        self._stop_trace = None
+
+    def set_weights(self, name, data):
+        """
+        Replace weights of the loaded library, without recompiling it
+
+        Parameters
+        ----------
+        name : str
+            Name of the weights in the project, e.g., 'w2'
+        data : numpy.ndarray
+            Raw bit patterns of the new values, in the integer type and layout of the binary weight
+            files, see `VivadoWriter.get_raw_weights`
+        """
+        data = np.ascontiguousarray(data)
+        if not self._set_weights(name.encode('utf-8'), data.ctypes.data, data.size):
+            raise Exception('Unable to set the weights "{}" of project "{}"'.format(name, self.project_name))
+
+    def _check_array(self, x, what='Array'):
+        if not isinstance(x, np.ndarray):
+            raise Exception('Expected numpy.ndarray, but got {}'.format(type(x)))
+        if not x.flags['C_CONTIGUOUS']:
+            raise Exception('{} must be c_contiguous, try using numpy.ascontiguousarray(x)'.format(what))
+
+    def _check_raw_dtypes(self):
+        unsupported = [name for name, dtype in zip(self.input_names + self.output_names, self.input_raw_dtypes + self.output_raw_dtypes) if dtype is None]
+        if len(unsupported) > 0:
+            raise Exception('Raw I/O is not supported for the types of: {}'.format(', '.join(unsupported)))
+
+    def get_inputs(self, x, raw=False):
+        """
+        Returns the list of input arrays, ordered as the inputs of the model, and the number of samples.
+
+        `x` can be a single array (for models with one input), a list of arrays or a dictionary
+        mapping the names of the input layers to arrays. If `raw` is True, the arrays must have the
+        integer types holding the bit patterns of the input types.
+        """
+        if self._lib is None:
+            raise Exception('Library of project "{}" has been unloaded'.format(self.project_name))
+
+        if isinstance(x, dict):
+            missing = [name for name in self.input_names if name not in x]
+            if len(missing) > 0:
+                raise Exception('Missing data for input(s): {}'.format(', '.join(missing)))
+            x = [x[name] for name in self.input_names]
+        elif not isinstance(x, (list, tuple)):
+            x = [x]
+        if len(x) != len(self.input_names):
+            raise Exception('Expected {} input array(s), but got {}'.format(len(self.input_names), len(x)))
+
+        n_samples = None
+        for i, xi in enumerate(x):
+            self._check_array(xi)
+            if raw:
+                if xi.dtype != self.input_raw_dtypes[i]:
+                    raise Exception('Invalid type ({}) of raw input "{}", expected {}'.format(xi.dtype, self.input_names[i], self.input_raw_dtypes[i]))
+            elif xi.dtype not in self._type_names:
+                raise Exception('Invalid type ({}) of numpy array. Supported types are: single, float32, double, float64.'.format(xi.dtype))
+            elif xi.dtype != x[0].dtype:
+                raise Exception('All inputs must have the same type, got {} and {}'.format(x[0].dtype, xi.dtype))
+            n, rem = divmod(xi.size, self.input_sizes[i])
+            if rem != 0:
+                raise Exception('Input size mismatch for "{}", got {}, expected {}'.format(self.input_names[i], xi.shape, self.input_shapes[i]))
+            if n_samples is not None and n != n_samples:
+                raise Exception('All inputs must have the same number of samples, got {} and {}'.format(n_samples, n))
+            n_samples = n
+
+        return list(x), n_samples
+
+    def get_top_function(self, dtype):
+        """Returns the single-sample top function and its ctypes element type for the given dtype."""
+        return self._top_functions[np.dtype(dtype)], self._type_names[np.dtype(dtype)][1]
+
+    def _get_outputs(self, out, dtypes, n_samples):
+        if out is None:
+            return [np.empty((n_samples, size), dtype=dtype) for size, dtype in zip(self.output_sizes, dtypes)]
+
+        if not isinstance(out, (list, tuple)):
+            out = [out]
+        if len(out) != len(self.output_sizes):
+            raise Exception('Expected {} output buffer(s), but got {}'.format(len(self.output_sizes), len(out)))
+
+        for i, o in enumerate(out):
+            self._check_array(o, what='Output buffer')
+            if not o.flags['WRITEABLE']:
+                raise Exception('Output buffer must be writeable')
+            if o.dtype != dtypes[i]:
+                raise Exception('Output buffer type ({}) must be {}'.format(o.dtype, dtypes[i]))
+            if o.size != n_samples * self.output_sizes[i]:
+                raise Exception('Output buffer size mismatch, got {}, expected {} samples of shape {}'.format(o.shape, n_samples, self.output_shapes[i]))
+
+        return [o.reshape(n_samples, -1) for o in out]
+
+    def predict(self, x, n_jobs=1, out=None, raw=False):
+        """
+        Run the C simulation on the input `x`
+
+        Parameters
+        ----------
+        x : numpy.ndarray, list or dict
+            Input data, either a single sample or a batch of samples. Must be C-contiguous.
+            Models with multiple inputs expect a list of arrays (in the order of the model inputs)
+            or a dictionary mapping the names of the input layers to arrays.
+        n_jobs : int, optional
+            Number of threads to use. The batch is split into `n_jobs` contiguous chunks
+            that are evaluated concurrently. -1 uses all available cores. Default is 1.
+        out : numpy.ndarray or list, optional
+            Preallocated C-contiguous buffer with the dtype of the predictions and room for all
+            predictions, e.g., of shape (n_samples, n_outputs). The results are written directly
+            into it, which allows reusing a single buffer across calls. Models with multiple
+            outputs expect a list of buffers.
+        raw : bool, optional
+            If True, the inputs and outputs are the raw bit patterns of the input and result types
+            of the model, stored in the smallest integer type that fits them (e.g., numpy.int16 for
+            ap_fixed<16,6>, where the value 1.5 is stored as 1.5 * 2**10). This avoids the conversion
+            from/to floating point and reduces the memory traffic. Default is False.
+
+        Returns
+        -------
+        numpy.ndarray or list
+            The predictions of the model, a list of arrays for models with multiple outputs.
+            If `out` is given, `out` itself is returned.
+        """
+        if raw:
+            self._check_raw_dtypes()
+        x, n_samples = self.get_inputs(x, raw=raw)
+        if raw:
+            batch_function = self._raw_function
+            output_dtypes = self.output_raw_dtypes
+        else:
+            batch_function = self._batch_functions[x[0].dtype]
+            output_dtypes = [x[0].dtype] * len(self.output_sizes)
+        output = self._get_outputs(out, output_dtypes, n_samples)
+
+        if n_jobs is None or n_jobs == 0:
+            n_jobs = 1
+        elif n_jobs < 0:
+            n_jobs = cpu_count()
+        n_jobs = min(n_jobs, n_samples)
+
+        if n_jobs > 1:
+            x = [xi.reshape(n_samples, -1) for xi in x]
+            bounds = np.linspace(0, n_samples, n_jobs + 1).astype(int)
+            chunks = [[a[start:end].ctypes.data for a in x + output] + [end - start] for start, end in zip(bounds[:-1], bounds[1:])]
+            pool = ThreadPool(n_jobs)
+            try:
+                pool.map(lambda chunk: batch_function(*chunk), chunks)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            batch_function(*([a.ctypes.data for a in x + output] + [n_samples]))
+
+        if out is not None:
+            return out
+        elif n_samples == 1:
+            output = [o[0] for o in output]
+
+        if len(output) == 1:
+            return output[0]
+        else:
+            return output
+
+    def trace(self, x, layer_shapes, stats=False):
+        """
+        Run the C simulation on the input `x` and collect the outputs of the traced layers
+
+        The outputs of each layer are written by the library directly into a preallocated array
+        of shape (n_samples, *layer_shape), all samples are evaluated in a single call. Other
+        predictions must not run concurrently on the same library while tracing.
+
+        Parameters
+        ----------
+        x : numpy.ndarray, list or dict
+            Input data, see `predict`.
+        layer_shapes : dict
+            Maps the names of the layers to trace to the shapes of their outputs. Only layers
+            compiled with trace hooks can be traced.
+        stats : bool, optional
+            If True, the library only accumulates the minimum, maximum, number of zeros and the
+            histogram of the powers of two of the outputs of each layer (see `TraceStats.to_dict`)
+            instead of storing them, so the memory doesn't grow with the number of samples.
+            Default is False.
+
+        Returns
+        -------
+        tuple
+            Predictions, as returned by `predict`, and a dictionary mapping the names of the
+            traced layers to their outputs (or summaries, if `stats` is True).
+        """
+        x, n_samples = self.get_inputs(x)
+        ctype = self._type_names[x[0].dtype][1]
+
+        trace_output = {}
+        for layer_name, shape in layer_shapes.items():
+            if stats:
+                trace_output[layer_name] = TraceStats(min=np.inf, max=-np.inf)
+            else:
+                trace_output[layer_name] = np.zeros((n_samples,) + tuple(shape), dtype=x[0].dtype)
+
+        if stats:
+            self._start_trace_statistics()
+        else:
+            self._start_trace(ctypes.sizeof(ctype))
+        try:
+            for layer_name, layer_output in trace_output.items():
+                if stats:
+                    data = ctypes.addressof(layer_output)
+                else:
+                    data = layer_output.ctypes.data
+                self._set_trace_output(layer_name.encode('utf-8'), data)
+            output = self.predict(x)
+        finally:
+            self._stop_trace()
+
+        if stats:
+            trace_output = dict((layer_name, layer_stats.to_dict()) for layer_name, layer_stats in trace_output.items())
+
+        return output, trace_output
+
+    def _split_source(self, source):
+        # Returns the sliceable input arrays (e.g., numpy.memmap or h5py.Dataset) in the order of the model inputs
+        if isinstance(source, six.string_types):
+            source = np.load(source, mmap_mode='r')
+        if isinstance(source, dict):
+            missing = [name for name in self.input_names if name not in source]
+            if len(missing) > 0:
+                raise Exception('Missing data for input(s): {}'.format(', '.join(missing)))
+            return [source[name] for name in self.input_names]
+        elif isinstance(source, (list, tuple)):
+            if len(source) == len(self.input_names) and all(hasattr(a, 'shape') and len(a.shape) > 0 for a in source):
+                return list(source)
+        elif hasattr(source, 'shape') and hasattr(source, '__getitem__'):
+            return [source]
+        return None
+
+    def predict_iter(self, source, chunk_size=1024, n_jobs=1, raw=False):
+        """
+        Run the C simulation chunk by chunk, holding only one chunk of inputs and outputs in memory
+
+        Parameters
+        ----------
+        source : array-like, str or iterable
+            Input data. An array with samples along the first axis (e.g., numpy.memmap or
+            h5py.Dataset, or a list/dict of them for models with multiple inputs) is read in
+            slices of `chunk_size` samples. A string is interpreted as the path of a .npy file,
+            which is memory-mapped. Any other iterable must yield inputs accepted by `predict`,
+            which are evaluated one at a time.
+        chunk_size : int, optional
+            Number of samples per chunk for sliceable sources. Default is 1024.
+        n_jobs : int, optional
+            Number of threads used for each chunk, see `predict`.
+        raw : bool, optional
+            Whether the inputs and outputs are raw bit patterns, see `predict`.
+
+        Yields
+        ------
+        numpy.ndarray or list
+            The predictions for each chunk, a list of arrays for models with multiple outputs.
+            The samples are always along the first axis, also for single samples yielded by
+            an iterable source.
+        """
+        for x in self._iter_chunks(source, chunk_size):
+            output = self.predict(x, n_jobs=n_jobs, raw=raw)
+            if x[0].size == self.input_sizes[0]:
+                # Keep the batch dimension, predict drops it for single samples
+                output = [o[np.newaxis] for o in output] if isinstance(output, list) else output[np.newaxis]
+            yield output
+
+    def _iter_chunks(self, source, chunk_size):
+        # Yields the list of input arrays of each chunk of `source` (see predict_iter), with the samples along the first axis
+        if chunk_size < 1:
+            raise Exception('chunk_size must be positive, got {}'.format(chunk_size))
+
+        arrays = self._split_source(source)
+        if arrays is None:
+            for x in source:
+                if isinstance(x, dict):
+                    missing = [name for name in self.input_names if name not in x]
+                    if len(missing) > 0:
+                        raise Exception('Missing data for input(s): {}'.format(', '.join(missing)))
+                    x = [x[name] for name in self.input_names]
+                elif not isinstance(x, (list, tuple)):
+                    x = [x]
+                x = [np.ascontiguousarray(xi) for xi in x]
+                if len(x) == len(self.input_shapes) and all(xi.ndim == len(shape) for xi, shape in zip(x, self.input_shapes)):
+                    # A single sample, add the batch dimension like for the chunks sliced from arrays
+                    x = [xi[np.newaxis] for xi in x]
+                yield x
+            return
+
+        n_samples = arrays[0].shape[0]
+        for a in arrays[1:]:
+            if a.shape[0] != n_samples:
+                raise Exception('All inputs must have the same number of samples, got {} and {}'.format(n_samples, a.shape[0]))
+
+        for start in range(0, n_samples, chunk_size):
+            end = min(start + chunk_size, n_samples)
+            yield [np.ascontiguousarray(a[start:end]) for a in arrays]
+
+    def trace_to_hdf5(self, source, layer_shapes, filename, chunk_size=1024):
+        """
+        Trace the model chunk by chunk and append the outputs of the traced layers to an HDF5 file
+
+        Only one chunk of inputs and layer outputs is held in memory, so the traced data can be
+        larger than the available RAM. The file has one resizable dataset of shape
+        (n_samples, *layer_shape) per traced layer, named after the layer, and the predictions of
+        the model in the group 'predictions', with one dataset per output.
+
+        Parameters
+        ----------
+        source : array-like, str or iterable
+            Input data, see `predict_iter`.
+        layer_shapes : dict
+            Maps the names of the layers to trace to the shapes of their outputs, see `trace`.
+        filename : str
+            Path of the HDF5 file, overwritten if it exists.
+        chunk_size : int, optional
+            Number of samples per chunk for sliceable sources. Default is 1024.
+
+        Returns
+        -------
+        int
+            Number of traced samples.
+        """
+        n_samples = 0
+        with h5py.File(filename, 'w') as h5file:
+            for x in self._iter_chunks(source, chunk_size):
+                x, n = self.get_inputs(x)
+                output, trace_output = self.trace(x, layer_shapes)
+                if not isinstance(output, list):
+                    output = [output]
+
+                data = {}
+                for layer_name, layer_output in trace_output.items():
+                    data[layer_name] = layer_output
+                for output_name, shape, o in zip(self.output_names, self.output_shapes, output):
+                    data['predictions/' + output_name] = o.reshape((n,) + shape)
+
+                for name, d in data.items():
+                    if name not in h5file:
+                        h5file.create_dataset(name, shape=(0,) + d.shape[1:], maxshape=(None,) + d.shape[1:], dtype=d.dtype, chunks=True)
+                    dataset = h5file[name]
+                    dataset.resize(n_samples + n, axis=0)
+                    dataset[n_samples:] = d
+                n_samples += n
+
+        return n_samples
+
+class BatchingWorker(object):
+    """
+    Worker thread evaluating the requests submitted from other threads with a Predictor.
+
+    Requests that are waiting while the worker is busy are coalesced into a single batched
+    call of the library, and the predictions are split back per request. This keeps the
+    per-call overhead low when many small requests arrive concurrently, e.g., from a server.
+
+    Parameters
+    ----------
+    predictor : Predictor
+        The handle to the compiled library used by the worker.
+    max_batch_size : int, optional
+        Maximum number of samples merged into one call. A single larger request is still
+        evaluated as a whole. Default is 4096.
+    max_delay : float, optional
+        Time in seconds to wait for more requests before starting a call, trading latency
+        for larger batches. Default is 0, i.e., only requests that are already waiting are merged.
+    n_jobs : int, optional
+        Number of threads used for each call, see `Predictor.predict`. Default is 1.
+    """
+
+    def __init__(self, predictor, max_batch_size=4096, max_delay=0., n_jobs=1):
+        if Future is None:
+            raise Exception('BatchingWorker requires concurrent.futures')
+        if max_batch_size < 1:
+            raise Exception('max_batch_size must be positive, got {}'.format(max_batch_size))
+
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.n_jobs = n_jobs
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='hls4ml-{}-worker'.format(predictor.project_name))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, x):
+        """
+        Queue the input `x` for prediction
+
+        Parameters
+        ----------
+        x : numpy.ndarray, list or dict
+            Input data, see `Predictor.predict`. Raw inputs are not supported.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Future holding the predictions, as returned by `Predictor.predict`.
+        """
+        x, n_samples = self.predictor.get_inputs(x)
+        x = [xi.reshape(n_samples, -1) for xi in x]
+
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise Exception('Worker of project "{}" has been closed'.format(self.predictor.project_name))
+            self._queue.put((x, n_samples, future))
+
+        return future
+
+    def close(self):
+        """Stop the worker after evaluating the requests already submitted."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
+    def _get_requests(self):
+        # Waits for one request, then collects the ones that can be merged with it
+        request = self._queue.get()
+        if request is None:
+            return [], True
+
+        requests = [request]
+        n_samples = request[1]
+        deadline = time.time() + self.max_delay
+        while n_samples < self.max_batch_size:
+            try:
+                timeout = deadline - time.time()
+                if timeout > 0:
+                    request = self._queue.get(timeout=timeout)
+                else:
+                    request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                return requests, True
+            requests.append(request)
+            n_samples += request[1]
+
+        return requests, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            requests, stop = self._get_requests()
+            try:
+                # Only inputs of the same type can share a call
+                groups = {}
+                for request in requests:
+                    if request[2].set_running_or_notify_cancel():
+                        groups.setdefault(request[0][0].dtype, []).append(request)
+                for group in groups.values():
+                    self._predict(group)
+            except Exception as e:
+                # Keep serving the next requests, the failed ones get the exception
+                for request in requests:
+                    if not request[2].done():
+                        request[2].set_exception(e)
+
+    def _predict(self, requests):
+        try:
+            n_samples = sum(request[1] for request in requests)
+            if len(requests) > 1:
+                x = [np.concatenate([request[0][i] for request in requests]) for i in range(len(self.predictor.input_sizes))]
+            else:
+                x = requests[0][0]
+            output = [np.empty((n_samples, size), dtype=x[0].dtype) for size in self.predictor.output_sizes]
+
+            self.predictor.predict(x, n_jobs=self.n_jobs, out=output)
+        except Exception as e:
+            if len(requests) > 1:
+                # Evaluate the requests one by one, so that only the invalid ones fail
+                for request in requests:
+                    self._predict([request])
+            else:
+                requests[0][2].set_exception(e)
+            return
+
+        start = 0
+        for _, n, future in requests:
+            result = [o[start:start + n] for o in output]
+            if n == 1:
+                result = [r[0] for r in result]
+            future.set_result(result[0] if len(result) == 1 else result)
+            start += n
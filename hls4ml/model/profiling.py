@@ -27,6 +27,36 @@ def array_to_summary(x, fmt='boxplot'):
              'b' : np.log2(b)}
     return y
 
+def stats_to_summary(stats, fmt='boxplot'):
+    """
+    Convert the summary of the outputs of a layer accumulated by HLSModel.trace(..., stats=True)
+    to the format of array_to_summary. The quantiles are interpolated within the power of 2 bins.
+    Returns None if all values are zero.
+    """
+    h = stats['hist']
+    nonzero = np.nonzero(h)[0]
+    if len(nonzero) == 0:
+        return None
+    low, high = nonzero[0], nonzero[-1]
+    if fmt == 'boxplot':
+        cdf = np.cumsum(h) * 1. / float(sum(h))
+        def quantile(q):
+            i = np.searchsorted(cdf, q)
+            prev = cdf[i - 1] if i > 0 else 0.
+            return 2. ** (stats['log2'][i] + (q - prev) / (cdf[i] - prev))
+        y = {'med' : quantile(0.5),
+             'q1' : quantile(0.25),
+             'q3' : quantile(0.75),
+             'whislo' : 2. ** stats['log2'][low],
+             'whishi' : max(abs(stats['min']), abs(stats['max']))
+        }
+    elif fmt == 'histogram':
+        h = h[low:high + 1]
+        h = h * 1. / float(sum(h)) # normalize
+        y = {'h' : h,
+             'b' : np.arange(stats['log2'][low], stats['log2'][high] + 2)}
+    return y
+
 def boxplot(data, fmt='longform'):
     if fmt == 'longform':
         f = plt.figure() #figsize=(3, 3))
@@ -254,6 +284,32 @@ def activations_keras(model, X, fmt='longform', plot='boxplot'):
         data = pandas.DataFrame(data)
     return data
 
+def activations_hlsmodel(model, X, fmt='summary', plot='boxplot'):
+    layers = [layer.name for layer in model.get_layers() if layer.function_cpp()]
+    if fmt == 'longform':
+        data = {'x' : [], 'weight' : []}
+        _, trace = model.trace(X, layers=layers)
+    elif fmt == 'summary':
+        # The summaries are accumulated by the compiled model, the outputs aren't stored
+        data = []
+        _, trace = model.trace(X, layers=layers, stats=True)
+
+    for layer_name in layers:
+        if fmt == 'longform':
+            y = trace[layer_name].flatten()
+            y = abs(y[y != 0])
+            data['x'].extend(y.tolist())
+            data['weight'].extend([layer_name for i in range(len(y))])
+        elif fmt == 'summary':
+            y = stats_to_summary(trace[layer_name], fmt=plot)
+            if y is not None:
+                data.append(y)
+                data[-1]['weight'] = layer_name
+
+    if fmt == 'longform':
+        data = pandas.DataFrame(data)
+    return data
+
 def numerical(keras_model=None, hls_model=None, X=None, plot='boxplot'):
     """
     Perform numerical profiling of a model
@@ -301,6 +357,12 @@ def numerical(keras_model=None, hls_model=None, X=None, plot='boxplot'):
         ap = plots[plot](data, fmt='summary') # activation plot
         plt.title("Distribution of (non-zero) activations")
         plt.tight_layout()
+    elif X is not None and isinstance(hls_model, HLSModel):
+        print("Profiling activations")
+        data = activations_hlsmodel(hls_model, X, fmt='summary', plot=plot)
+        ap = plots[plot](data, fmt='summary') # activation plot
+        plt.title("Distribution of (non-zero) activations")
+        plt.tight_layout()
 
     if X is not None and isinstance(hls_model, HLSModel):
         t_data = activation_types_hlsmodel(hls_model)
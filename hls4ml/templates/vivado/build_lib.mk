@@ -0,0 +1,23 @@
+# Builds the C simulation library, invoked by build_lib.sh which sets the compiler and its flags.
+# The objects are kept in build/, so only the translation units whose sources (or flags) changed are rebuilt.
+
+SRCS := firmware/$(PROJECT).cpp $(PROJECT)_bridge.cpp $(wildcard firmware/units/*.cpp)
+OBJS := $(patsubst %.cpp,build/%.o,$(SRCS))
+FLAGS_FILE := build/flags
+
+# Rebuild everything if the compiler flags changed since the last build
+$(shell mkdir -p build && (echo '$(CC) $(CFLAGS) $(INCFLAGS)' | cmp -s - $(FLAGS_FILE) || echo '$(CC) $(CFLAGS) $(INCFLAGS)' > $(FLAGS_FILE)))
+
+# Always relink, the set of units may have changed
+firmware/$(PROJECT).so: $(OBJS) FORCE
+	$(CC) $(CFLAGS) $(INCFLAGS) -shared $(OBJS) -o $@ $(LDFLAGS)
+
+build/%.o: %.cpp $(FLAGS_FILE)
+	@mkdir -p $(dir $@)
+	$(CC) $(CFLAGS) $(INCFLAGS) -DHLS4ML_SPLIT_UNITS -MMD -MP -c $< -o $@
+
+FORCE:
+
+.PHONY: FORCE
+
+-include $(OBJS:.o=.d)
@@ -8,9 +8,23 @@ elif [[ "$OSTYPE" == "darwin"* ]]; then
 fi
 LDFLAGS=
 INCFLAGS="-Ifirmware/ap_types/"
+#hls-fpga-machine-learning insert build profile
 PROJECT=myproject
 
-${CC} ${CFLAGS} ${INCFLAGS} -c firmware/${PROJECT}.cpp -o ${PROJECT}.o
-${CC} ${CFLAGS} ${INCFLAGS} -c ${PROJECT}_bridge.cpp -o ${PROJECT}_bridge.o
-${CC} ${CFLAGS} ${INCFLAGS} -shared ${PROJECT}.o ${PROJECT}_bridge.o -o firmware/${PROJECT}.so
-rm -f *.o
\ No newline at end of file
+# Number of translation units compiled in parallel, defaults to the number of cores
+JOBS=${HLS4ML_BUILD_JOBS:-$(getconf _NPROCESSORS_ONLN 2>/dev/null || echo 1)}
+
+if command -v make > /dev/null 2>&1; then
+    make -j${JOBS} -f build_lib.mk CC="${CC}" CFLAGS="${CFLAGS}" LDFLAGS="${LDFLAGS}" INCFLAGS="${INCFLAGS}" PROJECT=${PROJECT}
+else
+    # Without make, rebuild all the sources one after the other
+    OBJS=
+    for SRC in firmware/${PROJECT}.cpp ${PROJECT}_bridge.cpp firmware/units/*.cpp; do
+        [[ -f "${SRC}" ]] || continue
+        OBJ=build/${SRC%.cpp}.o
+        mkdir -p $(dirname ${OBJ})
+        ${CC} ${CFLAGS} ${INCFLAGS} -DHLS4ML_SPLIT_UNITS -c ${SRC} -o ${OBJ} || exit 1
+        OBJS="${OBJS} ${OBJ}"
+    done
+    ${CC} ${CFLAGS} ${INCFLAGS} -shared ${OBJS} -o firmware/${PROJECT}.so ${LDFLAGS}
+fi
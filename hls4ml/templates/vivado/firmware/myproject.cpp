@@ -20,6 +20,30 @@
 
 #include "myproject.h"
 #include "parameters.h"
+//hls-fpga-machine-learning insert units
+
+#ifndef __SYNTHESIS__
+static bool load_weights() {
+    //hls-fpga-machine-learning insert load weights
+    return true;
+}
+
+static bool weights_loaded() {
+    // Thread-safe static initialization, weights are loaded once even with concurrent callers
+    static bool loaded = load_weights();
+    return loaded;
+}
+
+// Replaces the weights `name` by the n_values raw bit patterns in data, in the layout of the
+// binary weight files. Returns false if there are no such weights or the size doesn't match.
+bool myproject_set_weights(const char *name, const void *data, size_t n_values) {
+    // Load the remaining weights first, so that they don't overwrite the new ones later
+    weights_loaded();
+    std::string var_name(name);
+    //hls-fpga-machine-learning insert set weights
+    return false;
+}
+#endif
 
 void myproject(
 	//hls-fpga-machine-learning insert header
@@ -28,11 +52,7 @@ void myproject(
     //hls-fpga-machine-learning insert IO
 
 #ifndef __SYNTHESIS__
-    static bool loaded_weights = false;
-    if (!loaded_weights) {
-        //hls-fpga-machine-learning insert load weights
-        loaded_weights = true;
-    }
+    weights_loaded();
 #endif
 
     // ****************************************
@@ -31,4 +31,9 @@ void myproject(
     //hls-fpga-machine-learning insert header
 );
 
+#ifndef __SYNTHESIS__
+// Updates the weights of the C simulation, see myproject.cpp
+bool myproject_set_weights(const char *name, const void *data, size_t n_values);
+#endif
+
 #endif
@@ -5,45 +5,55 @@
 #include "firmware/nnet_utils/nnet_helpers.h"
 #include <algorithm>
 #include <map>
+#include <stdint.h>
 
 namespace nnet {
     bool trace_enabled = false;
+    bool trace_statistics = false;
     std::map<std::string, void *> *trace_outputs = NULL;
     size_t trace_type_size = sizeof(double);
+    std::string weights_dir = "weights";
 }
 
 extern "C" {
 
-struct trace_data {
-    const char *name;
-    void *data;
-};
+void set_weights_dir(const char *dir) {
+    nnet::weights_dir = dir;
+}
+
+// Replaces the weights `name` of the loaded library by n_values raw bit patterns of their type,
+// returns false if there are no such weights or the size doesn't match
+bool set_weights(const char *name, const void *data, size_t n_values) {
+    return myproject_set_weights(name, data, n_values);
+}
 
-void allocate_trace_storage(size_t element_size) {
+// Enables the trace hooks, element_size selects the type of the trace buffers (float or double)
+void start_trace(size_t element_size) {
     nnet::trace_enabled = true;
     nnet::trace_outputs = new std::map<std::string, void *>;
     nnet::trace_type_size = element_size;
-    //hls-fpga-machine-learning insert trace_outputs
 }
 
-void free_trace_storage() {
-    for (std::map<std::string, void *>::iterator i = nnet::trace_outputs->begin(); i != nnet::trace_outputs->end(); i++) {
-        void *ptr = i->second;
-        free(ptr);
-    }
-    nnet::trace_outputs->clear();
+// Enables the trace hooks in statistics mode, the outputs of the traced layers are summarized in
+// the registered trace_stats instead of being stored
+void start_trace_statistics() {
+    nnet::trace_enabled = true;
+    nnet::trace_statistics = true;
+    nnet::trace_outputs = new std::map<std::string, void *>;
+}
+
+// Registers the buffer receiving the outputs of a traced layer. It must have room for the outputs of
+// all samples evaluated until stop_trace, each call of the top function appends the next sample.
+// In statistics mode, data points to a nnet::trace_stats struct instead.
+void set_trace_output(const char *layer_name, void *data) {
+    (*nnet::trace_outputs)[layer_name] = data;
+}
+
+void stop_trace() {
     delete nnet::trace_outputs;
     nnet::trace_outputs = NULL;
     nnet::trace_enabled = false;
-}
-
-void collect_trace_output(struct trace_data *c_trace_outputs) {
-    int ii = 0;
-    for (std::map<std::string, void *>::iterator i = nnet::trace_outputs->begin(); i != nnet::trace_outputs->end(); i++) {
-        c_trace_outputs[ii].name = i->first.c_str();
-        c_trace_outputs[ii].data = i->second;
-        ii++;
-    }
+    nnet::trace_statistics = false;
 }
 
 // Wrapper of top level function for Python bridge
@@ -60,6 +70,26 @@ void myproject_double(
     //hls-fpga-machine-learning insert wrapper #double
 }
 
+// Batched wrappers, process n_samples consecutive samples in a single call
+void myproject_batch_float(
+    //hls-fpga-machine-learning insert batch header #float
+) {
+    //hls-fpga-machine-learning insert batch wrapper #float
+}
+
+void myproject_batch_double(
+    //hls-fpga-machine-learning insert batch header #double
+) {
+    //hls-fpga-machine-learning insert batch wrapper #double
+}
+
+// Batched wrapper operating on the raw bit patterns of the input and result types, skips the float conversion
+void myproject_batch_raw(
+    //hls-fpga-machine-learning insert batch header #raw
+) {
+    //hls-fpga-machine-learning insert batch wrapper #raw
+}
+
 }
 
 #endif
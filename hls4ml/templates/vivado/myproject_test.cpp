@@ -31,12 +31,16 @@
 
 namespace nnet {
     bool trace_enabled = true;
+    bool trace_statistics = false;
     std::map<std::string, void *> *trace_outputs = NULL;
     size_t trace_type_size = sizeof(double);
+    std::string weights_dir = "weights";
 }
 
 int main(int argc, char **argv)
 {
+  //hls-fpga-machine-learning insert trace layers
+
   //load input data from text file
   std::ifstream fin("tb_data/tb_input_features.dat");
   //load predictions from text file
@@ -26,6 +26,10 @@
 
 namespace nnet {
 
+// Outside of synthesis, the lookup tables are static and filled by the initializer of the static
+// 'initialized' flag. C++11 guarantees it runs exactly once, even when predict() calls the model
+// from several threads, so the 'if (!initialized)' branches below are only taken during synthesis.
+
 struct activ_config
 {
     // IO size
@@ -144,8 +148,8 @@ void  sigmoid(data_T data[CONFIG_T::n_in], res_T res[CONFIG_T::n_in])
     bool initialized = false;
     typename CONFIG_T::table_t sigmoid_table[CONFIG_T::table_size];
 #else
-    static bool initialized = false;
     static typename CONFIG_T::table_t sigmoid_table[CONFIG_T::table_size];
+    static bool initialized = (init_sigmoid_table<CONFIG_T, CONFIG_T::table_size>(sigmoid_table), true);
 #endif
     if (!initialized) {
         init_sigmoid_table<CONFIG_T, CONFIG_T::table_size>(sigmoid_table);
@@ -224,10 +228,10 @@ void softmax(data_T data[CONFIG_T::n_in], res_T res[CONFIG_T::n_in]){
     typename CONFIG_T::exp_table_t exp_table[CONFIG_T::table_size];
     typename CONFIG_T::inv_table_t invert_table[CONFIG_T::table_size];
 #else
-    static bool initialized = false;
     static typename CONFIG_T::exp_table_t exp_table[CONFIG_T::table_size];
     static typename CONFIG_T::inv_table_t invert_table[CONFIG_T::table_size];
-
+    static bool initialized = (init_exp_table<data_T, CONFIG_T>(exp_table),
+                               init_invert_table<typename CONFIG_T::exp_table_t, CONFIG_T>(invert_table), true);
 #endif
     if (!initialized) {
         // Note we are exponentiating the inputs, which have type data_T
@@ -286,8 +290,8 @@ void  tanh(data_T data[CONFIG_T::n_in], res_T res[CONFIG_T::n_in])
     bool initialized = false;
     typename CONFIG_T::table_t tanh_table[CONFIG_T::table_size];
 #else
-    static bool initialized = false;
     static typename CONFIG_T::table_t tanh_table[CONFIG_T::table_size];
+    static bool initialized = (init_tanh_table<CONFIG_T, CONFIG_T::table_size>(tanh_table), true);
 #endif
     if (!initialized) {
         init_tanh_table<CONFIG_T, CONFIG_T::table_size>(tanh_table);
@@ -410,8 +414,8 @@ void  softplus(data_T data[CONFIG_T::n_in], res_T res[CONFIG_T::n_in])
     bool initialized = false;
     typename CONFIG_T::table_t softplus_table[CONFIG_T::table_size];
 #else
-    static bool initialized = false;
     static typename CONFIG_T::table_t softplus_table[CONFIG_T::table_size];
+    static bool initialized = (init_softplus_table<CONFIG_T, CONFIG_T::table_size>(softplus_table), true);
 #endif
     if (!initialized) {
         init_softplus_table<CONFIG_T, CONFIG_T::table_size>(softplus_table);
@@ -467,8 +471,8 @@ void  softsign(data_T data[CONFIG_T::n_in], res_T res[CONFIG_T::n_in])
     bool initialized = false;
     typename CONFIG_T::table_t softsign_table[CONFIG_T::table_size];
 #else
-    static bool initialized = false;
     static typename CONFIG_T::table_t softsign_table[CONFIG_T::table_size];
+    static bool initialized = (init_softsign_table<CONFIG_T, CONFIG_T::table_size>(softsign_table), true);
 #endif
     if (!initialized) {
         init_softsign_table<CONFIG_T, CONFIG_T::table_size>(softsign_table);
@@ -524,8 +528,8 @@ void  elu(data_T data[CONFIG_T::n_in], const res_T alpha, res_T res[CONFIG_T::n_
     bool initialized = false;
     typename CONFIG_T::table_t elu_table[CONFIG_T::table_size];
 #else
-    static bool initialized = false;
     static typename CONFIG_T::table_t elu_table[CONFIG_T::table_size];
+    static bool initialized = (init_elu_table<CONFIG_T, CONFIG_T::table_size>(elu_table), true);
 #endif
     if (!initialized) {
         init_elu_table<CONFIG_T, CONFIG_T::table_size>(elu_table);
@@ -590,8 +594,8 @@ void  selu(data_T data[CONFIG_T::n_in], res_T res[CONFIG_T::n_in])
     bool initialized = false;
     typename CONFIG_T::table_t selu_table[CONFIG_T::table_size];
 #else
-    static bool initialized = false;
     static typename CONFIG_T::table_t selu_table[CONFIG_T::table_size];
+    static bool initialized = (init_selu_table<CONFIG_T, CONFIG_T::table_size>(selu_table), true);
 #endif
     if (!initialized) {
         init_selu_table<CONFIG_T, CONFIG_T::table_size>(selu_table);
@@ -24,20 +24,35 @@
 #include <stdlib.h>
 #include <math.h>
 #include <fstream>
+#include <string>
 #include <algorithm>
 #include <map>
+#include <vector>
+#include <limits>
+#include <stdint.h>
+#ifndef __SYNTHESIS__
+#if defined(__unix__) || defined(__APPLE__)
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#define NNET_MMAP_WEIGHTS
+#endif
+#endif
+#include "ap_fixed.h"
 #include "hls_stream.h"
 
 namespace nnet {
 
 #ifndef __SYNTHESIS__
 
-#define WEIGHTS_DIR "weights"
+// Directory with the weight files, set once before the first call of the top function
+extern std::string weights_dir;
 
 template<class T, size_t SIZE>
 void load_weights_from_txt(T *w, const char* fname) {
 
-    std::string full_path = std::string(WEIGHTS_DIR) + "/" + std::string(fname);
+    std::string full_path = weights_dir + "/" + std::string(fname);
     std::ifstream infile(full_path.c_str(), std::ios::binary);
 
     if (infile.fail()) {
@@ -66,7 +81,7 @@ void load_weights_from_txt(T *w, const char* fname) {
 template<class T, size_t SIZE>
 void load_compressed_weights_from_txt(T *w, const char* fname) {
 
-    std::string full_path = std::string(WEIGHTS_DIR) + "/" + std::string(fname);
+    std::string full_path = weights_dir + "/" + std::string(fname);
     std::ifstream infile(full_path.c_str(), std::ios::binary);
 
     if (infile.fail()) {
@@ -109,6 +124,59 @@ void load_compressed_weights_from_txt(T *w, const char* fname) {
     }
 }
 
+// Copies the raw bit patterns (e.g., 16-bit integers for ap_fixed<16,6>) into the ap types
+template<class rawType, class dataType, size_t SIZE>
+void convert_raw_to_data(rawType *src, dataType *dst) {
+    for (size_t i = 0; i < SIZE; i++) {
+        dst[i].range() = src[i];
+    }
+}
+
+// Loads weights stored as raw bit patterns of type rawType, written by VivadoWriter.print_array_to_bin
+template<class T, class rawType, size_t SIZE>
+void load_weights_from_bin(T *w, const char* fname) {
+
+    std::string full_path = weights_dir + "/" + std::string(fname);
+    size_t expected_size = SIZE * sizeof(rawType);
+
+#ifdef NNET_MMAP_WEIGHTS
+    int fd = open(full_path.c_str(), O_RDONLY);
+    if (fd < 0) {
+        std::cerr << "ERROR: file " << std::string(fname) << " does not exist" << std::endl;
+        exit(1);
+    }
+
+    struct stat st;
+    if (fstat(fd, &st) != 0 || (size_t) st.st_size != expected_size) {
+        std::cerr << "ERROR: Expected " << SIZE << " values in " << std::string(fname) << std::endl;
+        close(fd);
+        exit(1);
+    }
+
+    void *data = mmap(NULL, expected_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (data == MAP_FAILED) {
+        std::cerr << "ERROR: Unable to map file " << std::string(fname) << std::endl;
+        exit(1);
+    }
+    convert_raw_to_data<rawType, T, SIZE>((rawType *) data, w);
+    munmap(data, expected_size);
+#else
+    std::ifstream infile(full_path.c_str(), std::ios::binary);
+    if (infile.fail()) {
+        std::cerr << "ERROR: file " << std::string(fname) << " does not exist" << std::endl;
+        exit(1);
+    }
+
+    std::vector<rawType> data(SIZE);
+    if (!infile.read((char *) &data[0], expected_size)) {
+        std::cerr << "ERROR: Expected " << SIZE << " values in " << std::string(fname) << std::endl;
+        exit(1);
+    }
+    convert_raw_to_data<rawType, T, SIZE>(&data[0], w);
+#endif
+}
+
 template<class srcType, class dstType, size_t SIZE>
 void convert_data(srcType *src, dstType *dst) {
     for (size_t i = 0; i < SIZE; i++) {
@@ -116,10 +184,52 @@ void convert_data(srcType *src, dstType *dst) {
     }
 }
 
+// Extracts the bit patterns of the ap types, sign-extended to the width of rawType if rawType is signed
+template<class dataType, class rawType, size_t SIZE>
+void convert_data_to_raw(dataType *src, rawType *dst) {
+    for (size_t i = 0; i < SIZE; i++) {
+        ap_int_base<dataType::width, std::numeric_limits<rawType>::is_signed> bits = src[i].range();
+        dst[i] = rawType(bits.to_int64());
+    }
+}
+
 extern bool trace_enabled;
+extern bool trace_statistics;
 extern std::map<std::string, void *> *trace_outputs;
 extern size_t trace_type_size;
 
+// Summary of the outputs of a traced layer, accumulated over all samples instead of storing them.
+// hist[i] counts the non-zero values with floor(log2(abs(x))) == i + TRACE_HIST_LOW, values outside
+// of the range are counted in the first/last bin.
+#define TRACE_HIST_LOW -64
+#define TRACE_HIST_BINS 128
+
+struct trace_stats {
+    double min;
+    double max;
+    unsigned long long n_values;
+    unsigned long long n_zeros;
+    unsigned long long hist[TRACE_HIST_BINS];
+};
+
+template<class data_T>
+void update_output_stats(data_T *data, trace_stats *stats, size_t layer_size) {
+    for(int i = 0; i < layer_size; i++) {
+        double x = double(data[i]);
+        if (x < stats->min) stats->min = x;
+        if (x > stats->max) stats->max = x;
+        if (x == 0) {
+            stats->n_zeros++;
+        } else {
+            int exp;
+            frexp(x, &exp); // abs(x) is in [2^(exp-1), 2^exp)
+            int bin = std::min(std::max(exp - 1 - TRACE_HIST_LOW, 0), TRACE_HIST_BINS - 1);
+            stats->hist[bin]++;
+        }
+    }
+    stats->n_values += layer_size;
+}
+
 template<class data_T, class save_T>
 void save_output_array(data_T *data, save_T *ptr, size_t layer_size) {
     for(int i = 0; i < layer_size; i++) {
@@ -128,23 +238,29 @@ void save_output_array(data_T *data, save_T *ptr, size_t layer_size) {
 }
 
 // We don't want to include save_T in this function because it will be inserted into myproject.cpp
-// so a workaround with element size is used
+// so a workaround with element size is used.
+// The hooks of all layers are compiled in, only the layers in trace_outputs are traced. Their outputs
+// are appended to the registered buffer, accumulated in the registered trace_stats if trace_statistics
+// is set, or logged to a file if the buffer is NULL (test bench).
 template<class data_T>
 void save_layer_output(data_T *data, const char *layer_name, size_t layer_size) {
-    if (!trace_enabled) return;
-    
-    if (trace_outputs) {
-        if (trace_outputs->count(layer_name) > 0) {
-            if (trace_type_size == 4) {
-                save_output_array<data_T, float>(data, (float *) (*trace_outputs)[layer_name], layer_size);
-            } else if (trace_type_size == 8) {
-                save_output_array<data_T, double>(data, (double *) (*trace_outputs)[layer_name], layer_size);
-            } else {
-                std::cout << "Unknown trace type!" << std::endl;
-            }
+    if (!trace_enabled || !trace_outputs) return;
+
+    std::map<std::string, void *>::iterator trace = trace_outputs->find(layer_name);
+    if (trace == trace_outputs->end()) return;
+
+    if (trace->second && trace_statistics) {
+        update_output_stats<data_T>(data, (trace_stats *) trace->second, layer_size);
+    } else if (trace->second) {
+        if (trace_type_size == 4) {
+            save_output_array<data_T, float>(data, (float *) trace->second, layer_size);
+        } else if (trace_type_size == 8) {
+            save_output_array<data_T, double>(data, (double *) trace->second, layer_size);
         } else {
-            std::cout << "Layer name: " << layer_name << " not found in debug storage!" << std::endl;
+            std::cout << "Unknown trace type!" << std::endl;
         }
+        // Move on to the storage of the next sample
+        trace->second = (void *) ((char *) trace->second + layer_size * trace_type_size);
     } else {
         std::ostringstream filename;
         filename << "./tb_data/" << layer_name << "_output.log"; //TODO if run as a shared lib, path should be ../tb_data
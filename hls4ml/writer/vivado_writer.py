@@ -6,20 +6,70 @@ import numpy as np
 import os
 import re
 import glob
+import copy
+import fnmatch
+import hashlib
+import json
+import threading
 from collections import OrderedDict
+from multiprocessing import Pool, cpu_count
 
 from hls4ml.writer.writers import Writer
+from hls4ml.model.hls_layers import InplaceVariable
+
+def _write_weights_job(job):
+    # Entry point of the processes writing the weight files, see VivadoWriter.write_weights.
+    # Returns the manifest entries of the written files.
+    var, odir, dtype = job
+    writer = VivadoWriter()
+    writer._manifest_dir = odir
+    writer._manifest = {}
+    writer.print_array_to_cpp(var, odir)
+    if dtype is not None:
+        writer.print_array_to_bin(var, odir, dtype)
+    return writer._manifest
+
+class _OutputFile(object):
+    """Text file of the project, collected in memory and written on close, see VivadoWriter._write_if_changed"""
+
+    def __init__(self, writer, path):
+        self._writer = writer
+        self._path = path
+        self._chunks = []
+
+    def write(self, text):
+        self._chunks.append(text)
+
+    def close(self):
+        if self._chunks is not None:
+            self._writer._write_if_changed(self._path, ''.join(self._chunks))
+            self._chunks = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
 
 class VivadoWriter(Writer):
 
+    manifest_name = 'hls4ml_manifest.json'
+
+    def __init__(self):
+        super(VivadoWriter, self).__init__()
+        self._tar_thread = None
+        self._manifest_dir = None
+        self._manifest = None
+
     def print_array_to_cpp(self, var, odir, write_txt_file=True):
         #######################################
         ## Print weight array to C++
         #######################################
 
-        h_file = open("{}/firmware/weights/{}.h".format(odir,var.name),"w")
+        h_file = self._open_output("{}/firmware/weights/{}.h".format(odir,var.name))
         if write_txt_file:
-            txt_file = open("{}/firmware/weights/{}.txt".format(odir,var.name),"w")
+            txt_file = self._open_output("{}/firmware/weights/{}.txt".format(odir,var.name))
 
         #meta data
         h_file.write("//Numpy array shape {}\n".format(var.shape))
@@ -34,7 +84,12 @@ class VivadoWriter(Writer):
 
         if write_txt_file:
             h_file.write("#ifndef __SYNTHESIS__\n")
+            # Defined in the top function's translation unit, the layer units only refer to it
+            h_file.write("#ifdef HLS4ML_UNIT\n")
+            h_file.write("extern " + var.definition_cpp() + ";\n")
+            h_file.write("#else\n")
             h_file.write(var.definition_cpp() + ";\n")
+            h_file.write("#endif\n")
             h_file.write("#else\n")
 
         h_file.write(var.definition_cpp() + " = {")
@@ -42,10 +97,10 @@ class VivadoWriter(Writer):
         #fill c++ array.
         #not including internal brackets for multidimensional case
         sep = ''
-        for x in var:
-            h_file.write(sep + x)
+        for chunk in var.format_chunks():
+            h_file.write(sep + chunk)
             if write_txt_file:
-                txt_file.write(sep + x)
+                txt_file.write(sep + chunk)
             sep = ", "
         h_file.write("};\n")
         if write_txt_file:
@@ -54,6 +109,44 @@ class VivadoWriter(Writer):
         h_file.write("\n#endif\n")
         h_file.close()
 
+    @staticmethod
+    def _get_bin_dtype(model, var):
+        """
+        Returns the numpy type of the raw bit patterns of the weights `var` in the binary weight
+        files, or None if they are written only as text. Binary files are used if "WeightsFormat"
+        is 'bin' (the default is 'txt'), except for compressed weights and types whose conversion
+        can't be reproduced exactly (see `emulator.can_quantize`), e.g., with saturation bits.
+        """
+        from hls4ml.model.emulator import can_quantize
+
+        if model.config.get_config_value('WeightsFormat', 'txt') != 'bin':
+            return None
+        if var.__class__.__name__ == 'CompressedWeightVariable':
+            return None
+        if not can_quantize(var.type.precision):
+            return None
+        return var.type.raw_dtype()
+
+    @staticmethod
+    def get_raw_weights(var, dtype):
+        """
+        Returns the flattened raw bit patterns of the weights `var` as an array of type `dtype`,
+        as they are stored in the binary weight files and passed to the set_weights function of
+        the C simulation library.
+        """
+        from hls4ml.model.emulator import quantize, parse_precision, _fractional_bits
+
+        # Same values as in the text file, as converted by the C++ compiler/loader
+        precision = parse_precision(var.type.precision)
+        values = quantize(var.formatted_values(), precision, from_float=True)
+        return np.ldexp(values, _fractional_bits(precision)).astype(dtype)
+
+    def print_array_to_bin(self, var, odir, dtype):
+        #######################################
+        ## Write the raw bit patterns of a weight array
+        #######################################
+        self._write_if_changed("{}/firmware/weights/{}.bin".format(odir, var.name), self.get_raw_weights(var, dtype).tobytes())
+
     def write_project_dir(self, model):
         if not os.path.isdir("{}/firmware/weights".format(model.config.get_output_dir())):
             os.makedirs("{}/firmware/weights".format(model.config.get_output_dir()))
@@ -92,6 +185,156 @@ class VivadoWriter(Writer):
         elif mode == 'stream':
             return '#pragma HLS STREAM variable={name} depth={depth} dim={dim}'.format(name=variable.name, depth=depth, dim=0)
 
+    @staticmethod
+    def _get_units(model):
+        """
+        Groups the layers into the translation units of the C simulation library, which are compiled
+        in parallel. Each unit holds up to "LayersPerUnit" consecutive layers with weights and the
+        layers without weights following them, which are cheap to compile. 0 (the default) builds
+        the library from the monolithic project source instead. Returns None if the library isn't split.
+        """
+        layers_per_unit = model.config.get_config_value('LayersPerUnit', 0)
+        if not layers_per_unit:
+            return None
+
+        groups = []
+        n_weighted = 0
+        for layer in model.get_layers():
+            if not layer.function_cpp():
+                continue
+            has_weights = len(layer.get_weights()) > 0
+            if len(groups) == 0 or (has_weights and n_weighted == layers_per_unit):
+                groups.append([])
+                n_weighted = 0
+            groups[-1].append(layer)
+            if has_weights:
+                n_weighted += 1
+
+        units = OrderedDict()
+        for group in groups:
+            units['layer{}'.format(group[0].index)] = group
+        return units
+
+    @staticmethod
+    def _get_unit_variables(layer):
+        # Input and output variables of a layer, the arguments of its function in the C simulation units.
+        # Inplace variables (e.g., the output of a Reshape) are passed as the arrays they refer to.
+        variables = OrderedDict()
+        for var in [layer.get_input_variable(input_name) for input_name in layer.inputs] + [layer.get_output_variable()]:
+            while isinstance(var, InplaceVariable):
+                var = var.proxy
+            variables[var.cppname] = var
+        return list(variables.values())
+
+    def _write_if_changed(self, path, content):
+        # All files of the project are written here. Unchanged files are not rewritten and keep their
+        # modification time, so that make and Vivado HLS only rebuild what changed.
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        changed = True
+        # Files linked to a shared copy of the templates are replaced by a copy of their own
+        if os.path.isfile(path) and not os.path.islink(path) and os.stat(path).st_nlink == 1 and os.path.getsize(path) == len(content):
+            with open(path, 'rb') as f:
+                changed = f.read() != content
+        if changed:
+            if os.path.lexists(path):
+                os.remove(path)
+            with open(path, 'wb') as f:
+                f.write(content)
+
+        if self._manifest is not None:
+            rel_path = os.path.relpath(path, self._manifest_dir).replace(os.sep, '/')
+            self._manifest[rel_path] = {'sha256': hashlib.sha256(content).hexdigest(), 'size': len(content)}
+
+    def _open_output(self, path):
+        return _OutputFile(self, path)
+
+    def _copy_if_changed(self, src, dst):
+        with open(src, 'rb') as f:
+            self._write_if_changed(dst, f.read())
+
+    def _get_file_layers(self, model):
+        # Layers of the files specific to layers, the weights and the units of the C simulation library
+        file_layers = {}
+        for layer in model.get_layers():
+            for w in layer.get_weights():
+                for ext in ['h', 'txt', 'bin']:
+                    file_layers['firmware/weights/{}.{}'.format(w.name, ext)] = [layer.name]
+        units = self._get_units(model)
+        if units is not None:
+            for unit_name, layers in units.items():
+                file_layers['firmware/units/{}.cpp'.format(unit_name)] = [layer.name for layer in layers]
+        return file_layers
+
+    def _begin_manifest(self, model, update=False):
+        self._manifest_dir = model.config.get_output_dir()
+        self._manifest = {}
+        manifest_path = os.path.join(self._manifest_dir, self.manifest_name)
+        if update and os.path.isfile(manifest_path):
+            with open(manifest_path, 'r') as f:
+                self._manifest = json.load(f)['files']
+
+    def write_manifest(self, model):
+        """
+        Writes the manifest of the files generated since `_begin_manifest` to hls4ml_manifest.json in
+        the project, with the SHA-256 hash, size and layers of each file. Files of a shared copy of
+        the templates are listed as links.
+        """
+        file_layers = self._get_file_layers(model)
+        files = self._manifest
+        for path, entry in files.items():
+            if 'link' not in entry:
+                entry['layers'] = file_layers.get(path, [])
+        self._manifest = None
+
+        manifest = {'project': model.config.get_project_name(), 'files': files}
+        self._write_if_changed(os.path.join(model.config.get_output_dir(), self.manifest_name), json.dumps(manifest, indent=2, sort_keys=True) + '\n')
+
+    def write_units(self, model):
+        ###################
+        ## firmware/units
+        ###################
+
+        unitdir = '{}/firmware/units'.format(model.config.get_output_dir())
+        units = self._get_units(model)
+        if units is None:
+            if os.path.isdir(unitdir):
+                rmtree(unitdir)
+            return
+
+        if not os.path.isdir(unitdir):
+            os.makedirs(unitdir)
+
+        header = '#ifndef UNITS_H_\n#define UNITS_H_\n\n#include "../{}.h"\n\n'.format(model.config.get_project_name())
+        header += '// Layer functions of the C simulation library, each layer is compiled in one of the units\n'
+        for layer in sum(units.values(), []):
+            args = ', '.join([var.definition_cpp() for var in self._get_unit_variables(layer)])
+            header += 'void layer{}_call({});\n'.format(layer.index, args)
+        header += '\n#endif\n'
+        self._write_if_changed(unitdir + '/units.h', header)
+
+        for unit_name, layers in units.items():
+            unit = '// C simulation of {}, compiled as a separate translation unit\n'.format(', '.join([layer.name for layer in layers]))
+            unit += '#define HLS4ML_UNIT\n'
+            unit += '#include "../{}.h"\n'.format(model.config.get_project_name())
+            unit += '#include "../parameters.h"\n'
+            for layer in layers:
+                for w in layer.get_weights():
+                    unit += '#include "../weights/{}.h"\n'.format(w.name)
+            unit += '#include "units.h"\n'
+            for layer in layers:
+                args = ', '.join([var.definition_cpp() for var in self._get_unit_variables(layer)])
+                unit += '\nvoid layer{}_call({}) {{\n'.format(layer.index, args)
+                for line in layer.function_cpp():
+                    unit += '    ' + line + '\n'
+                unit += '}\n'
+            self._write_if_changed('{}/{}.cpp'.format(unitdir, unit_name), unit)
+
+        # Remove the units of a previous configuration
+        for path in glob.glob(unitdir + '/*.cpp'):
+            if os.path.splitext(os.path.basename(path))[0] not in units:
+                os.remove(path)
+
     def write_project_cpp(self, model):
         ###################
         ## myproject.cpp
@@ -99,10 +342,11 @@ class VivadoWriter(Writer):
 
         filedir = os.path.dirname(os.path.abspath(__file__))
         f = open(os.path.join(filedir,'../templates/vivado/firmware/myproject.cpp'),'r')
-        fout = open('{}/firmware/{}.cpp'.format(model.config.get_output_dir(), model.config.get_project_name()),'w')
+        fout = self._open_output('{}/firmware/{}.cpp'.format(model.config.get_output_dir(), model.config.get_project_name()))
 
         model_inputs = model.get_input_variables()
         model_outputs = model.get_output_variables()
+        units = self._get_units(model)
 
         indent = '    '
 
@@ -110,6 +354,12 @@ class VivadoWriter(Writer):
             #Add headers to weights and biases
             if 'myproject' in line:
                 newline = line.replace('myproject', model.config.get_project_name())
+            elif '//hls-fpga-machine-learning insert units' in line:
+                newline = line
+                if units is not None:
+                    newline += '#ifdef HLS4ML_SPLIT_UNITS\n'
+                    newline += '#include "units/units.h"\n'
+                    newline += '#endif\n'
             elif '//hls-fpga-machine-learning insert header' in line:
                 inputs_str = ', '.join([i.definition_cpp() for i in model_inputs])
                 outputs_str = ', '.join([o.definition_cpp() for o in model_outputs])
@@ -126,10 +376,27 @@ class VivadoWriter(Writer):
                 newline = line
                 for layer in model.get_layers():
                     for w in layer.get_weights():
-                        if w.__class__.__name__ == 'CompressedWeightVariable':
-                            newline += indent + '    nnet::load_compressed_weights_from_txt<{}, {}>({}, "{}.txt");\n'.format(w.type.name, w.nonzeros, w.name, w.name)
+                        dtype = self._get_bin_dtype(model, w)
+                        if dtype is not None:
+                            newline += indent + 'nnet::load_weights_from_bin<{}, {}_t, {}>({}, "{}.bin");\n'.format(w.type.name, dtype.name, w.data_length, w.name, w.name)
+                        elif w.__class__.__name__ == 'CompressedWeightVariable':
+                            newline += indent + 'nnet::load_compressed_weights_from_txt<{}, {}>({}, "{}.txt");\n'.format(w.type.name, w.nonzeros, w.name, w.name)
                         else:
-                            newline += indent + '    nnet::load_weights_from_txt<{}, {}>({}, "{}.txt");\n'.format(w.type.name, w.data_length, w.name, w.name)
+                            newline += indent + 'nnet::load_weights_from_txt<{}, {}>({}, "{}.txt");\n'.format(w.type.name, w.data_length, w.name, w.name)
+
+            elif '//hls-fpga-machine-learning insert set weights' in line:
+                newline = line
+                from hls4ml.model.emulator import can_quantize
+                for layer in model.get_layers():
+                    for w in layer.get_weights():
+                        if w.__class__.__name__ == 'CompressedWeightVariable' or w.type.raw_dtype() is None or not can_quantize(w.type.precision):
+                            continue
+                        raw_type = self._raw_type_cpp(w)
+                        newline += indent + 'if (var_name == "{}") {{\n'.format(w.name)
+                        newline += indent + '    if (n_values != {}) return false;\n'.format(w.data_length)
+                        newline += indent + '    nnet::convert_raw_to_data<{}, {}, {}>(({} *) data, {});\n'.format(raw_type, w.type.name, w.data_length, raw_type, w.name)
+                        newline += indent + '    return true;\n'
+                        newline += indent + '}\n'
 
             #Add input/output type
             elif '//hls-fpga-machine-learning insert IO' in line:
@@ -172,13 +439,20 @@ class VivadoWriter(Writer):
                                     newline += '    ' + self._make_array_pragma(var) + '\n'
                     func = layer.function_cpp()
                     if func:
+                        if units is not None:
+                            # The C simulation library calls the layers compiled in the separate units
+                            newline += '#ifdef HLS4ML_SPLIT_UNITS\n'
+                            newline += '    layer{}_call({});\n'.format(layer.index, ', '.join([var.cppname for var in self._get_unit_variables(layer)]))
+                            newline += '#else\n'
                         for line in func:
                             newline += '    ' + line + '\n'
-                        if model.config.trace_output and model.config.get_layer_config_value(layer, 'Trace', False):
-                            newline += '#ifndef __SYNTHESIS__\n'
-                            for var in vars:
-                                newline += '    nnet::save_layer_output<{}>({}, "{}", {});\n'.format(var.type.name, var.name, layer.name, var.size_cpp())
+                        if units is not None:
                             newline += '#endif\n'
+                        # Trace hooks of all layers, which ones are traced is selected at runtime
+                        newline += '#ifndef __SYNTHESIS__\n'
+                        var = layer.get_output_variable()
+                        newline += '    nnet::save_layer_output<{}>({}, "{}", {});\n'.format(var.type.name, var.name, layer.name, var.size_cpp())
+                        newline += '#endif\n'
                         newline += '\n'
 
             #Just copy line
@@ -197,7 +471,7 @@ class VivadoWriter(Writer):
 
         filedir = os.path.dirname(os.path.abspath(__file__))
         f = open(os.path.join(filedir,'../templates/vivado/firmware/myproject.h'),'r')
-        fout = open('{}/firmware/{}.h'.format(model.config.get_output_dir(), model.config.get_project_name()),'w')
+        fout = self._open_output('{}/firmware/{}.h'.format(model.config.get_output_dir(), model.config.get_project_name()))
 
         model_inputs = model.get_input_variables()
         model_outputs = model.get_output_variables()
@@ -210,6 +484,8 @@ class VivadoWriter(Writer):
                 newline = line.replace('MYPROJECT',format(model.config.get_project_name().upper()))
             elif 'void myproject(' in line:
                 newline = 'void {}(\n'.format(model.config.get_project_name())
+            elif 'myproject' in line:
+                newline = line.replace('myproject', model.config.get_project_name())
             elif '//hls-fpga-machine-learning insert header' in line:
                 inputs_str = ', '.join([i.definition_cpp() for i in model_inputs])
                 outputs_str = ', '.join([o.definition_cpp() for o in model_outputs])
@@ -231,7 +507,7 @@ class VivadoWriter(Writer):
     def write_defines(self, model):
         filedir = os.path.dirname(os.path.abspath(__file__))
         f = open(os.path.join(filedir,'../templates/vivado/firmware/defines.h'),'r')
-        fout = open('{}/firmware/defines.h'.format(model.config.get_output_dir()),'w')
+        fout = self._open_output('{}/firmware/defines.h'.format(model.config.get_output_dir()))
 
         for line in f.readlines():
 
@@ -259,7 +535,7 @@ class VivadoWriter(Writer):
     def write_parameters(self, model):
         filedir = os.path.dirname(os.path.abspath(__file__))
         f = open(os.path.join(filedir,'../templates/vivado/firmware/parameters.h'),'r')
-        fout = open('{}/firmware/parameters.h'.format(model.config.get_output_dir()),'w')
+        fout = self._open_output('{}/firmware/parameters.h'.format(model.config.get_output_dir()))
 
         for line in f.readlines():
 
@@ -270,9 +546,12 @@ class VivadoWriter(Writer):
 
             elif '//hls-fpga-machine-learning insert weights' in line:
                 newline = line
+                # The units of the C simulation library only include the weights of their layers
+                newline += '#ifndef HLS4ML_UNIT\n'
                 for layer in model.get_layers():
                     for w in layer.get_weights():
                         newline += '#include "weights/{}.h"\n'.format(w.name)
+                newline += '#endif\n'
 
             elif "//hls-fpga-machine-learning insert layer-config" in line:
                 newline = line
@@ -286,10 +565,43 @@ class VivadoWriter(Writer):
         f.close()
         fout.close()
 
-    def write_weights(self, model):
+    def write_weights(self, model, pool=None):
+        """
+        Writes the weight files of all layers. If a process pool is given, the files are written
+        by its processes and the `multiprocessing.pool.AsyncResult` of the jobs is returned.
+        """
+        if pool is None:
+            for layer in model.get_layers():
+                for weights in layer.get_weights():
+                    self.write_weights_variable(model, weights)
+            return None
+
+        jobs = []
         for layer in model.get_layers():
             for weights in layer.get_weights():
-                self.print_array_to_cpp(weights, model.config.get_output_dir())
+                # Only the values and types are needed, the quantizers may not be picklable
+                var = copy.copy(weights)
+                var.quantizer = None
+                var.data_unquantized = None
+                var._iterator = None
+                jobs.append((var, model.config.get_output_dir(), self._get_bin_dtype(model, weights)))
+        # Largest arrays first, to balance the load of the processes
+        jobs.sort(key=lambda job: job[0].data_length, reverse=True)
+
+        return pool.map_async(_write_weights_job, jobs, chunksize=1)
+
+    def write_weights_variable(self, model, var):
+        self.wait_for_tar()
+        # Outside of write_hls, update the entries of the existing manifest
+        standalone = self._manifest is None
+        if standalone:
+            self._begin_manifest(model, update=True)
+        self.print_array_to_cpp(var, model.config.get_output_dir())
+        dtype = self._get_bin_dtype(model, var)
+        if dtype is not None:
+            self.print_array_to_bin(var, model.config.get_output_dir(), dtype)
+        if standalone:
+            self.write_manifest(model)
     
     def __make_dat_file(self, original_path, project_path): 
         """
@@ -314,7 +626,7 @@ class VivadoWriter(Writer):
                 f.write("\n")
 
         #Print out in dat file
-        with open(project_path, "w" ) as f:
+        with self._open_output(project_path) as f:
             print_data(f)
 
     def write_test_bench(self, model):
@@ -332,18 +644,18 @@ class VivadoWriter(Writer):
         
         if input_data:
             if input_data[-3:] == "dat":
-                copyfile(input_data, '{}/tb_data/tb_input_features.dat'.format(model.config.get_output_dir()))
+                self._copy_if_changed(input_data, '{}/tb_data/tb_input_features.dat'.format(model.config.get_output_dir()))
             else:
                 self.__make_dat_file(input_data,'{}/tb_data/tb_input_features.dat'.format(model.config.get_output_dir()))
         
         if output_predictions:
             if output_predictions[-3:] == "dat":
-                copyfile(output_predictions, '{}/tb_data/tb_output_predictions.dat'.format(model.config.get_output_dir()))
+                self._copy_if_changed(output_predictions, '{}/tb_data/tb_output_predictions.dat'.format(model.config.get_output_dir()))
             else:
                 self.__make_dat_file(output_predictions,'{}/tb_data/tb_output_predictions.dat'.format(model.config.get_output_dir()))
 
         f = open(os.path.join(filedir,'../templates/vivado/myproject_test.cpp'),'r')
-        fout = open('{}/{}_test.cpp'.format(model.config.get_output_dir(), model.config.get_project_name()),'w')
+        fout = self._open_output('{}/{}_test.cpp'.format(model.config.get_output_dir(), model.config.get_project_name()))
 
         for line in f.readlines():
             indent = ' ' * (len(line) - len(line.lstrip(' ')))
@@ -351,6 +663,16 @@ class VivadoWriter(Writer):
             #Insert numbers
             if 'myproject' in line:
                 newline = line.replace('myproject', model.config.get_project_name())
+            elif 'bool trace_enabled' in line:
+                # The trace hooks are always compiled in, only log the layer outputs if requested
+                newline = line.replace('true', 'true' if model.config.trace_output else 'false')
+            elif '//hls-fpga-machine-learning insert trace layers' in line:
+                newline = line
+                if model.config.trace_output:
+                    newline += indent + 'nnet::trace_outputs = new std::map<std::string, void *>;\n'
+                    for layer in model.get_layers():
+                        if layer.function_cpp() and model.config.get_layer_config_value(layer, 'Trace', False):
+                            newline += indent + '(*nnet::trace_outputs)["{}"] = NULL;\n'.format(layer.name)
             elif '//hls-fpga-machine-learning insert data' in line:
                 newline = line
                 newline += '      std::vector<float>::const_iterator in_begin = in.cbegin();\n'
@@ -412,6 +734,12 @@ class VivadoWriter(Writer):
         f.close()
         fout.close()
 
+    def _raw_type_cpp(self, var):
+        raw_dtype = var.type.raw_dtype()
+        if raw_dtype is None:
+            return 'void'
+        return '{}_t'.format(raw_dtype.name)
+
     def write_bridge(self, model):
         ###################
         # c++-python bridge
@@ -419,7 +747,7 @@ class VivadoWriter(Writer):
 
         filedir = os.path.dirname(os.path.abspath(__file__))
         f = open(os.path.join(filedir,'../templates/vivado/myproject_bridge.cpp'),'r')
-        fout = open('{}/{}_bridge.cpp'.format(model.config.get_output_dir(), model.config.get_project_name()),'w')
+        fout = self._open_output('{}/{}_bridge.cpp'.format(model.config.get_output_dir(), model.config.get_project_name()))
 
         model_inputs = model.get_input_variables()
         model_outputs = model.get_output_variables()
@@ -468,14 +796,63 @@ class VivadoWriter(Writer):
 
                 for o in model_outputs:
                     newline += indent + 'nnet::convert_data<{}, {}, {}>({}_ap, {});\n'.format(o.type.name, dtype, o.size_cpp(), o.cppname, o.cppname)
-            elif '//hls-fpga-machine-learning insert trace_outputs' in line:
+            elif '//hls-fpga-machine-learning insert batch header #raw' in line:
+                inputs_str = ', '.join(['{type} *{name}'.format(type=self._raw_type_cpp(i), name=i.cppname) for i in model_inputs])
+                outputs_str = ', '.join(['{type} *{name}'.format(type=self._raw_type_cpp(o), name=o.cppname) for o in model_outputs])
+
                 newline = ''
-                for layer in model.get_layers():
-                    if layer.function_cpp() and model.config.trace_output and model.config.get_layer_config_value(layer, 'Trace', False):
-                            vars = layer.get_variables()
-                            for var in vars:
-                                newline += indent + 'nnet::trace_outputs->insert(std::pair<std::string, void *>("{}", (void *) malloc({} * element_size)));\n'.format(layer.name, var.size_cpp())
-                    
+                newline += indent + inputs_str + ',\n'
+                newline += indent + outputs_str + ',\n'
+                newline += indent + 'size_t n_samples\n'
+            elif '//hls-fpga-machine-learning insert batch wrapper #raw' in line:
+                unsupported = [v.name for v in model_inputs + model_outputs if v.type.raw_dtype() is None]
+                if len(unsupported) > 0:
+                    newline = indent + '// Raw I/O is not supported for the types of: {}\n'.format(', '.join(unsupported))
+                else:
+                    input_size_vars = ','.join(['const_size_in_{}'.format(i) for i in range(1, len(model_inputs) + 1)])
+                    output_size_vars = ','.join(['const_size_out_{}'.format(o) for o in range(1, len(model_outputs) + 1)])
+                    input_vars = ','.join([i.cppname + '_ap' for i in model_inputs])
+                    output_vars = ','.join([o.cppname + '_ap' for o in model_outputs])
+
+                    newline = ''
+                    newline += indent + 'unsigned short {},{};\n'.format(input_size_vars, output_size_vars)
+                    newline += indent + 'for (size_t i = 0; i < n_samples; i++) {\n'
+                    for i in model_inputs:
+                        newline += indent + '    {type} {name}_ap[{shape}];\n'.format(type=i.type.name, name=i.cppname, shape=i.size_cpp())
+                        newline += indent + '    nnet::convert_raw_to_data<{}, {}, {}>({} + i * {}, {}_ap);\n'.format(self._raw_type_cpp(i), i.type.name, i.size_cpp(), i.cppname, i.size_cpp(), i.cppname)
+                    for o in model_outputs:
+                        newline += indent + '    {type} {name}_ap[{shape}];\n'.format(type=o.type.name, name=o.cppname, shape=o.size_cpp())
+                    newline += indent + '    {}({}, {}, {}, {});\n'.format(model.config.get_project_name(), input_vars, output_vars, input_size_vars, output_size_vars)
+                    for o in model_outputs:
+                        newline += indent + '    nnet::convert_data_to_raw<{}, {}, {}>({}_ap, {} + i * {});\n'.format(o.type.name, self._raw_type_cpp(o), o.size_cpp(), o.cppname, o.cppname, o.size_cpp())
+                    newline += indent + '}\n'
+            elif '//hls-fpga-machine-learning insert batch header' in line:
+                dtype = line.split('#', 1)[1].strip()
+                inputs_str = ', '.join(['{type} *{name}'.format(type=dtype, name=i.cppname) for i in model_inputs])
+                outputs_str = ', '.join(['{type} *{name}'.format(type=dtype, name=o.cppname) for o in model_outputs])
+
+                newline = ''
+                newline += indent + inputs_str + ',\n'
+                newline += indent + outputs_str + ',\n'
+                newline += indent + 'size_t n_samples\n'
+            elif '//hls-fpga-machine-learning insert batch wrapper' in line:
+                dtype = line.split('#', 1)[1].strip()
+                input_size_vars = ','.join(['const_size_in_{}'.format(i) for i in range(1, len(model_inputs) + 1)])
+                output_size_vars = ','.join(['const_size_out_{}'.format(o) for o in range(1, len(model_outputs) + 1)])
+                input_vars = ','.join(['{name} + i * {size}'.format(name=i.cppname, size=i.size_cpp()) for i in model_inputs])
+                output_vars = ','.join(['{name} + i * {size}'.format(name=o.cppname, size=o.size_cpp()) for o in model_outputs])
+
+                newline = ''
+                if model.config.get_build_profile().get('OpenMP', False):
+                    # The trace hooks append to shared buffers, the samples are traced sequentially
+                    newline += indent + '#pragma omp parallel for if(!nnet::trace_enabled)\n'
+                    newline += indent + 'for (size_t i = 0; i < n_samples; i++) {\n'
+                    newline += indent + '    unsigned short {},{};\n'.format(input_size_vars, output_size_vars)
+                else:
+                    newline += indent + 'unsigned short {},{};\n'.format(input_size_vars, output_size_vars)
+                    newline += indent + 'for (size_t i = 0; i < n_samples; i++) {\n'
+                newline += indent + '    {}_{}({}, {}, {}, {});\n'.format(model.config.get_project_name(), dtype, input_vars, output_vars, input_size_vars, output_size_vars)
+                newline += indent + '}\n'
             else:
                 newline = line
             fout.write(newline)
@@ -491,7 +868,7 @@ class VivadoWriter(Writer):
         filedir = os.path.dirname(os.path.abspath(__file__))
 
         f = open(os.path.join(filedir,'../templates/vivado/build_prj.tcl'),'r')
-        fout = open('{}/build_prj.tcl'.format(model.config.get_output_dir()),'w')
+        fout = self._open_output('{}/build_prj.tcl'.format(model.config.get_output_dir()))
 
         for line in f.readlines():
 
@@ -512,7 +889,7 @@ class VivadoWriter(Writer):
         ###################
 
         f = open(os.path.join(filedir,'../templates/vivado/vivado_synth.tcl'),'r')
-        fout = open('{}/vivado_synth.tcl'.format(model.config.get_output_dir()),'w')
+        fout = self._open_output('{}/vivado_synth.tcl'.format(model.config.get_output_dir()))
         for line in f.readlines():
             line = line.replace('myproject', model.config.get_project_name())
             if '-part' in line:
@@ -527,16 +904,154 @@ class VivadoWriter(Writer):
         ###################
 
         f = open(os.path.join(filedir,'../templates/vivado/build_lib.sh'),'r')
-        fout = open('{}/build_lib.sh'.format(model.config.get_output_dir()),'w')
+        fout = self._open_output('{}/build_lib.sh'.format(model.config.get_output_dir()))
+
+        profile = model.config.get_build_profile()
+        cflags = []
+        if profile.get('Debug', False):
+            cflags.extend(['-O0', '-g'])
+        if profile.get('Native', False):
+            cflags.append('-march=native')
+        if profile.get('LTO', False):
+            cflags.append('-flto')
+        if profile.get('OpenMP', False):
+            cflags.append('-fopenmp')
+        if profile.get('Sanitizer', None):
+            cflags.extend(['-fsanitize={}'.format(profile['Sanitizer']), '-fno-omit-frame-pointer'])
 
         for line in f.readlines():
             line = line.replace('myproject', model.config.get_project_name())
 
+            if '#hls-fpga-machine-learning insert build profile' in line:
+                if len(cflags) > 0:
+                    line += 'CFLAGS="${{CFLAGS}} {}"\n'.format(' '.join(cflags))
+                if profile.get('PGO', False):
+                    # Set by HLSModel.compile for the instrumented build and the optimized build
+                    line += 'if [[ "${HLS4ML_PGO}" == "generate" ]]; then\n'
+                    line += '    CFLAGS="${CFLAGS} -fprofile-generate"\n'
+                    line += 'elif [[ "${HLS4ML_PGO}" == "use" ]]; then\n'
+                    line += '    CFLAGS="${CFLAGS} -fprofile-use -fprofile-correction"\n'
+                    line += 'fi\n'
+
             fout.write(line)
         f.close()
         fout.close()
 
+        self._copy_if_changed(os.path.join(filedir,'../templates/vivado/build_lib.mk'), '{}/build_lib.mk'.format(model.config.get_output_dir()))
+
+    @staticmethod
+    def _remove_path(path):
+        if os.path.islink(path) or os.path.isfile(path):
+            os.remove(path)
+        elif os.path.isdir(path):
+            rmtree(path)
+
+    _templates_hash = None
+
+    @classmethod
+    def _get_templates_hash(cls):
+        # Hash of the content of nnet_utils and ap_types, computed once per process
+        if cls._templates_hash is None:
+            filedir = os.path.dirname(os.path.abspath(__file__))
+            templates_dir = os.path.join(filedir, '../templates/vivado')
+            files = sorted(glob.glob(os.path.join(templates_dir, 'nnet_utils', '*.h')))
+            for root, dirs, filenames in os.walk(os.path.join(templates_dir, 'ap_types')):
+                dirs.sort()
+                files.extend([os.path.join(root, filename) for filename in sorted(filenames)])
+
+            sha = hashlib.sha256()
+            for path in files:
+                sha.update(os.path.relpath(path, templates_dir).encode('utf-8'))
+                with open(path, 'rb') as f:
+                    sha.update(hashlib.sha256(f.read()).digest())
+            cls._templates_hash = sha.hexdigest()[:16]
+
+        return cls._templates_hash
+
+    def _install_shared_templates(self, model):
+        """
+        Returns the directory of the shared, read-only copy of nnet_utils and ap_types, installing
+        it first if needed. Copies are addressed by the hash of their content, in "SharedTemplatesDir"
+        (defaults to the compile cache directory, then ~/.cache/hls4ml).
+        """
+        base_dir = model.config.get_config_value('SharedTemplatesDir', model.config.compile_cache_dir)
+        if not base_dir:
+            base_dir = '~/.cache/hls4ml'
+        install_dir = os.path.join(os.path.expanduser(base_dir), 'templates', self._get_templates_hash())
+        if os.path.isdir(install_dir):
+            return install_dir
+
+        # Install under a temporary name, concurrent writers never see a partial copy
+        filedir = os.path.dirname(os.path.abspath(__file__))
+        tmp_dir = '{}.{}.tmp'.format(install_dir, os.getpid())
+        self._remove_path(tmp_dir)
+        os.makedirs(os.path.join(tmp_dir, 'nnet_utils'))
+        for h in glob.glob(os.path.join(filedir, '../templates/vivado/nnet_utils/*.h')):
+            copyfile(h, os.path.join(tmp_dir, 'nnet_utils', os.path.basename(h)))
+        copytree(os.path.join(filedir, '../templates/vivado/ap_types'), os.path.join(tmp_dir, 'ap_types'))
+        for root, _, filenames in os.walk(tmp_dir):
+            for filename in filenames:
+                os.chmod(os.path.join(root, filename), 0o444)
+
+        try:
+            os.rename(tmp_dir, install_dir)
+        except OSError:
+            # Installed by another process in the meantime
+            rmtree(tmp_dir)
+            if not os.path.isdir(install_dir):
+                raise
+
+        return install_dir
+
+    def _link_shared_templates(self, model, mode):
+        install_dir = self._install_shared_templates(model)
+        for subdir in ['nnet_utils', 'ap_types']:
+            srcpath = os.path.join(install_dir, subdir)
+            dstpath = '{}/firmware/{}'.format(model.config.get_output_dir(), subdir)
+            if self._manifest is not None:
+                self._manifest['firmware/' + subdir] = {'link': srcpath, 'templates_hash': self._get_templates_hash()}
+
+            if mode == 'symlink':
+                if os.path.islink(dstpath) and os.readlink(dstpath) == srcpath:
+                    continue
+                self._remove_path(dstpath)
+                os.symlink(srcpath, dstpath)
+                continue
+
+            if os.path.islink(dstpath):
+                os.remove(dstpath)
+            linked = set()
+            for root, _, filenames in os.walk(srcpath):
+                dstroot = os.path.join(dstpath, os.path.relpath(root, srcpath))
+                if not os.path.isdir(dstroot):
+                    os.makedirs(dstroot)
+                for filename in filenames:
+                    src = os.path.join(root, filename)
+                    dst = os.path.join(dstroot, filename)
+                    linked.add(os.path.normpath(dst))
+                    if os.path.exists(dst) and os.path.samefile(src, dst):
+                        continue
+                    self._remove_path(dst)
+                    try:
+                        os.link(src, dst)
+                    except OSError:
+                        # E.g., on another file system
+                        copyfile(src, dst)
+            for root, _, filenames in os.walk(dstpath):
+                for filename in filenames:
+                    if os.path.normpath(os.path.join(root, filename)) not in linked:
+                        os.remove(os.path.join(root, filename))
+
     def write_nnet_utils(self, model):
+        # "SharedTemplates" links nnet_utils and ap_types to a single shared copy, either with
+        # 'symlink' (directories) or 'hardlink' (files), instead of copying them into each project
+        mode = model.config.get_config_value('SharedTemplates', False)
+        if mode:
+            if mode not in ['symlink', 'hardlink']:
+                raise Exception('Invalid SharedTemplates "{}", valid values are: symlink, hardlink'.format(mode))
+            self._link_shared_templates(model, mode)
+            return
+
         ###################
         ## nnet_utils
         ###################
@@ -546,13 +1061,16 @@ class VivadoWriter(Writer):
         srcpath = os.path.join(filedir,'../templates/vivado/nnet_utils/')
         dstpath = '{}/firmware/nnet_utils/'.format(model.config.get_output_dir())
 
+        # Never write through links to a shared copy
+        if os.path.islink(dstpath.rstrip('/')):
+            os.remove(dstpath.rstrip('/'))
         if not os.path.exists(dstpath):
             os.mkdir(dstpath)
 
         headers = [os.path.basename(h) for h in glob.glob(srcpath + '*.h')]
 
         for h in headers:
-            copyfile(srcpath + h, dstpath + h)
+            self._copy_if_changed(srcpath + h, dstpath + h)
 
         ###################
         ## ap_types
@@ -563,30 +1081,154 @@ class VivadoWriter(Writer):
         srcpath = os.path.join(filedir,'../templates/vivado/ap_types/')
         dstpath = '{}/firmware/ap_types/'.format(model.config.get_output_dir())
 
-        if os.path.exists(dstpath):
-            rmtree(dstpath)
+        if os.path.islink(dstpath.rstrip('/')):
+            os.remove(dstpath.rstrip('/'))
 
-        copytree(srcpath, dstpath)
+        copied = set()
+        for root, _, filenames in os.walk(srcpath):
+            dstroot = os.path.join(dstpath, os.path.relpath(root, srcpath))
+            if not os.path.isdir(dstroot):
+                os.makedirs(dstroot)
+            for filename in filenames:
+                copied.add(os.path.normpath(os.path.join(dstroot, filename)))
+                self._copy_if_changed(os.path.join(root, filename), os.path.join(dstroot, filename))
+        for root, _, filenames in os.walk(dstpath):
+            for filename in filenames:
+                if os.path.normpath(os.path.join(root, filename)) not in copied:
+                    os.remove(os.path.join(root, filename))
+
+    _tar_compressions = {'gz' : '.tar.gz', 'bz2' : '.tar.bz2', 'xz' : '.tar.xz', 'none' : '.tar'}
+
+    @staticmethod
+    def get_tar_mode(model):
+        """
+        Returns when the project tarball is written, from "WriteTar" in the configuration: True (the
+        default) at the end of `write_hls`, 'async' in a background thread after `write_hls`,
+        'deferred' only before the synthesis (`HLSModel.build`) or False to never write it.
+        """
+        mode = model.config.get_config_value('WriteTar', True)
+        if isinstance(mode, bool):
+            return mode
+        if str(mode).lower() not in ['async', 'deferred']:
+            raise Exception('Invalid WriteTar "{}", valid values are: True, False, async, deferred'.format(mode))
+        return str(mode).lower()
+
+    def _is_tar_excluded(self, model, path):
+        # Intermediate files of the C simulation library, which are also rewritten during compile()
+        if path == 'build' or path.startswith('build/'):
+            return True
+        return fnmatch.fnmatch(path, 'firmware/{}.so*'.format(model.config.get_project_name()))
+
+    def _get_newest_mtime(self, model):
+        # Removed files are covered by the manifest, which lists all generated files
+        output_dir = model.config.get_output_dir()
+        newest = 0
+        for root, dirs, files in os.walk(output_dir, followlinks=True):
+            rel_root = os.path.relpath(root, output_dir).replace(os.sep, '/')
+            for name in files:
+                path = name if rel_root == '.' else rel_root + '/' + name
+                if not self._is_tar_excluded(model, path):
+                    newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+        return newest
 
     def write_tar(self, model):
         ###################
         # Tarball output
         ###################
 
-        with tarfile.open(model.config.get_output_dir() + '.tar.gz', mode='w:gz') as archive:
-            archive.add(model.config.get_output_dir(), recursive=True)
+        # "TarCompression" is one of gz (default), bz2, xz or none, gz and bz2 also use "TarCompressionLevel" (1-9)
+        compression = model.config.get_config_value('TarCompression', 'gz')
+        if compression not in self._tar_compressions:
+            raise Exception('Invalid TarCompression "{}", valid values are: {}'.format(compression, ', '.join(sorted(self._tar_compressions))))
+        output_dir = model.config.get_output_dir()
+        tar_name = output_dir + self._tar_compressions[compression]
+
+        # Up to date if no file has been modified since the archive was written
+        if os.path.isfile(tar_name) and os.path.getmtime(tar_name) > self._get_newest_mtime(model):
+            return
+
+        kwargs = {}
+        level = model.config.get_config_value('TarCompressionLevel')
+        if level is not None and compression in ['gz', 'bz2']:
+            kwargs['compresslevel'] = level
+
+        prefix = output_dir.replace(os.sep, '/').lstrip('/')
+        def exclude_filter(tarinfo):
+            path = tarinfo.name[len(prefix):].lstrip('/')
+            return None if self._is_tar_excluded(model, path) else tarinfo
+
+        # Write under a temporary name, the archive is either complete or absent
+        tmp_name = '{}.{}.tmp'.format(tar_name, os.getpid())
+        mode = 'w' if compression == 'none' else 'w:' + compression
+        try:
+            # Store the content of the shared templates, not the links
+            with tarfile.open(tmp_name, mode=mode, dereference=True, **kwargs) as archive:
+                archive.add(output_dir, recursive=True, filter=exclude_filter)
+            os.rename(tmp_name, tar_name)
+        finally:
+            if os.path.isfile(tmp_name):
+                os.remove(tmp_name)
+
+    def _write_tar_async(self, model):
+        try:
+            self.write_tar(model)
+        except Exception as e:
+            print('WARNING: Failed to write the project tarball: {}'.format(e))
+
+    def wait_for_tar(self):
+        """Wait for the project tarball being written in the background, if any"""
+        if self._tar_thread is not None:
+            self._tar_thread.join()
+            self._tar_thread = None
+
+    @staticmethod
+    def _get_writer_processes(model):
+        """
+        Returns the number of processes writing the weight files, from "WriterProcesses" in the
+        configuration. The default is 1, writing them in the main process, -1 uses all cores.
+        """
+        n_processes = model.config.get_config_value('WriterProcesses', 1)
+        if n_processes is None or n_processes == 0:
+            return 1
+        elif n_processes < 0:
+            return cpu_count()
+        return n_processes
 
     def write_hls(self, model):
         print('Writing HLS project')
+        # The background tarball of the previous write still reads the project
+        self.wait_for_tar()
         self.write_project_dir(model)
-        self.write_project_cpp(model)
-        self.write_project_header(model)
-        self.write_weights(model)
-        self.write_defines(model)
-        self.write_parameters(model)
-        self.write_test_bench(model)
-        self.write_bridge(model)
-        self.write_build_script(model)
-        self.write_nnet_utils(model)
-        self.write_tar(model)
+        self._begin_manifest(model)
+
+        # The weight files are written concurrently with the other sources
+        n_processes = self._get_writer_processes(model)
+        pool = Pool(n_processes) if n_processes > 1 else None
+        try:
+            weights_result = self.write_weights(model, pool=pool)
+            self.write_project_cpp(model)
+            self.write_units(model)
+            self.write_project_header(model)
+            self.write_defines(model)
+            self.write_parameters(model)
+            self.write_test_bench(model)
+            self.write_bridge(model)
+            self.write_build_script(model)
+            self.write_nnet_utils(model)
+            if weights_result is not None:
+                for entries in weights_result.get():
+                    self._manifest.update(entries)
+            self.write_manifest(model)
+        finally:
+            self._manifest = None
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        tar_mode = self.get_tar_mode(model)
+        if tar_mode is True:
+            self.write_tar(model)
+        elif tar_mode == 'async':
+            self._tar_thread = threading.Thread(target=self._write_tar_async, args=(model,))
+            self._tar_thread.start()
         print('Done')
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from hls4ml.model import HLSModel
+
+class DictReader(object):
+    """Reads the weights of the layers from a dictionary of dictionaries of arrays."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def get_weights_data(self, layer_name, var_name):
+        return self.data.get(layer_name, {}).get(var_name)
+
+    def get_weights_shape(self, layer_name, var_name):
+        data = self.get_weights_data(layer_name, var_name)
+        return data.shape if data is not None else None
+
+def _make_config(output_dir, **config):
+    hls_config = {
+        'OutputDir': str(output_dir),
+        'ProjectName': 'myproject',
+        'Backend': 'Vivado',
+        'XilinxPart': 'xcku115-flvb2104-2-e',
+        'ClockPeriod': 5,
+        'IOType': 'io_parallel',
+        'HLSConfig': {'Model': {'Precision': 'ap_fixed<16,6>', 'ReuseFactor': 1}},
+    }
+    hls_config.update(config)
+    return hls_config
+
+def _random_dense_data(seed=0):
+    rng = np.random.RandomState(seed)
+    return {
+        'fc1': {'kernel': rng.uniform(-1, 1, (4, 8)), 'bias': rng.uniform(-1, 1, 8)},
+        'bn1': {'gamma': rng.uniform(0.5, 2, 8), 'beta': rng.uniform(-1, 1, 8),
+                'moving_mean': rng.uniform(-1, 1, 8), 'moving_variance': rng.uniform(0.5, 2, 8)},
+        'fc2': {'kernel': rng.uniform(-1, 1, (8, 3)), 'bias': rng.uniform(-1, 1, 3)},
+    }
+
+def _dense_layers(batchnorm=True):
+    layers = [
+        {'class_name': 'InputLayer', 'name': 'input1', 'input_shape': [None, 4]},
+        {'class_name': 'Dense', 'name': 'fc1', 'n_in': 4, 'n_out': 8, 'activation': 'linear',
+         'weight_quantizer': None, 'bias_quantizer': None},
+    ]
+    if batchnorm:
+        layers.append({'class_name': 'BatchNormalization', 'name': 'bn1', 'n_in': 8, 'n_out': 8, 'n_filt': -1, 'epsilon': 1e-3})
+    layers += [
+        {'class_name': 'Activation', 'name': 'relu1', 'activation': 'relu'},
+        {'class_name': 'Dense', 'name': 'fc2', 'n_in': 8, 'n_out': 3, 'activation': 'linear',
+         'weight_quantizer': None, 'bias_quantizer': None},
+    ]
+    return layers
+
+@pytest.fixture
+def make_model(tmp_path):
+    """
+    Factory of HLSModels of Vivado projects in subdirectories of `tmp_path`, from a list of layers
+    and a dictionary of their weights. Keyword arguments update the configuration.
+    """
+    def make_model(layers, data, name='prj', inputs=None, outputs=None, **config):
+        return HLSModel(_make_config(tmp_path / name, **config), DictReader(data), layers, inputs=inputs, outputs=outputs)
+
+    return make_model
+
+@pytest.fixture
+def dense_data():
+    """Random weights of the Dense->BatchNormalization->ReLU->Dense model"""
+    return _random_dense_data()
+
+@pytest.fixture
+def make_dense_model(make_model, dense_data):
+    """
+    Factory of HLSModels of the Dense->BatchNormalization->ReLU->Dense model, with the weights
+    of `dense_data` by default
+    """
+    def make_dense_model(name='prj', batchnorm=True, data=None, **config):
+        return make_model(_dense_layers(batchnorm), dense_data if data is None else data, name=name, **config)
+
+    return make_dense_model
+
+@pytest.fixture(scope='module')
+def dense_model(tmp_path_factory):
+    """Compiled Dense->BatchNormalization->ReLU->Dense model, shared by the tests of a module"""
+    output_dir = tmp_path_factory.mktemp('dense_model') / 'prj'
+    model = HLSModel(_make_config(output_dir), DictReader(_random_dense_data()), _dense_layers())
+    model.compile()
+    return model
+
+@pytest.fixture
+def x():
+    return np.random.RandomState(1).uniform(-1, 1, (10, 4))
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from concurrent.futures import Future
+
+from hls4ml.model.predictor import BatchingWorker
+
+def test_malformed_request(dense_model, x):
+    # A long delay to merge the malformed request with the valid ones into one call
+    worker = BatchingWorker(dense_model._get_predictor(), max_delay=0.5)
+    try:
+        # Skip the validation of submit, as for a request the library can't evaluate
+        malformed = Future()
+        worker._queue.put(([np.zeros((1, 5))], 1, malformed))
+        valid = worker.submit(x)
+        with pytest.raises(Exception):
+            malformed.result(timeout=30)
+        np.testing.assert_array_equal(valid.result(timeout=30), dense_model.predict(x))
+
+        # The worker keeps serving later requests
+        np.testing.assert_array_equal(worker.submit(x[:1]).result(timeout=30), dense_model.predict(x[:1]))
+
+        broken = Future()
+        worker._queue.put((None, 1, broken))
+        with pytest.raises(Exception):
+            broken.result(timeout=30)
+        np.testing.assert_array_equal(worker.submit(x).result(timeout=30), dense_model.predict(x))
+    finally:
+        worker.close()
@@ -0,0 +1,28 @@
+import numpy as np
+
+def test_compile_profile(make_dense_model, tmp_path, x):
+    model = make_dense_model()
+    model.compile()
+    y = model.predict(x)
+
+    model.compile(profile='Debug')
+    assert '-O0' in (tmp_path / 'prj' / 'build_lib.sh').read_text()
+    np.testing.assert_array_equal(model.predict(x), y)
+
+    # The profile only applies to that build
+    assert 'BuildProfile' not in model.config.config
+    model.compile()
+    assert '-O0' not in (tmp_path / 'prj' / 'build_lib.sh').read_text()
+
+def test_pgo_data_in_build_key(make_dense_model, x, capfd):
+    model = make_dense_model(BuildProfile={'PGO': True})
+    model.compile(pgo_data=x)
+    y = model.predict(x)
+
+    model.compile(pgo_data=x.copy())
+    assert 'Sources unchanged' in capfd.readouterr().out
+
+    # Other training data give another profile, the library must be built again
+    model.compile(pgo_data=x[:5])
+    assert 'Sources unchanged' not in capfd.readouterr().out
+    np.testing.assert_array_equal(model.predict(x), y)
@@ -0,0 +1,43 @@
+import copy
+import numpy as np
+
+def test_recompile_changed_weights(make_dense_model, dense_data, x):
+    model = make_dense_model()
+    model.compile()
+    y = model.predict(x)
+
+    weights = model.graph['fc2'].get_weights('weight')
+    weights.update_data(weights.data * 0.5)
+    model.compile()
+    y_changed = model.predict(x)
+    assert not np.array_equal(y_changed, y)
+
+    # A second model written to the same directory replaces the first one
+    data = copy.deepcopy(dense_data)
+    data['fc2']['kernel'] *= -1
+    other = make_dense_model(data=data)
+    other.compile()
+    assert not np.array_equal(other.predict(x), y_changed)
+    np.testing.assert_array_equal(model.predict(x), y_changed)
+
+def test_compile_cache(make_dense_model, tmp_path, x, capfd):
+    model = make_dense_model(CompileCacheDir=str(tmp_path / 'cache'))
+    model.compile()
+    y = model.predict(x)
+    assert len(list((tmp_path / 'cache').glob('*.so'))) == 1
+
+    model.compile()
+    assert 'Sources unchanged' in capfd.readouterr().out
+    np.testing.assert_array_equal(model.predict(x), y)
+
+    # The same model in another project reuses the library of the cache
+    other = make_dense_model(name='other', CompileCacheDir=str(tmp_path / 'cache'))
+    other.compile()
+    assert 'Using the cached library' in capfd.readouterr().out
+    np.testing.assert_array_equal(other.predict(x), y)
+
+    uncached = make_dense_model(name='uncached', CompileCache=False)
+    uncached.compile()
+    uncached.compile()
+    out = capfd.readouterr().out
+    assert 'Sources unchanged' not in out and 'Using the cached library' not in out
@@ -0,0 +1,162 @@
+import numpy as np
+import pytest
+
+from hls4ml.model.hls_layers import IntegerPrecisionType, FixedPrecisionType
+from hls4ml.model.emulator import parse_precision, quantize, can_quantize
+
+def test_parse_precision():
+    precision = parse_precision('ap_fixed<16,6,AP_RND,AP_SAT>')
+    assert isinstance(precision, FixedPrecisionType)
+    assert (precision.width, precision.integer, precision.signed) == (16, 6, True)
+    assert (precision.rounding_mode, precision.saturation_mode) == ('AP_RND', 'AP_SAT')
+
+    precision = parse_precision('ap_ufixed<8, 3>')
+    assert (precision.width, precision.integer, precision.signed) == (8, 3, False)
+    assert precision.rounding_mode is None and precision.saturation_mode is None
+
+    precision = parse_precision('ap_uint<8>')
+    assert isinstance(precision, IntegerPrecisionType)
+    assert (precision.width, precision.signed) == (8, False)
+    assert parse_precision(precision) is precision
+
+    with pytest.raises(Exception):
+        parse_precision('float')
+
+@pytest.mark.parametrize('precision, x, expected', [
+    # Truncation and wrapping by default, the LSB is 0.25 and the range [-2, 1.75]
+    ('ap_fixed<4,2>', [0.3, -0.3, 1.9, 2., -2.25], [0.25, -0.5, 1.75, -2., 1.75]),
+    ('ap_fixed<4,2,AP_RND,AP_SAT>', [0.3, -0.375, 0.375, 1.9, -3.], [0.25, -0.25, 0.5, 1.75, -2.]),
+    # Ties to even
+    ('ap_fixed<4,2,AP_RND_CONV>', [0.375, 0.625, -0.375, -0.625], [0.5, 0.5, -0.5, -0.5]),
+    ('ap_fixed<4,2,AP_TRN,AP_SAT_SYM>', [-3., 3., -2.], [-1.75, 1.75, -1.75]),
+    ('ap_fixed<4,2,AP_RND_CONV,AP_WRAP>', [1.875, -2.125], [-2., -2.]),
+    ('ap_ufixed<4,2,AP_TRN,AP_SAT>', [-1., 5., 1.3], [0., 3.75, 1.25]),
+    ('ap_ufixed<4,2>', [-0.25, 4.5], [3.75, 0.5]),
+    ('ap_int<4>', [7.9, -2.5, 9.], [7., -2., -7.]),
+    ('ap_uint<4>', [17., 3.5], [1., 3.]),
+])
+def test_quantize(precision, x, expected):
+    np.testing.assert_array_equal(quantize(x, precision), expected)
+
+def test_quantize_unsupported():
+    with pytest.raises(Exception, match='Saturation bits'):
+        quantize([1.], 'ap_fixed<8,3,AP_TRN,AP_SAT,2>')
+    with pytest.raises(Exception, match='rounding mode'):
+        quantize([1.], 'ap_fixed<8,3,AP_FOO>')
+
+@pytest.mark.parametrize('precision, supported', [
+    ('ap_fixed<16,6>', True),
+    ('ap_ufixed<8,0,AP_RND_CONV,AP_SAT_SYM>', True),
+    ('ap_fixed<53,20>', True),
+    ('ap_uint<53>', True),
+    # The values of wider types aren't exactly representable as float64
+    ('ap_fixed<54,20>', False),
+    ('ap_fixed<64,32,AP_RND,AP_SAT>', False),
+    ('ap_int<64>', False),
+    ('ap_fixed<16,6,AP_RND,AP_SAT,2>', False),
+    ('ap_fixed<16,6,AP_FOO>', False),
+    ('float', False),
+])
+def test_can_quantize(precision, supported):
+    assert can_quantize(precision) == supported
+
+def _assert_emulated(model, x):
+    model.compile()
+    y = model.predict(x)
+    y_emu = model.emulate(x)
+    if not isinstance(y, list):
+        y, y_emu = [y], [y_emu]
+    for yi, yi_emu in zip(y, y_emu):
+        assert np.any(yi != 0)
+        np.testing.assert_array_equal(yi_emu, yi)
+
+@pytest.mark.parametrize('precision', [
+    'ap_fixed<10,4,AP_RND,AP_SAT>',
+    'ap_fixed<10,4,AP_RND_CONV,AP_SAT_SYM>',
+    'ap_fixed<10,4,AP_TRN,AP_WRAP>',
+    'ap_fixed<10,4,AP_RND_CONV,AP_WRAP>',
+    'ap_ufixed<10,4,AP_RND,AP_SAT>',
+])
+def test_emulate_dense(make_dense_model, x, precision):
+    model = make_dense_model(HLSConfig={'Model': {'Precision': precision, 'ReuseFactor': 1}})
+    # Large inputs overflow the types
+    _assert_emulated(model, x * 12)
+
+def test_emulate_conv2d_pool(make_model):
+    rng = np.random.RandomState(0)
+    layers = [
+        {'class_name': 'InputLayer', 'name': 'input1', 'input_shape': [None, 8, 8, 2]},
+        {'class_name': 'Conv2D', 'name': 'conv1', 'data_format': 'channels_last', 'activation': 'linear',
+         'in_height': 8, 'in_width': 8, 'n_chan': 2, 'filt_height': 3, 'filt_width': 3, 'n_filt': 4,
+         'stride_height': 1, 'stride_width': 1, 'padding': 'valid', 'out_height': 6, 'out_width': 6,
+         'pad_top': 0, 'pad_bottom': 0, 'pad_left': 0, 'pad_right': 0,
+         'weight_quantizer': None, 'bias_quantizer': None},
+        {'class_name': 'Activation', 'name': 'relu1', 'activation': 'relu'},
+        {'class_name': 'MaxPooling2D', 'name': 'pool1', 'data_format': 'channels_last',
+         'in_height': 6, 'in_width': 6, 'n_filt': 4, 'stride_height': 2, 'stride_width': 2,
+         'pool_height': 2, 'pool_width': 2, 'padding': 'valid', 'out_height': 3, 'out_width': 3,
+         'pad_top': 0, 'pad_bottom': 0, 'pad_left': 0, 'pad_right': 0},
+    ]
+    data = {'conv1': {'kernel': rng.uniform(-1, 1, (3, 3, 2, 4)), 'bias': rng.uniform(-1, 1, 4)}}
+    model = make_model(layers, data)
+    _assert_emulated(model, rng.uniform(-2, 2, (10, 8, 8, 2)))
+
+def test_emulate_conv1d_pool(make_model):
+    rng = np.random.RandomState(0)
+    layers = [
+        {'class_name': 'InputLayer', 'name': 'input1', 'input_shape': [None, 10, 2]},
+        {'class_name': 'Conv1D', 'name': 'conv1', 'data_format': 'channels_last', 'activation': 'linear',
+         'n_in': 10, 'filt_width': 3, 'n_chan': 2, 'n_filt': 4, 'stride': 1, 'padding': 'same',
+         'n_out': 10, 'pad_left': 1, 'pad_right': 1, 'weight_quantizer': None, 'bias_quantizer': None},
+        {'class_name': 'AveragePooling1D', 'name': 'pool1', 'n_in': 10, 'n_filt': 4, 'pool_size': 2,
+         'stride': 2, 'padding': 'valid', 'n_out': 5, 'pad_left': 0, 'pad_right': 0},
+    ]
+    data = {'conv1': {'kernel': rng.uniform(-1, 1, (3, 2, 4)), 'bias': rng.uniform(-1, 1, 4)}}
+    model = make_model(layers, data, HLSConfig={'Model': {'Precision': 'ap_fixed<12,4,AP_RND,AP_SAT>', 'ReuseFactor': 1}})
+    _assert_emulated(model, rng.uniform(-2, 2, (10, 10, 2)))
+
+@pytest.mark.parametrize('op', ['add', 'subtract', 'multiply', 'maximum', 'concatenate'])
+def test_emulate_merge(make_model, op):
+    rng = np.random.RandomState(0)
+    if op == 'concatenate':
+        merge = {'class_name': 'Concatenate', 'op': 'concatenate1d', 'axis': -1}
+        n_in = 8
+    else:
+        merge = {'class_name': 'Merge', 'op': op}
+        n_in = 4
+    merge.update({'name': 'merge1', 'inputs': ['input1', 'input2']})
+    layers = [
+        {'class_name': 'InputLayer', 'name': 'input1', 'input_shape': [None, 4]},
+        {'class_name': 'InputLayer', 'name': 'input2', 'input_shape': [None, 4]},
+        merge,
+        {'class_name': 'Dense', 'name': 'fc1', 'n_in': n_in, 'n_out': 3, 'activation': 'linear',
+         'weight_quantizer': None, 'bias_quantizer': None},
+    ]
+    data = {'fc1': {'kernel': rng.uniform(-1, 1, (n_in, 3)), 'bias': rng.uniform(-1, 1, 3)}}
+    model = make_model(layers, data, inputs=['input1', 'input2'])
+    _assert_emulated(model, [rng.uniform(-4, 4, (10, 4)), rng.uniform(-4, 4, (10, 4))])
+
+def test_emulate_activations(make_model):
+    rng = np.random.RandomState(0)
+    activations = [
+        {'class_name': 'Activation', 'name': 'relu1', 'activation': 'relu'},
+        {'class_name': 'Activation', 'name': 'sigmoid1', 'activation': 'sigmoid'},
+        {'class_name': 'Activation', 'name': 'tanh1', 'activation': 'tanh'},
+        {'class_name': 'Activation', 'name': 'softplus1', 'activation': 'softplus'},
+        {'class_name': 'Activation', 'name': 'elu1', 'activation': 'elu'},
+        {'class_name': 'Activation', 'name': 'hard_sigmoid1', 'activation': 'hard_sigmoid'},
+        {'class_name': 'LeakyReLU', 'name': 'leaky_relu1', 'activation': 'LeakyReLU', 'activ_param': 0.3},
+        {'class_name': 'ThresholdedReLU', 'name': 'thresholded_relu1', 'activation': 'ThresholdedReLU', 'activ_param': 0.5},
+        {'class_name': 'Softmax', 'name': 'softmax1', 'activation': 'softmax'},
+    ]
+    # All the activations are applied to the output of the Dense layer, each is an output of the model
+    for activation in activations:
+        activation['inputs'] = ['fc1']
+    layers = [
+        {'class_name': 'InputLayer', 'name': 'input1', 'input_shape': [None, 4]},
+        {'class_name': 'Dense', 'name': 'fc1', 'n_in': 4, 'n_out': 8, 'activation': 'linear',
+         'weight_quantizer': None, 'bias_quantizer': None},
+    ] + activations
+    data = {'fc1': {'kernel': rng.uniform(-2, 2, (4, 8)), 'bias': rng.uniform(-1, 1, 8)}}
+    model = make_model(layers, data, outputs=[activation['name'] for activation in activations])
+    _assert_emulated(model, rng.uniform(-4, 4, (20, 4)))
@@ -0,0 +1,11 @@
+import numpy as np
+
+def test_predict_batch(dense_model, x):
+    # One call of the batched entry point gives the same predictions as one call per sample
+    y = dense_model.predict(x)
+    assert y.shape == (10, 3)
+    np.testing.assert_array_equal(y, np.stack([dense_model.predict(xi) for xi in x]))
+
+    y32 = dense_model.predict(x.astype(np.float32))
+    assert y32.dtype == np.float32
+    np.testing.assert_array_equal(y32, y)
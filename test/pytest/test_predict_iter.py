@@ -0,0 +1,21 @@
+import numpy as np
+
+def test_predict_iter_array(dense_model, x):
+    outputs = list(dense_model.predict_iter(x, chunk_size=3))
+    assert [o.shape for o in outputs] == [(3, 3), (3, 3), (3, 3), (1, 3)]
+    np.testing.assert_array_equal(np.concatenate(outputs), dense_model.predict(x))
+
+def test_predict_iter_iterable(dense_model, x):
+    y = dense_model.predict(x)
+
+    # Single samples get the batch dimension, as the chunks of arrays
+    outputs = list(dense_model.predict_iter(iter(x)))
+    assert [o.shape for o in outputs] == [(1, 3)] * len(x)
+    np.testing.assert_array_equal(np.concatenate(outputs), y)
+
+    outputs = list(dense_model.predict_iter([{'input1': xi} for xi in x]))
+    np.testing.assert_array_equal(np.concatenate(outputs), y)
+
+    outputs = list(dense_model.predict_iter(iter([x[:1], x[1:4], x[4:]])))
+    assert [o.shape for o in outputs] == [(1, 3), (3, 3), (6, 3)]
+    np.testing.assert_array_equal(np.concatenate(outputs), y)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+@pytest.fixture
+def make_two_io_model(make_model):
+    """Factory of models subtracting two inputs, followed by two Dense layers as outputs"""
+    rng = np.random.RandomState(0)
+    layers = [
+        {'class_name': 'InputLayer', 'name': 'input1', 'input_shape': [None, 4]},
+        {'class_name': 'InputLayer', 'name': 'input2', 'input_shape': [None, 4]},
+        {'class_name': 'Merge', 'name': 'sub1', 'op': 'subtract', 'inputs': ['input1', 'input2']},
+        {'class_name': 'Dense', 'name': 'fc1', 'n_in': 4, 'n_out': 3, 'activation': 'linear',
+         'weight_quantizer': None, 'bias_quantizer': None, 'inputs': ['sub1']},
+        {'class_name': 'Dense', 'name': 'fc2', 'n_in': 4, 'n_out': 2, 'activation': 'linear',
+         'weight_quantizer': None, 'bias_quantizer': None, 'inputs': ['sub1']},
+    ]
+    data = {
+        'fc1': {'kernel': rng.uniform(-1, 1, (4, 3)), 'bias': rng.uniform(-1, 1, 3)},
+        'fc2': {'kernel': rng.uniform(-1, 1, (4, 2)), 'bias': rng.uniform(-1, 1, 2)},
+    }
+
+    def make_two_io_model(name, outputs):
+        model = make_model(layers, data, name=name, inputs=['input1', 'input2'], outputs=outputs)
+        model.compile()
+        return model
+
+    return make_two_io_model
+
+def test_predict_multi_io(make_two_io_model, x):
+    model = make_two_io_model('prj', ['fc1', 'fc2'])
+    x2 = x[::-1].copy()
+    y1, y2 = model.predict([x, x2])
+    assert y1.shape == (10, 3) and y2.shape == (10, 2)
+
+    # Same predictions as the models with one of the outputs
+    np.testing.assert_array_equal(y1, make_two_io_model('fc1', ['fc1']).predict([x, x2]))
+    np.testing.assert_array_equal(y2, make_two_io_model('fc2', ['fc2']).predict([x, x2]))
+
+    # The inputs aren't interchangeable
+    assert not np.array_equal(model.predict([x2, x])[0], y1)
+
+    for y, y_ref in zip(model.predict({'input2': x2, 'input1': x}), [y1, y2]):
+        np.testing.assert_array_equal(y, y_ref)
+    for y, y_ref in zip(model.predict([x[0], x2[0]]), [y1, y2]):
+        np.testing.assert_array_equal(y, y_ref[0])
+    out = [np.empty((10, 3)), np.empty((10, 2))]
+    model.predict([x, x2], out=out, n_jobs=2)
+    np.testing.assert_array_equal(out[0], y1)
+    np.testing.assert_array_equal(out[1], y2)
+
+    with pytest.raises(Exception, match='Missing data'):
+        model.predict({'input1': x})
+    with pytest.raises(Exception, match='Expected 2 input'):
+        model.predict(x)
+    with pytest.raises(Exception, match='same number of samples'):
+        model.predict([x, x2[:5]])
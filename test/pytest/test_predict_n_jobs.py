@@ -0,0 +1,7 @@
+import numpy as np
+import pytest
+
+@pytest.mark.parametrize('n_jobs', [2, 3, -1, 20])
+def test_predict_n_jobs(dense_model, x, n_jobs):
+    # Uneven chunks, and more jobs than samples
+    np.testing.assert_array_equal(dense_model.predict(x, n_jobs=n_jobs), dense_model.predict(x, n_jobs=1))
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+@pytest.mark.parametrize('dtype', [np.float32, np.float64])
+def test_predict_out(dense_model, x, dtype):
+    x = x.astype(dtype)
+    out = np.full((len(x), 3), np.nan, dtype=dtype)
+    assert dense_model.predict(x, out=out) is out
+    np.testing.assert_array_equal(out, dense_model.predict(x))
+
+    # Any shape with room for the predictions, e.g., a flat buffer
+    flat = np.empty(len(x) * 3, dtype=dtype)
+    dense_model.predict(x, out=flat)
+    np.testing.assert_array_equal(flat.reshape(out.shape), out)
+
+def test_predict_out_invalid(dense_model, x):
+    with pytest.raises(Exception, match='type'):
+        dense_model.predict(x, out=np.empty((len(x), 3), dtype=np.float32))
+    with pytest.raises(Exception, match='size mismatch'):
+        dense_model.predict(x, out=np.empty((len(x), 4)))
+    with pytest.raises(Exception, match='c_contiguous'):
+        dense_model.predict(x, out=np.empty((len(x), 6))[:, ::2])
+    read_only = np.empty((len(x), 3))
+    read_only.flags['WRITEABLE'] = False
+    with pytest.raises(Exception, match='writeable'):
+        dense_model.predict(x, out=read_only)
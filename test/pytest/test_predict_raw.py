@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+def test_predict_raw(dense_model, x):
+    # ap_fixed<16,6> inputs and outputs, the float inputs are truncated
+    x_raw = np.floor(x * 2**10).astype(np.int16)
+    y_raw = dense_model.predict(x_raw, raw=True)
+    assert y_raw.dtype == np.int16
+    np.testing.assert_array_equal(y_raw * 2.**-10, dense_model.predict(x))
+
+    with pytest.raises(Exception, match='raw input'):
+        dense_model.predict(x_raw.astype(np.int32), raw=True)
+
+def test_predict_raw_narrow_types(make_model, x):
+    rng = np.random.RandomState(0)
+    layers = [
+        {'class_name': 'InputLayer', 'name': 'input1', 'input_shape': [None, 4]},
+        {'class_name': 'Dense', 'name': 'fc1', 'n_in': 4, 'n_out': 8, 'activation': 'linear',
+         'weight_quantizer': None, 'bias_quantizer': None},
+        {'class_name': 'Activation', 'name': 'relu1', 'activation': 'relu'},
+    ]
+    data = {'fc1': {'kernel': rng.uniform(-1, 1, (4, 8)), 'bias': rng.uniform(-1, 1, 8)}}
+    hls_config = {
+        'Model': {'Precision': 'ap_fixed<12,4>', 'ReuseFactor': 1},
+        'LayerName': {'relu1': {'Precision': {'result': 'ap_ufixed<10,4>'}}},
+    }
+    model = make_model(layers, data, outputs=['fc1', 'relu1'], HLSConfig=hls_config)
+    model.compile()
+
+    # Negative values of ap_fixed<12,4> are sign-extended to int16, ap_ufixed<10,4> is zero-extended to uint16
+    x_raw = np.floor(x * 2**8).astype(np.int16)
+    y_fc1, y_relu1 = model.predict(x_raw, raw=True)
+    assert y_fc1.dtype == np.int16 and y_relu1.dtype == np.uint16
+    assert np.any(y_fc1 < 0)
+    y = model.predict(x)
+    np.testing.assert_array_equal(y_fc1 * 2.**-8, y[0])
+    np.testing.assert_array_equal(y_relu1 * 2.**-6, y[1])
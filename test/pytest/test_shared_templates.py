@@ -0,0 +1,34 @@
+import os
+import numpy as np
+
+def test_shared_templates_symlink(make_dense_model, tmp_path, x):
+    model = make_dense_model(SharedTemplates='symlink', SharedTemplatesDir=str(tmp_path / 'shared'))
+    model.compile()
+    for subdir in ['nnet_utils', 'ap_types']:
+        path = tmp_path / 'prj' / 'firmware' / subdir
+        assert path.is_symlink()
+        assert os.path.realpath(str(path)).startswith(os.path.realpath(str(tmp_path / 'shared')))
+
+    # Same library as with copies of the templates
+    copied = make_dense_model(name='copied')
+    copied.compile()
+    np.testing.assert_array_equal(model.predict(x), copied.predict(x))
+
+def test_shared_templates_hardlink(make_dense_model, tmp_path):
+    model = make_dense_model(SharedTemplates='hardlink', SharedTemplatesDir=str(tmp_path / 'shared'))
+    model.write()
+    other = make_dense_model(name='other', SharedTemplates='hardlink', SharedTemplatesDir=str(tmp_path / 'shared'))
+    other.write()
+    shared = list((tmp_path / 'shared' / 'templates').iterdir())
+    assert len(shared) == 1
+    header = tmp_path / 'prj' / 'firmware' / 'nnet_utils' / 'nnet_dense.h'
+    assert os.path.samefile(str(header), str(shared[0] / 'nnet_utils' / 'nnet_dense.h'))
+    assert os.path.samefile(str(header), str(tmp_path / 'other' / 'firmware' / 'nnet_utils' / 'nnet_dense.h'))
+
+    # Without sharing, the project gets copies of its own and the shared copy is left unchanged
+    content = header.read_bytes()
+    unshared = make_dense_model(SharedTemplates=False)
+    unshared.write()
+    assert os.stat(str(header)).st_nlink == 1
+    assert header.read_bytes() == content
+    assert os.stat(str(shared[0] / 'nnet_utils' / 'nnet_dense.h')).st_nlink == 2
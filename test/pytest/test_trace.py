@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+def test_trace(make_dense_model, x, capfd):
+    model = make_dense_model(HLSConfig={'Model': {'Precision': 'ap_fixed<16,6>', 'ReuseFactor': 1, 'Trace': True}})
+    model.compile()
+    y = model.predict(x)
+    capfd.readouterr()
+
+    y_trace, trace = model.trace(x)
+    # The compiled library is used as it is
+    assert 'Writing HLS project' not in capfd.readouterr().out
+    np.testing.assert_array_equal(y_trace, y)
+
+    # Same outputs as the emulated layers, bn1 is fused into fc1
+    assert sorted(trace) == ['fc1', 'fc2', 'relu1']
+    _, emulated = model.emulate(x, trace=True)
+    for layer_name, layer_output in trace.items():
+        assert layer_output.shape == emulated[layer_name].shape
+        np.testing.assert_array_equal(layer_output, emulated[layer_name])
+
+def test_trace_float32(make_dense_model, x):
+    model = make_dense_model(HLSConfig={'Model': {'Precision': 'ap_fixed<16,6>', 'ReuseFactor': 1, 'Trace': True}})
+    model.compile()
+    _, trace = model.trace(x)
+    y32, trace32 = model.trace(x.astype(np.float32))
+    assert y32.dtype == np.float32
+    for layer_name, layer_output in trace.items():
+        # The outputs are exactly representable in single precision
+        assert trace32[layer_name].dtype == np.float32
+        np.testing.assert_array_equal(trace32[layer_name], layer_output)
+
+def test_trace_layers(dense_model, x):
+    # No layers are traced by the configuration
+    y, trace = dense_model.trace(x)
+    assert trace == {}
+    np.testing.assert_array_equal(y, dense_model.predict(x))
+
+    _, trace_all = dense_model.trace(x, layers=['fc1', 'relu1', 'fc2'])
+    _, trace = dense_model.trace(x, layers=['relu1'])
+    assert list(trace) == ['relu1']
+    np.testing.assert_array_equal(trace['relu1'], trace_all['relu1'])
+
+    with pytest.raises(Exception, match='not found'):
+        dense_model.trace(x, layers=['bn1'])
+    with pytest.raises(Exception, match='can\'t be traced'):
+        dense_model.trace(x, layers=['input1'])
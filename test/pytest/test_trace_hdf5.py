@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+import h5py
+
+def test_trace_hdf5(dense_model, x, tmp_path):
+    layers = ['fc1', 'relu1']
+    y, trace = dense_model.trace(x, layers=layers)
+
+    # Fewer samples per chunk than samples, the datasets are appended to
+    filename = str(tmp_path / 'trace.h5')
+    assert dense_model.trace(x, layers=layers, output_file=filename, chunk_size=3) == filename
+    with h5py.File(filename, 'r') as h5file:
+        assert sorted(h5file) == ['fc1', 'predictions', 'relu1']
+        for layer_name in layers:
+            np.testing.assert_array_equal(h5file[layer_name][()], trace[layer_name])
+        np.testing.assert_array_equal(h5file['predictions/fc2'][()], y)
+
+    # Samples yielded one by one
+    dense_model.trace(iter(x), layers=layers, output_file=filename)
+    with h5py.File(filename, 'r') as h5file:
+        np.testing.assert_array_equal(h5file['relu1'][()], trace['relu1'])
+        np.testing.assert_array_equal(h5file['predictions/fc2'][()], y)
+
+    with pytest.raises(Exception, match='statistics'):
+        dense_model.trace(x, layers=layers, stats=True, output_file=filename)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+def test_trace_stats(dense_model, x):
+    layers = ['fc1', 'relu1', 'fc2']
+    _, trace = dense_model.trace(x, layers=layers)
+    y, stats = dense_model.trace(x, layers=layers, stats=True)
+    np.testing.assert_array_equal(y, dense_model.predict(x))
+
+    for layer_name in layers:
+        values = trace[layer_name].ravel()
+        nonzero = values[values != 0]
+        layer_stats = stats[layer_name]
+        assert layer_stats['min'] == values.min() and layer_stats['max'] == values.max()
+        assert layer_stats['n_values'] == values.size
+        assert layer_stats['n_zeros'] == values.size - nonzero.size
+        # abs(x) is in [2**log2[i], 2**(log2[i] + 1)) for the values counted in hist[i]
+        exponents = np.floor(np.log2(np.abs(nonzero))).astype(int)
+        expected = np.bincount(exponents - layer_stats['log2'][0], minlength=len(layer_stats['hist']))
+        np.testing.assert_array_equal(layer_stats['hist'], expected)
+
+    # relu1 has zeros
+    assert stats['relu1']['n_zeros'] > 0
+
+def test_stats_to_summary(dense_model, x):
+    profiling = pytest.importorskip('hls4ml.model.profiling')
+    _, trace = dense_model.trace(x, layers=['relu1'])
+    _, stats = dense_model.trace(x, layers=['relu1'], stats=True)
+    values = np.abs(trace['relu1'][trace['relu1'] != 0])
+
+    summary = profiling.stats_to_summary(stats['relu1'], fmt='boxplot')
+    assert summary['whishi'] == values.max()
+    assert summary['whislo'] == 2. ** np.floor(np.log2(values.min()))
+    # The quantiles are interpolated within their power of two bin
+    for key, q in [('q1', 25), ('med', 50), ('q3', 75)]:
+        assert abs(np.log2(summary[key]) - np.log2(np.percentile(values, q))) < 1
+
+    summary = profiling.stats_to_summary(stats['relu1'], fmt='histogram')
+    low, high = np.floor(np.log2(values.min())), np.floor(np.log2(values.max()))
+    np.testing.assert_array_equal(summary['b'], np.arange(low, high + 2))
+    h, _ = np.histogram(values, bins=2. ** summary['b'])
+    np.testing.assert_allclose(summary['h'], h / float(values.size))
+
+    assert profiling.stats_to_summary(dict(stats['relu1'], hist=np.zeros_like(stats['relu1']['hist']))) is None
@@ -0,0 +1,9 @@
+import numpy as np
+
+def test_split_units(make_dense_model, tmp_path, x):
+    model = make_dense_model()
+    model.compile()
+    split = make_dense_model(name='split', LayersPerUnit=1)
+    split.compile()
+    assert len(list((tmp_path / 'split' / 'firmware' / 'units').glob('*.cpp'))) == 2
+    np.testing.assert_array_equal(split.predict(x), model.predict(x))
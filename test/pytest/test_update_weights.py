@@ -0,0 +1,103 @@
+import copy
+import numpy as np
+import pytest
+
+@pytest.mark.parametrize('weights_format', ['txt', 'bin'])
+def test_update_dense(make_dense_model, dense_data, x, weights_format):
+    model = make_dense_model(batchnorm=False, WeightsFormat=weights_format)
+    model.compile()
+
+    data = copy.deepcopy(dense_data)
+    data['fc1']['kernel'] *= 0.5
+    model.update_weights('fc1', data['fc1']['kernel'])
+
+    reference = make_dense_model(name='reference', batchnorm=False, data=data, WeightsFormat=weights_format)
+    reference.compile()
+    np.testing.assert_array_equal(model.predict(x), reference.predict(x))
+
+def test_update_fused_dense_batchnorm(make_dense_model, dense_data, x):
+    model = make_dense_model()
+    assert 'bn1' not in model.graph # Fused into fc1
+    model.compile()
+    y = model.predict(x)
+
+    # Updating with the original values must be a no-op, the BatchNormalization is fused into them again
+    model.update_weights('fc1', {'weight': dense_data['fc1']['kernel'], 'bias': dense_data['fc1']['bias']})
+    np.testing.assert_array_equal(model.predict(x), y)
+
+    data = copy.deepcopy(dense_data)
+    data['fc1']['kernel'] *= 0.5
+    data['fc1']['bias'] -= 0.25
+    model.update_weights('fc1', {'weight': data['fc1']['kernel'], 'bias': data['fc1']['bias']})
+
+    reference = make_dense_model(name='reference', data=data)
+    reference.compile()
+    np.testing.assert_array_equal(model.predict(x), reference.predict(x))
+
+def test_update_changed_weights_rejected(make_dense_model):
+    model = make_dense_model(batchnorm=False)
+    model.graph['fc1'].add_weights_fold('bias', 'SomePass', None)
+    weights = model.graph['fc1'].get_weights('weight').data.copy()
+
+    with pytest.raises(Exception, match='SomePass'):
+        model.update_all_weights({'fc1': {'weight': weights * 2, 'bias': np.zeros(8)}})
+    # Nothing changed
+    np.testing.assert_array_equal(model.graph['fc1'].get_weights('weight').data, weights)
+
+def test_update_biasadd_rejected(make_model, x):
+    # TensorFlow graphs have the bias of Dense layers in a separate BiasAdd
+    layers = [
+        {'class_name': 'InputLayer', 'name': 'input1', 'input_shape': [None, 4]},
+        {'class_name': 'Dense', 'name': 'fc1', 'n_in': 4, 'n_out': 3, 'activation': 'linear',
+         'weight_quantizer': None, 'bias_quantizer': None},
+        {'class_name': 'BiasAdd', 'name': 'biasadd1', 'op': 'Add'},
+    ]
+    rng = np.random.RandomState(0)
+    data = {'fc1': {'kernel': rng.uniform(-1, 1, (4, 3))}, 'biasadd1': {'bias': rng.uniform(-1, 1, 3)}}
+    model = make_model(layers, data)
+    assert 'biasadd1' not in model.graph # Fused into fc1
+    model.compile()
+    y = model.predict(x)
+
+    with pytest.raises(Exception, match='FuseBiasAdd'):
+        model.update_weights('fc1', {'weight': data['fc1']['kernel'], 'bias': np.zeros(3)})
+    np.testing.assert_array_equal(model.predict(x), y)
+
+    # The kernel can still be updated
+    model.update_weights('fc1', {'weight': data['fc1']['kernel'] * 0.5})
+    assert not np.array_equal(model.predict(x), y)
+
+def test_update_qkeras_alpha(make_model, x):
+    pytest.importorskip('qkeras')
+    from hls4ml.converters.keras.qkeras import QKerasQuantizer
+
+    def convert(kernel, name):
+        quantizer = {'class_name': 'quantized_bits', 'config': {'bits': 6, 'integer': 0, 'alpha': 'auto_po2'}}
+        layers = [
+            {'class_name': 'InputLayer', 'name': 'input1', 'input_shape': [None, 4]},
+            {'class_name': 'Dense', 'name': 'fc1', 'n_in': 4, 'n_out': 8, 'activation': 'linear',
+             'weight_quantizer': QKerasQuantizer(quantizer), 'bias_quantizer': None},
+            {'class_name': 'Activation', 'name': 'relu1', 'activation': 'relu'},
+        ]
+        data = {'fc1': {'kernel': kernel, 'bias': np.zeros(8)}}
+        model = make_model(layers, data, name=name)
+        model.compile()
+        return model
+
+    kernel = np.random.RandomState(0).uniform(-2, 2, (4, 8)).astype(np.float32)
+    model = convert(kernel, 'prj')
+    assert 'fc1_alpha' in model.graph
+    y = model.predict(x)
+    assert np.any(y != 0)
+
+    model.update_weights('fc1', kernel)
+    np.testing.assert_array_equal(model.predict(x), y)
+
+    # Same values per output, hence the same scales
+    kernel = np.ascontiguousarray(kernel[::-1])
+    model.update_weights('fc1', kernel)
+    reference = convert(kernel, 'reference')
+    np.testing.assert_array_equal(model.predict(x), reference.predict(x))
+
+    with pytest.raises(Exception, match='scale'):
+        model.update_weights('fc1', kernel * 0.25)
@@ -0,0 +1,37 @@
+import numpy as np
+
+from hls4ml.model.emulator import parse_precision, quantize
+
+def test_weights_format_bin(make_dense_model, tmp_path, x):
+    txt = make_dense_model(name='txt')
+    txt.compile()
+    model = make_dense_model(WeightsFormat='bin')
+    model.compile()
+    np.testing.assert_array_equal(model.predict(x), txt.predict(x))
+
+    weights_dir = tmp_path / 'prj' / 'firmware' / 'weights'
+    for layer in model.get_layers():
+        for w in layer.get_weights():
+            # The bit patterns of the values of the text files
+            precision = parse_precision(w.type.precision)
+            values = np.array((weights_dir / (w.name + '.txt')).read_text().split(', '), dtype=np.float64)
+            raw = np.fromfile(str(weights_dir / (w.name + '.bin')), dtype=w.type.raw_dtype())
+            np.testing.assert_array_equal(raw, np.ldexp(quantize(values, precision, from_float=True), precision.width - precision.integer))
+    assert not list((tmp_path / 'txt' / 'firmware' / 'weights').glob('*.bin'))
+
+def test_weights_format_fallback(make_dense_model, tmp_path, x):
+    # The conversion to types with saturation bits can't be reproduced, their weights are written as text
+    hls_config = {
+        'Model': {'Precision': 'ap_fixed<16,6>', 'ReuseFactor': 1},
+        'LayerName': {'fc2': {'Precision': {'weight': 'ap_fixed<16,6,AP_RND,AP_SAT,1>'}}},
+    }
+    model = make_dense_model(WeightsFormat='bin', HLSConfig=hls_config)
+    model.compile()
+    txt = make_dense_model(name='txt', HLSConfig=hls_config)
+    txt.compile()
+    np.testing.assert_array_equal(model.predict(x), txt.predict(x))
+
+    weights_dir = tmp_path / 'prj' / 'firmware' / 'weights'
+    fc2_weight = model.graph['fc2'].get_weights('weight').name
+    assert not (weights_dir / (fc2_weight + '.bin')).exists()
+    assert (weights_dir / (model.graph['fc1'].get_weights('weight').name + '.bin')).exists()
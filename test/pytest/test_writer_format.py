@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from hls4ml.model.hls_layers import IntegerPrecisionType, FixedPrecisionType, WeightVariable, CompressedWeightVariable
+
+@pytest.mark.parametrize('precision', [
+    FixedPrecisionType(width=16, integer=6),
+    FixedPrecisionType(width=8, integer=12), # LSB larger than 1
+    IntegerPrecisionType(width=8),
+])
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_format_chunks(precision, chunk_size):
+    data = np.random.RandomState(0).uniform(-100, 100, (13, 5))
+    data[0, :3] = [0., -0., 1e-9]
+    var = WeightVariable('w{index}', type_name='weight{index}_t', precision=precision, data=data, index=1)
+
+    chunks = list(var.format_chunks(chunk_size=chunk_size))
+    assert len(chunks) == -(-data.size // chunk_size)
+    # Byte-identical to formatting the values one by one
+    assert ', '.join(chunks) == ', '.join(list(var))
+    np.testing.assert_array_equal(var.formatted_values(), np.array(list(var)).astype(np.float64))
+
+@pytest.mark.parametrize('chunk_size', [1, 4, 4096])
+def test_format_chunks_compressed(chunk_size):
+    data = np.random.RandomState(0).uniform(-1, 1, (6, 4))
+    data[data < 0] = 0.
+    var = CompressedWeightVariable('w{index}', type_name='weight{index}_t', precision=FixedPrecisionType(width=16, integer=6),
+        data=data, reuse_factor=4, index=1)
+
+    assert ', '.join(var.format_chunks(chunk_size=chunk_size)) == ', '.join(list(var))
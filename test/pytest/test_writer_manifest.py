@@ -0,0 +1,56 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+def _get_mtimes(directory):
+    mtimes = {}
+    for root, _, filenames in os.walk(str(directory)):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            mtimes[os.path.relpath(path, str(directory))] = os.stat(path).st_mtime_ns
+    return mtimes
+
+def test_write_unchanged(make_dense_model, tmp_path):
+    model = make_dense_model(WriteTar=False, WeightsFormat='bin')
+    model.write()
+    output_dir = tmp_path / 'prj'
+    manifest = (output_dir / 'hls4ml_manifest.json').read_text()
+    mtimes = _get_mtimes(output_dir)
+
+    # Nothing changed, no file is rewritten
+    model.write()
+    assert _get_mtimes(output_dir) == mtimes
+    assert (output_dir / 'hls4ml_manifest.json').read_text() == manifest
+
+    # Only the files of the changed weights are rewritten
+    weights = model.graph['fc2'].get_weights('weight')
+    weights.update_data(weights.data * 0.5)
+    model.write()
+    changed = sorted(path for path, mtime in _get_mtimes(output_dir).items() if mtimes.get(path) != mtime)
+    assert changed == ['firmware/weights/{}.{}'.format(weights.name, ext) for ext in ['bin', 'h', 'txt']] + ['hls4ml_manifest.json']
+
+def test_manifest(make_dense_model, tmp_path):
+    model = make_dense_model(WriteTar=False)
+    model.write()
+    output_dir = tmp_path / 'prj'
+    manifest = json.loads((output_dir / 'hls4ml_manifest.json').read_text())
+    assert manifest['project'] == 'myproject'
+
+    files = manifest['files']
+    generated = set(_get_mtimes(output_dir)) - set(['hls4ml_manifest.json'])
+    assert set(files) == generated
+    for path, entry in files.items():
+        content = (output_dir / path).read_bytes()
+        assert entry['size'] == len(content)
+        assert entry['sha256'] == hashlib.sha256(content).hexdigest()
+    assert files['firmware/weights/{}.txt'.format(model.graph['fc1'].get_weights('weight').name)]['layers'] == ['fc1']
+    assert files['firmware/myproject.cpp']['layers'] == []
+
+    # Updating the weights of a layer updates its entries
+    model.update_weights('fc2', np.zeros((8, 3)))
+    files = json.loads((output_dir / 'hls4ml_manifest.json').read_text())['files']
+    path = 'firmware/weights/{}.txt'.format(model.graph['fc2'].get_weights('weight').name)
+    content = (output_dir / path).read_bytes()
+    assert files[path]['sha256'] == hashlib.sha256(content).hexdigest()
+    assert content.startswith(b'0.0')
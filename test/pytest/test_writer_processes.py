@@ -0,0 +1,32 @@
+import pytest
+from multiprocessing import Pool
+
+def _read_files(directory):
+    return dict((path.name, path.read_bytes()) for path in directory.iterdir())
+
+@pytest.mark.parametrize('weights_format', ['txt', 'bin'])
+def test_writer_processes(make_dense_model, tmp_path, weights_format):
+    serial = make_dense_model(name='serial', WeightsFormat=weights_format)
+    serial.write()
+    parallel = make_dense_model(name='parallel', WeightsFormat=weights_format, WriterProcesses=2)
+    parallel.write()
+
+    weights = _read_files(tmp_path / 'serial' / 'firmware' / 'weights')
+    assert any(name.endswith('.bin') for name in weights) == (weights_format == 'bin')
+    assert _read_files(tmp_path / 'parallel' / 'firmware' / 'weights') == weights
+
+def test_write_weights_pool(make_dense_model, tmp_path):
+    model = make_dense_model()
+    model.write()
+    weights_dir = tmp_path / 'prj' / 'firmware' / 'weights'
+    weights = _read_files(weights_dir)
+    for path in weights_dir.iterdir():
+        path.unlink()
+
+    pool = Pool(2)
+    try:
+        model.config.writer.write_weights(model, pool=pool).get()
+    finally:
+        pool.terminate()
+        pool.join()
+    assert _read_files(weights_dir) == weights
@@ -0,0 +1,42 @@
+import os
+import tarfile
+import pytest
+
+@pytest.mark.parametrize('write_tar', [True, 'async', 'deferred', False])
+def test_write_tar(make_dense_model, tmp_path, write_tar):
+    model = make_dense_model(WriteTar=write_tar)
+    writer = model.config.writer
+    assert writer.get_tar_mode(model) == write_tar
+    model.write()
+    writer.wait_for_tar()
+    tar_name = tmp_path / 'prj.tar.gz'
+    assert tar_name.exists() == (write_tar in [True, 'async'])
+
+    if write_tar == 'deferred':
+        # Written before the synthesis, see HLSModel.build
+        writer.write_tar(model)
+    if write_tar:
+        with tarfile.open(str(tar_name)) as archive:
+            names = [os.path.relpath('/' + name, str(tmp_path / 'prj')) for name in archive.getnames()]
+        assert 'firmware/myproject.cpp' in names and 'firmware/weights/w2.txt' in names
+
+def test_write_tar_compression(make_dense_model, tmp_path):
+    model = make_dense_model(TarCompression='xz')
+    model.compile()
+    # The files of the C simulation library aren't archived
+    os.remove(str(tmp_path / 'prj.tar.xz'))
+    model.config.writer.write_tar(model)
+    with tarfile.open(str(tmp_path / 'prj.tar.xz')) as archive:
+        names = [os.path.relpath('/' + name, str(tmp_path / 'prj')) for name in archive.getnames()]
+    assert 'firmware/myproject.cpp' in names and 'build_lib.sh' in names
+    assert not any(name.startswith('build/') or name.endswith('.so') for name in names)
+
+    # Up to date
+    mtime = os.path.getmtime(str(tmp_path / 'prj.tar.xz'))
+    model.config.writer.write_tar(model)
+    assert os.path.getmtime(str(tmp_path / 'prj.tar.xz')) == mtime
+
+    with pytest.raises(Exception, match='TarCompression'):
+        make_dense_model(name='invalid', TarCompression='zip').write()
+    with pytest.raises(Exception, match='WriteTar'):
+        make_dense_model(name='invalid', WriteTar='later').write()